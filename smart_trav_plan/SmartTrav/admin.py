@@ -1,7 +1,8 @@
 from django.contrib import admin
 from django import forms
-from .models import Destination, Itinerary, ItineraryDestination, SavedDestination, Expense
-from .utils import upload_image_to_supabase
+from .models import Destination, Itinerary, ItineraryDestination, SavedDestination, Expense, Tag, UploadJob, ImageProbe
+from .pricing import reprice_itineraries, reprice_destinations
+from .uploads import enqueue_upload, requeue, DESTINATION_IMAGE_BUCKET
 
 
 class DestinationAdminForm(forms.ModelForm):
@@ -25,22 +26,36 @@ class DestinationAdmin(admin.ModelAdmin):
     has_image.boolean = True
     has_image.short_description = 'Image'
 
-    def save_model(self, request, obj, form, change):
-        # Check if a new image was uploaded
-        if 'image_file' in request.FILES:
-            image_file = request.FILES['image_file']
-            # Upload to Supabase and get URL
-            image_url = upload_image_to_supabase(image_file, 'images')
-            obj.image_url = image_url
+    actions = ['reprice_itinerary_stops']
 
+    @admin.action(description='Reprice itinerary stops at selected destinations')
+    def reprice_itinerary_stops(self, request, queryset):
+        changed = reprice_destinations(queryset.values_list('pk', flat=True))
+        self.message_user(request, f'Repriced {changed} itinerary stops.')
+
+    def save_model(self, request, obj, form, change):
         super().save_model(request, obj, form, change)
 
+        # A new image is queued; the upload worker fills in image_url
+        if 'image_file' in request.FILES:
+            enqueue_upload(
+                UploadJob.TARGET_DESTINATION_IMAGE, obj.pk, request.FILES['image_file'],
+                DESTINATION_IMAGE_BUCKET, requested_by=request.user,
+            )
+            self.message_user(request, 'Image queued for upload; it will appear once the upload worker has run.')
+
 
 @admin.register(Itinerary)
 class ItineraryAdmin(admin.ModelAdmin):
     list_display = ('title', 'user', 'start_date', 'end_date', 'budget', 'created_at')
     list_filter = ('user', 'start_date')
     search_fields = ('title', 'notes')
+    actions = ['recalculate_prices']
+
+    @admin.action(description='Recalculate destination prices')
+    def recalculate_prices(self, request, queryset):
+        changed = reprice_itineraries(queryset.values_list('pk', flat=True))
+        self.message_user(request, f'Repriced {changed} itinerary stops.')
 
 
 @admin.register(ItineraryDestination)
@@ -59,4 +74,29 @@ class SavedDestinationAdmin(admin.ModelAdmin):
 class ExpenseAdmin(admin.ModelAdmin):
     list_display = ('description', 'itinerary', 'category', 'amount', 'date')
     list_filter = ('category', 'date')
-    search_fields = ('description',)
\ No newline at end of file
+    search_fields = ('description',)
+
+
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    list_display = ('name',)
+    search_fields = ('name',)
+
+
+@admin.register(UploadJob)
+class UploadJobAdmin(admin.ModelAdmin):
+    list_display = ('target', 'object_id', 'status', 'attempts', 'next_attempt_at', 'created_at')
+    list_filter = ('status', 'target')
+    readonly_fields = ('idempotency_key', 'last_error', 'result_url')
+    actions = ['requeue_dead_jobs']
+
+    @admin.action(description='Requeue selected dead jobs')
+    def requeue_dead_jobs(self, request, queryset):
+        self.message_user(request, f'Requeued {requeue(queryset)} jobs.')
+
+
+@admin.register(ImageProbe)
+class ImageProbeAdmin(admin.ModelAdmin):
+    list_display = ('url', 'status', 'content_type', 'size', 'latency_ms', 'checked_at')
+    list_filter = ('status',)
+    search_fields = ('url',)
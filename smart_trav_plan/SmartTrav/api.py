@@ -0,0 +1,313 @@
+import hashlib
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Prefetch
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .budget import annotate_budget
+from .catalog import get_catalog_stamp
+from .dashboard import get_catalog_filters, get_destination_page, EXPENSE_ORDERING
+from .itinerary_batch import apply_stop_batch
+from .models import Destination, Expense, Itinerary, ItineraryDestination
+from .pagination import keyset_paginate, InvalidCursor, DEFAULT_PAGE_SIZE
+from .serializers import (
+    DestinationSerializer, ExpenseSerializer, ItineraryDestinationSerializer, ItineraryDetailSerializer,
+    ItinerarySerializer, StopBatchSerializer,
+)
+
+ITINERARY_ORDERING = ('-id',)
+STOP_ORDERING = ('visit_date', 'visit_time', 'position', 'added_at', 'id')
+# The trip figures returned with a batch diff
+TRIP_SUMMARY_FIELDS = ('id', 'destination_count', 'destination_cost_total', 'expense_total', 'total_spent',
+                       'budget_remaining', 'budget_status', 'updated_at')
+
+
+# --- Query parameters ---
+
+def requested_fields(request, serializer_class):
+    """The ?fields=a,b sparse fieldset as a list, or None for every field."""
+    raw = request.query_params.get('fields')
+    if not raw:
+        return None
+    fields = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = set(fields) - set(serializer_class.field_names())
+    if unknown:
+        raise ValidationError({'fields': f'Unknown field(s): {", ".join(sorted(unknown))}'})
+    return fields
+
+
+def requested_page_size(request):
+    try:
+        size = int(request.query_params.get('page_size', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ValidationError({'page_size': 'Must be a whole number'})
+    return min(max(size, 1), getattr(settings, 'API_MAX_PAGE_SIZE', 100))
+
+
+def wants(fields, name):
+    return fields is None or name in fields
+
+
+# --- Validators ---
+
+def make_etag(*parts):
+    return quote_etag(hashlib.sha256(':'.join(str(part) for part in parts).encode()).hexdigest()[:32])
+
+
+def trips_stamp(itineraries):
+    """
+    (count, latest updated_at) of an Itinerary queryset in one aggregate
+    query. updated_at moves with every change to a trip, its stops or its
+    expenses, and the count catches deleted trips.
+    """
+    stamp = itineraries.aggregate(count=Count('pk'), last=Max('updated_at'))
+    return stamp['count'], stamp['last']
+
+
+def latest(*moments):
+    moments = [moment for moment in moments if moment is not None]
+    return max(moments) if moments else None
+
+
+def page_body(request, page, serializer):
+    """A page of results with the cursor (and full URL) of the next one."""
+    next_url = None
+    if page.next_cursor:
+        params = request.query_params.copy()
+        params['cursor'] = page.next_cursor
+        next_url = request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+    return {'results': serializer.data, 'next_cursor': page.next_cursor, 'next': next_url}
+
+
+def paginate(request, queryset, ordering):
+    try:
+        return keyset_paginate(queryset, ordering, request.query_params.get('cursor'), requested_page_size(request))
+    except InvalidCursor as e:
+        raise ValidationError({'cursor': str(e)})
+
+
+# --- Views ---
+
+class ConditionalAPIView(ABC, APIView):
+    """
+    A read-only endpoint that answers If-None-Match / If-Modified-Since with
+    304 Not Modified. get_validators() returns (ETag parts, last modified)
+    from cheap queries (or none at all), checked before any rows are loaded
+    or serialized; get_body() builds the full response.
+    """
+    serializer_class = None
+    # Clients may store responses but must revalidate before reusing them
+    cache_control = {'private': True, 'no_cache': True}
+
+    @abstractmethod
+    def get_validators(self, request, **kwargs):
+        """(ETag parts, last modified datetime or None) of the response."""
+
+    @abstractmethod
+    def get_body(self, request, **kwargs):
+        """The response data, built only when the client's copy is stale."""
+
+    def get(self, request, **kwargs):
+        self.fields = requested_fields(request, self.serializer_class)
+        parts, last_modified = self.get_validators(request, **kwargs)
+        etag = make_etag(type(self).__name__, request.user.pk, *parts)
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = Response(self.get_body(request, **kwargs))
+        response.headers['ETag'] = etag
+        if timestamp is not None:
+            response.headers['Last-Modified'] = http_date(timestamp)
+        patch_cache_control(response, **self.cache_control)
+        return response
+
+
+class CatalogAPIView(ConditionalAPIView):
+    """Public catalog data, validated by the shared catalog version (one primary-key read)."""
+    authentication_classes = ()
+    permission_classes = (AllowAny,)
+    serializer_class = DestinationSerializer
+    cache_control = {'public': True, 'no_cache': True}
+
+    def get_validators(self, request, **kwargs):
+        version, changed_at = get_catalog_stamp()
+        return ('catalog', version, changed_at.timestamp()), changed_at
+
+
+class DestinationList(CatalogAPIView):
+    """
+    The catalog with the dashboard's filters (category, price, tags,
+    tag_mode, search), served from the cached snapshot unless searching.
+    """
+
+    def get_body(self, request, **kwargs):
+        try:
+            page = get_destination_page(
+                get_catalog_filters(request.query_params),
+                request.query_params.get('cursor'),
+                requested_page_size(request),
+            )
+        except InvalidCursor as e:
+            raise ValidationError({'cursor': str(e)})
+        return page_body(request, page, DestinationSerializer(page.items, many=True, fields=self.fields))
+
+
+class DestinationDetail(CatalogAPIView):
+    def get_validators(self, request, destination_id):
+        # A missing destination is a 404 even for a client holding a current catalog ETag
+        if not Destination.objects.filter(pk=destination_id).exists():
+            raise NotFound('No such destination')
+        return super().get_validators(request)
+
+    def get_body(self, request, destination_id):
+        destinations = Destination.objects.defer('search_vector')
+        columns = DestinationSerializer.columns_for(self.fields)
+        if columns:
+            destinations = destinations.only(*columns)
+        destination = destinations.filter(pk=destination_id).first()
+        if destination is None:
+            raise NotFound('No such destination')
+        return DestinationSerializer(destination, fields=self.fields).data
+
+
+class ItineraryList(ConditionalAPIView):
+    """The signed-in user's trips, newest first, with their budget health."""
+    serializer_class = ItinerarySerializer
+
+    def get_validators(self, request, **kwargs):
+        count, last = trips_stamp(Itinerary.objects.filter(user=request.user))
+        return (count, last), last
+
+    def get_body(self, request, **kwargs):
+        itineraries = Itinerary.objects.filter(user=request.user)
+        columns = ItinerarySerializer.columns_for(self.fields)
+        if columns:
+            itineraries = itineraries.only(*columns)
+        page = paginate(request, annotate_budget(itineraries), ITINERARY_ORDERING)
+        return page_body(request, page, ItinerarySerializer(page.items, many=True, fields=self.fields))
+
+
+class OwnedItineraryMixin:
+    """Validators for one of the user's trips; 404 before anything else if it is not theirs."""
+    # Nested output that shows destination data also depends on the catalog
+    catalog_fields = ()
+
+    def get_validators(self, request, itinerary_id):
+        updated_at = (
+            Itinerary.objects.filter(pk=itinerary_id, user=request.user)
+            .values_list('updated_at', flat=True).first()
+        )
+        if updated_at is None:
+            raise NotFound('No such itinerary')
+        if not any(wants(self.fields, name) for name in self.catalog_fields):
+            return (updated_at,), updated_at
+        version, changed_at = get_catalog_stamp()
+        return (updated_at, version, changed_at.timestamp()), latest(updated_at, changed_at)
+
+
+class ItineraryDetail(OwnedItineraryMixin, ConditionalAPIView):
+    """One trip with its stops (and their destinations) and expenses."""
+    serializer_class = ItineraryDetailSerializer
+    catalog_fields = ('stops',)
+
+    def get_body(self, request, itinerary_id):
+        itineraries = Itinerary.objects.filter(pk=itinerary_id, user=request.user)
+        columns = ItineraryDetailSerializer.columns_for(self.fields)
+        if columns:
+            itineraries = itineraries.only(*columns)
+        if wants(self.fields, 'stops'):
+            itineraries = itineraries.prefetch_related(Prefetch(
+                'itinerary_destinations',
+                queryset=ItineraryDestination.objects.select_related('destination'),
+            ))
+        if wants(self.fields, 'expenses'):
+            itineraries = itineraries.prefetch_related('expenses')
+        itinerary = annotate_budget(itineraries).first()
+        if itinerary is None:
+            raise NotFound('No such itinerary')
+        return ItineraryDetailSerializer(itinerary, fields=self.fields).data
+
+
+class ItineraryStopList(OwnedItineraryMixin, ConditionalAPIView):
+    """A trip's stops, with their destinations joined in the same query."""
+    serializer_class = ItineraryDestinationSerializer
+    catalog_fields = ('destination',)
+
+    def get_body(self, request, itinerary_id):
+        stops = ItineraryDestination.objects.filter(itinerary_id=itinerary_id)
+        if wants(self.fields, 'destination'):
+            stops = stops.select_related('destination')
+        else:
+            # The ordering columns too, or each row's cursor values would be loaded one by one
+            stops = stops.only(*ItineraryDestinationSerializer.columns_for(self.fields), *STOP_ORDERING)
+        page = paginate(request, stops, STOP_ORDERING)
+        return page_body(request, page, ItineraryDestinationSerializer(page.items, many=True, fields=self.fields))
+
+
+class ExpenseList(ConditionalAPIView):
+    """The user's expenses across all trips (or one, with ?itinerary=), latest first."""
+    serializer_class = ExpenseSerializer
+
+    def selected_itinerary(self, request):
+        itinerary_id = request.query_params.get('itinerary')
+        if itinerary_id is not None and not itinerary_id.isdigit():
+            raise ValidationError({'itinerary': 'Must be an itinerary id'})
+        return int(itinerary_id) if itinerary_id else None
+
+    def get_validators(self, request, **kwargs):
+        itineraries = Itinerary.objects.filter(user=request.user)
+        itinerary_id = self.selected_itinerary(request)
+        if itinerary_id is not None:
+            itineraries = itineraries.filter(pk=itinerary_id)
+        count, last = trips_stamp(itineraries)
+        if itinerary_id is not None and not count:
+            raise NotFound('No such itinerary')
+        return (count, last), last
+
+    def get_body(self, request, **kwargs):
+        expenses = Expense.objects.filter(itinerary__user=request.user)
+        itinerary_id = self.selected_itinerary(request)
+        if itinerary_id is not None:
+            expenses = expenses.filter(itinerary_id=itinerary_id)
+        if wants(self.fields, 'itinerary_title'):
+            expenses = expenses.select_related('itinerary')
+        else:
+            expenses = expenses.only(*ExpenseSerializer.columns_for(self.fields), 'date')
+        page = paginate(request, expenses, EXPENSE_ORDERING)
+        return page_body(request, page, ExpenseSerializer(page.items, many=True, fields=self.fields))
+
+
+class ItineraryStopBatch(APIView):
+    """
+    POST {"add": [...], "update": [...], "order": [...], "remove": [...]}
+    to change many of a trip's stops at once. Everything is validated
+    before anything is written, and the whole batch is applied or rejected
+    (400 with the errors per operation and index). Answers with the diff and
+    the trip's new totals instead of a redirect.
+    """
+
+    def post(self, request, itinerary_id):
+        with transaction.atomic():
+            # Locked so concurrent batches on one trip validate against each other's results
+            itinerary = Itinerary.objects.select_for_update().filter(pk=itinerary_id, user=request.user).first()
+            if itinerary is None:
+                raise NotFound('No such itinerary')
+            serializer = StopBatchSerializer(data=request.data, context={'itinerary': itinerary})
+            serializer.is_valid(raise_exception=True)
+            diff = apply_stop_batch(itinerary, serializer.validated_data)
+
+        summary = annotate_budget(Itinerary.objects.filter(pk=itinerary.pk)).first()
+        return Response({
+            'itinerary': ItinerarySerializer(summary, fields=TRIP_SUMMARY_FIELDS).data,
+            'added': ItineraryDestinationSerializer(diff['added'], many=True).data,
+            'changed': diff['changed'],
+            'removed': diff['removed'],
+        })
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 class SmartTravConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'SmartTrav'
+
+    def ready(self):
+        # Registers the throttle's and the upload queue's system checks
+        from . import throttle, uploads  # noqa: F401
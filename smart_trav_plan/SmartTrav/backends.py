@@ -0,0 +1,69 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+UserModel = get_user_model()
+
+
+def users_by_login(identifier):
+    """
+    Users whose email or username equals identifier, ignoring case, in one
+    query served by the LOWER(email) / LOWER(username) indexes.
+    """
+    value = (identifier or '').strip().lower()
+    if not value:
+        return UserModel._default_manager.none()
+    return (
+        UserModel._default_manager
+        .alias(email_lower=Lower('email'), username_lower=Lower('username'))
+        # Accounts without an email must never match on it
+        .filter((Q(email_lower=value) & ~Q(email='')) | Q(username_lower=value))
+        .order_by('pk')
+    )
+
+
+def pick_user(candidates, identifier):
+    """Something that looks like an email prefers the email match, otherwise the username match."""
+    value = (identifier or '').strip().lower()
+    by_email = [user for user in candidates if (user.email or '').lower() == value]
+    by_username = [user for user in candidates if user.username.lower() == value]
+    preferred = by_email + by_username if '@' in value else by_username + by_email
+    return preferred[0] if preferred else None
+
+
+class EmailOrUsernameBackend(ModelBackend):
+    """
+    Log in with either the email address or the username. One query finds
+    the account and the password is hashed exactly once, whether or not the
+    account exists, so failed attempts cost (and take) the same as
+    successful ones.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        if not username.strip():
+            # Same hashing cost as any other failed attempt
+            UserModel().set_password(password)
+            return None
+
+        user = pick_user(list(users_by_login(username)), username)
+        if user is None:
+            # Same hashing cost as a real check (see ModelBackend.authenticate)
+            UserModel().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+    def get_user(self, user_id):
+        # Called by AuthenticationMiddleware on every request; user.profile
+        # comes from the same query instead of a second one per page
+        try:
+            user = UserModel._default_manager.select_related('profile').get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,137 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db.models import Case, CharField, DecimalField, ExpressionWrapper, F, Q, Value, When
+
+from .rollups import ZERO, to_decimal
+
+# Spending at or above this share of the budget is flagged as at risk
+AT_RISK_PERCENT = 85
+
+BUDGET_GOOD = 'good'
+BUDGET_AT_RISK = 'at_risk'
+BUDGET_OVER = 'over'
+
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+CENTS = Decimal('0.01')
+
+
+def budget_status(budget, total_spent):
+    """Status for one trip, using the same thresholds as annotate_budget."""
+    if budget - total_spent < 0:
+        return BUDGET_OVER
+    if budget > 0 and total_spent * 100 >= budget * AT_RISK_PERCENT:
+        return BUDGET_AT_RISK
+    return BUDGET_GOOD
+
+
+def budget_message(status, remaining):
+    if status == BUDGET_OVER:
+        return f'Over Budget: ₱{abs(remaining):,.2f}'
+    if status == BUDGET_AT_RISK:
+        return f'Budget At Risk: ₱{remaining:,.2f} remaining'
+    return f'On Track: ₱{remaining:,.2f} remaining'
+
+
+def summarize(budget, destination_cost, expenses, days):
+    """Budget figures for one trip as exact Decimals."""
+    budget = to_decimal(budget)
+    total_destination_cost = to_decimal(destination_cost)
+    total_expenses = to_decimal(expenses)
+    total_spent = total_destination_cost + total_expenses
+    remaining = budget - total_spent
+    percentage = (total_spent * 100 / budget).quantize(CENTS, ROUND_HALF_UP) if budget > 0 else ZERO
+    status = budget_status(budget, total_spent)
+    return {
+        'total_destination_cost': total_destination_cost,
+        'total_expenses': total_expenses,
+        'total_spent': total_spent,
+        'budget_remaining': remaining,
+        'budget_percentage': percentage,
+        'budget_status': status,
+        'budget_message': budget_message(status, remaining),
+        'trip_days': days,
+        'daily_budget': (budget / days).quantize(CENTS, ROUND_HALF_UP) if days > 0 else ZERO,
+    }
+
+
+def get_itinerary_budget(itinerary):
+    """Budget figures for an itinerary, read from its maintained rollups (no queries)."""
+    return summarize(
+        itinerary.budget,
+        itinerary.destination_cost_total,
+        itinerary.expense_total,
+        itinerary.get_duration_days(),
+    )
+
+
+# --- Many itineraries at once, in SQL ---
+
+def annotate_budget(itineraries):
+    """
+    Add total_spent, budget_remaining and budget_status to an Itinerary
+    queryset, computed by the database from the rollup columns.
+    """
+    total_spent = ExpressionWrapper(F('destination_cost_total') + F('expense_total'), output_field=MONEY)
+    return itineraries.annotate(
+        total_spent=total_spent,
+        budget_remaining=ExpressionWrapper(F('budget') - total_spent, output_field=MONEY),
+        # Compared as spent * 100 >= budget * 85 to avoid integer division on SQLite
+        spent_percent_basis=ExpressionWrapper(total_spent * 100, output_field=MONEY),
+    ).annotate(
+        budget_status=Case(
+            When(budget_remaining__lt=0, then=Value(BUDGET_OVER)),
+            When(
+                Q(budget__gt=0) & Q(spent_percent_basis__gte=F('budget') * AT_RISK_PERCENT),
+                then=Value(BUDGET_AT_RISK),
+            ),
+            default=Value(BUDGET_GOOD),
+            output_field=CharField(),
+        )
+    )
+
+
+# --- What-if scenarios ---
+
+def _to_cents(value):
+    return int(to_decimal(value) * 100)
+
+
+def _scale(cents, factor):
+    """cents * factor, rounded half-up, in integer arithmetic."""
+    numerator, denominator = factor.as_integer_ratio()
+    product = cents * numerator
+    sign = -1 if product < 0 else 1
+    return sign * ((abs(product) * 2 + denominator) // (2 * denominator))
+
+
+def simulate_budgets(itineraries, price_change=ZERO, expense_change=ZERO, extra_days=0):
+    """
+    Project budget status for many itineraries under a what-if scenario:
+    destination prices and expenses scaled by (1 + change), and each trip
+    lengthened by extra_days. Money is held as integer centavos, so results
+    stay exact. Returns {itinerary id: summarize(...) dict}.
+    """
+    itineraries = list(itineraries)
+    # Plain int lists, one pass per column: this is ordinary Python
+    # arithmetic (not vectorized), cheaper than Decimal and never overflowing
+    budgets = [_to_cents(it.budget) for it in itineraries]
+    days = [it.get_duration_days() for it in itineraries]
+    new_days = [max(d + extra_days, 1) for d in days]
+    # Stop prices are price_per_day * days, so the per-day cost divides exactly
+    per_day = [_to_cents(it.destination_cost_total) // d for it, d in zip(itineraries, days)]
+    expenses = [_to_cents(it.expense_total) for it in itineraries]
+
+    price_factor = Decimal(1) + Decimal(str(price_change))
+    expense_factor = Decimal(1) + Decimal(str(expense_change))
+    destination_costs = [_scale(cost * d, price_factor) for cost, d in zip(per_day, new_days)]
+    expenses = [_scale(cost, expense_factor) for cost in expenses]
+
+    return {
+        it.pk: summarize(
+            Decimal(budgets[i]) / 100,
+            Decimal(destination_costs[i]) / 100,
+            Decimal(expenses[i]) / 100,
+            new_days[i],
+        )
+        for i, it in enumerate(itineraries)
+    }
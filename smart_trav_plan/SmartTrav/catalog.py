@@ -0,0 +1,262 @@
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import CatalogState, Destination
+from .pagination import KeysetPage, InvalidCursor, DEFAULT_PAGE_SIZE, decode_cursor, encode_cursor
+from .tags import parse_tags, get_available_tags, TAG_MATCH_ALL
+
+KEY_PREFIX = 'smarttrav:catalog'
+STATE_PK = 1
+
+
+class CatalogCache:
+    """
+    Two-tier cache for read-mostly catalog data. Entries are keyed by the
+    catalog version, so bumping the version (on any Destination change)
+    makes every older entry unreachable without having to find and delete it.
+
+    The version lives in the CatalogState row, so every worker and
+    management command sees a bump made by any other. Lookups re-read it (one
+    primary-key query) at most every `version_ttl` seconds, so another
+    worker's bump is seen that much later; a bump in this process is seen at
+    once. The local tier is a per-process LRU, plus pinned entries (the
+    snapshot) that the LRU never evicts; the shared tier is a Django cache
+    alias (Redis when REDIS_URL is set) that lets workers reuse each other's
+    snapshots.
+    """
+
+    def __init__(self, shared_alias='default', max_entries=32, version_ttl=1.0):
+        self.shared_alias = shared_alias
+        self.max_entries = max_entries
+        self.version_ttl = version_ttl
+        self._local = OrderedDict()
+        # name -> (key, value), one version each
+        self._pinned = {}
+        self._version = None
+        self._version_expires = 0.0
+        self._bumps = 0
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias] if self.shared_alias else None
+
+    def reset_stats(self):
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            'version': self.get_version(),
+            'entries': len(self._local),
+            'pinned': len(self._pinned),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+        }
+
+    # --- Versioning ---
+
+    def get_stamp(self):
+        """(version, changed_at) of the catalog."""
+        stamp = CatalogState.objects.filter(pk=STATE_PK).values_list('version', 'changed_at').first()
+        if stamp is None:
+            state, _ = CatalogState.objects.get_or_create(pk=STATE_PK)
+            stamp = (state.version, state.changed_at)
+        return stamp
+
+    def get_version(self):
+        # changed_at is part of the key: a bump rolled back with its
+        # transaction frees its number for reuse, but never its timestamp
+        version, changed_at = self.get_stamp()
+        return f'{version}.{changed_at.timestamp():.6f}'
+
+    def bump_version(self):
+        bumped = CatalogState.objects.filter(pk=STATE_PK).update(
+            version=F('version') + 1, changed_at=timezone.now(),
+        )
+        if not bumped:
+            CatalogState.objects.get_or_create(pk=STATE_PK, defaults={'version': 2})
+        with self._lock:
+            self._local.clear()
+            self._pinned.clear()
+            self._version = None
+            self._bumps += 1
+
+    def _current_version(self):
+        """get_version(), re-read at most every version_ttl seconds."""
+        if connection.in_atomic_block:
+            # Read inside a transaction, the version may come from a bump that is rolled back
+            return self.get_version()
+        now = time.monotonic()
+        with self._lock:
+            if self._version is not None and now < self._version_expires:
+                return self._version
+            bumps = self._bumps
+        version = self.get_version()
+        with self._lock:
+            # Not kept if a bump here raced the read
+            if bumps == self._bumps:
+                self._version, self._version_expires = version, now + self.version_ttl
+        return version
+
+    # --- Lookups ---
+
+    def _remember(self, name, key, value, pin):
+        with self._lock:
+            if pin:
+                self._pinned[name] = (key, value)
+                return
+            self._local[key] = value
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+                self.evictions += 1
+
+    def get(self, name, builder, shared=True, pin=False):
+        """
+        Return the cached value for `name` at the current version, building
+        it on a miss. A pinned entry is kept outside the LRU, so entries keyed
+        by user input (filters) cannot push it out.
+        """
+        key = f'{KEY_PREFIX}:{name}:v{self._current_version()}'
+
+        with self._lock:
+            pinned_key, value = self._pinned.get(name, (None, None))
+            if pinned_key == key:
+                self.hits += 1
+                return value
+            if key in self._local:
+                self._local.move_to_end(key)
+                self.hits += 1
+                return self._local[key]
+
+        if shared and self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                with self._lock:
+                    self.shared_hits += 1
+                self._remember(name, key, value, pin)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        value = builder()
+        if shared and self.shared is not None:
+            self.shared.set(key, value, timeout=getattr(settings, 'CATALOG_CACHE_TIMEOUT', 3600))
+        self._remember(name, key, value, pin)
+        return value
+
+
+catalog_cache = CatalogCache(
+    shared_alias=getattr(settings, 'CATALOG_CACHE_ALIAS', 'default'),
+    max_entries=getattr(settings, 'CATALOG_CACHE_MAX_ENTRIES', 32),
+    version_ttl=getattr(settings, 'CATALOG_VERSION_TTL', 1.0),
+)
+
+
+def bump_catalog_version():
+    """
+    Invalidate every cached catalog entry. Bumped again on commit so a
+    snapshot rebuilt mid-transaction (from pre-commit data) is not kept.
+    """
+    catalog_cache.bump_version()
+    transaction.on_commit(catalog_cache.bump_version)
+
+
+# --- Catalog snapshot ---
+
+class CatalogEntry:
+    """A destination as held in the snapshot, with its tags pre-parsed."""
+    __slots__ = ('destination', 'tags', 'sort_key')
+
+    def __init__(self, destination):
+        self.destination = destination
+        self.tags = frozenset(parse_tags(destination.tags))
+        self.sort_key = (destination.name, destination.pk)
+
+
+def _build_snapshot():
+    destinations = Destination.objects.defer('search_vector')
+    entries = [CatalogEntry(dest) for dest in destinations.iterator(chunk_size=2000)]
+    # Sorted in Python so bisecting on sort_key agrees with the list order
+    entries.sort(key=lambda entry: entry.sort_key)
+    return entries
+
+
+def get_catalog_snapshot():
+    """Every destination, sorted by (name, id), from the catalog cache."""
+    return catalog_cache.get('snapshot', _build_snapshot, pin=True)
+
+
+def get_cached_tags():
+    return catalog_cache.get('tags', get_available_tags, pin=True)
+
+
+def get_catalog_stamp():
+    """(version, changed_at) of the catalog, changed_at being the time of the last bump."""
+    return catalog_cache.get_stamp()
+
+
+def _matches(entry, filters, price_band, tags):
+    dest = entry.destination
+    if filters['active_category'] and dest.category != filters['active_category']:
+        return False
+    if price_band:
+        low, high = price_band
+        if low is not None and dest.price_per_day < low:
+            return False
+        if high is not None and dest.price_per_day >= high:
+            return False
+    if tags:
+        if filters['tag_mode'] == TAG_MATCH_ALL:
+            return tags <= entry.tags
+        return not tags.isdisjoint(entry.tags)
+    return True
+
+
+def filter_catalog(filters, price_bands):
+    """Snapshot entries matching the category/price/tag filters, still in (name, id) order."""
+    tags = frozenset(parse_tags(filters['tags_filter']))
+    price_band = price_bands.get(filters['price_filter'])
+    key = 'filter:{}:{}:{}:{}'.format(
+        filters['active_category'], filters['price_filter'], filters['tag_mode'], ','.join(sorted(tags))
+    )
+
+    def build():
+        return [entry for entry in get_catalog_snapshot() if _matches(entry, filters, price_band, tags)]
+
+    # Filter results are cheap to rebuild from the snapshot, so they stay local
+    return catalog_cache.get(key, build, shared=False)
+
+
+def paginate_catalog(entries, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """Keyset pagination over snapshot entries, cursor-compatible with keyset_paginate on ('name', 'id')."""
+    start = 0
+    if cursor:
+        name, pk = decode_cursor(cursor, 2)
+        if not isinstance(name, str) or not isinstance(pk, int):
+            raise InvalidCursor('Cursor does not match ordering')
+        start = bisect_right(entries, (name, pk), key=lambda entry: entry.sort_key)
+
+    window = entries[start:start + page_size + 1]
+    next_cursor = None
+    if len(window) > page_size:
+        window = window[:page_size]
+        next_cursor = encode_cursor(list(window[-1].sort_key))
+    return KeysetPage([entry.destination for entry in window], next_cursor)
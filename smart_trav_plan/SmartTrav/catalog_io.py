@@ -0,0 +1,197 @@
+import csv
+import io
+import json
+import struct
+import sys
+import zlib
+from array import array
+from decimal import Decimal
+from itertools import chain, islice
+from pathlib import Path
+
+from .destination_loader import LOADED_FIELDS
+from .models import Destination
+
+CATALOG_FIELDS = ('name',) + LOADED_FIELDS
+
+# --- Columnar format ---
+# MAGIC, uint32 schema length, JSON schema, then row groups of
+# uint32 row count followed by one zlib block per column (uint32 length
+# first); a row count of 0 ends the file. Text columns hold uint32 byte
+# lengths (NULL_LENGTH for None) then the UTF-8 data; price_per_day holds
+# int64 centavos. Everything is little-endian.
+COLUMNAR_MAGIC = b'STCOL\x00\x01\n'
+ROW_GROUP_SIZE = 4096
+NULL_LENGTH = 0xFFFFFFFF
+UINT32 = struct.Struct('<I')
+EXPORT_CHUNK_SIZE = 2000
+
+
+def export_rows(queryset=None):
+    """Catalog rows as dicts, streamed from the database in pk order."""
+    queryset = Destination.objects.all() if queryset is None else queryset
+    for values in queryset.order_by('pk').values_list(*CATALOG_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield dict(zip(CATALOG_FIELDS, values))
+
+
+def _text(handle):
+    return io.TextIOWrapper(handle, encoding='utf-8', newline='')
+
+
+# --- CSV ---
+
+def write_csv(rows, handle):
+    text = _text(handle)
+    writer = csv.DictWriter(text, CATALOG_FIELDS)
+    writer.writeheader()
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    text.detach()
+    return count
+
+
+def read_csv(handle):
+    yield from csv.DictReader(_text(handle))
+
+
+# --- JSON lines ---
+
+def _json_default(value):
+    # Prices stay exact strings rather than floats
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def write_jsonl(rows, handle):
+    text = _text(handle)
+    count = 0
+    for row in rows:
+        text.write(json.dumps(row, default=_json_default, ensure_ascii=False))
+        text.write('\n')
+        count += 1
+    text.detach()
+    return count
+
+
+def read_jsonl(handle):
+    for line in _text(handle):
+        if line.strip():
+            row = json.loads(line)
+            if isinstance(row.get('tags'), list):
+                row['tags'] = ', '.join(row['tags'])
+            if row.get('price_per_day') is not None:
+                row['price_per_day'] = Decimal(str(row['price_per_day']))
+            yield row
+
+
+# --- Columnar ---
+
+def _little_endian(values):
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+
+def _encode_column(field, values):
+    if field == 'price_per_day':
+        return _little_endian(array('q', (int(Decimal(value or 0) * 100) for value in values))).tobytes()
+    encoded = [value.encode() if value is not None else None for value in values]
+    lengths = _little_endian(array('I', (len(data) if data is not None else NULL_LENGTH for data in encoded)))
+    return lengths.tobytes() + b''.join(data for data in encoded if data is not None)
+
+
+def _decode_column(field, data, count):
+    if field == 'price_per_day':
+        cents = _little_endian(array('q', data[:count * 8]))
+        return [Decimal(value).scaleb(-2) for value in cents]
+    lengths = _little_endian(array('I', data[:count * 4]))
+    view = memoryview(data)
+    offset = count * 4
+    values = []
+    for length in lengths:
+        if length == NULL_LENGTH:
+            values.append(None)
+            continue
+        values.append(str(view[offset:offset + length], 'utf-8'))
+        offset += length
+    return values
+
+
+def write_columnar(rows, handle, row_group_size=ROW_GROUP_SIZE):
+    """One row group in memory at a time, each column compressed on its own."""
+    schema = json.dumps({'fields': CATALOG_FIELDS}).encode()
+    handle.write(COLUMNAR_MAGIC + UINT32.pack(len(schema)) + schema)
+    rows = iter(rows)
+    count = 0
+    while group := list(islice(rows, row_group_size)):
+        handle.write(UINT32.pack(len(group)))
+        for field in CATALOG_FIELDS:
+            block = zlib.compress(_encode_column(field, [row.get(field) for row in group]), 6)
+            handle.write(UINT32.pack(len(block)) + block)
+        count += len(group)
+    handle.write(UINT32.pack(0))
+    return count
+
+
+def _read_exact(handle, size):
+    data = handle.read(size)
+    if len(data) != size:
+        raise ValueError('Truncated columnar catalog')
+    return data
+
+
+def read_columnar(handle):
+    if handle.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+        raise ValueError('Not a columnar catalog file')
+    (length,) = UINT32.unpack(_read_exact(handle, 4))
+    fields = json.loads(_read_exact(handle, length))['fields']
+    while True:
+        (count,) = UINT32.unpack(_read_exact(handle, 4))
+        if not count:
+            return
+        columns = []
+        for field in fields:
+            (length,) = UINT32.unpack(_read_exact(handle, 4))
+            columns.append(_decode_column(field, zlib.decompress(_read_exact(handle, length)), count))
+        for values in zip(*columns):
+            yield dict(zip(fields, values))
+
+
+FORMATS = {
+    'csv': (write_csv, read_csv),
+    'jsonl': (write_jsonl, read_jsonl),
+    'columnar': (write_columnar, read_columnar),
+}
+EXTENSIONS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.stcol': 'columnar'}
+
+
+def guess_format(path):
+    try:
+        return EXTENSIONS[Path(path).suffix.lower()]
+    except KeyError:
+        raise ValueError(f'Cannot tell the format of {path}; use one of {", ".join(sorted(EXTENSIONS))}')
+
+
+def write_catalog(rows, handle, format):
+    """Write rows (any iterable of dicts) to a binary handle; returns the row count."""
+    return FORMATS[format][0](rows, handle)
+
+
+def read_catalog(handle, format):
+    """
+    (fields, rows) from a binary handle; rows are produced lazily and
+    fields are the columns of the first row, so a file without e.g. a
+    tags column leaves stored tags alone on import. JSON lines have no
+    header, so fields are every catalog column and each row's own keys
+    decide what it changes.
+    """
+    rows = FORMATS[format][1](handle)
+    if format == 'jsonl':
+        return list(CATALOG_FIELDS), rows
+    first = next(rows, None)
+    if first is None:
+        return [], iter(())
+    return list(first), chain([first], rows)
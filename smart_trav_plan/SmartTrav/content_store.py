@@ -0,0 +1,56 @@
+import hashlib
+
+from django.conf import settings
+from django.core.files import File
+
+from .models import StoredObject
+from .streaming_upload import upload_file
+
+# Content-addressed objects never change, so caches may keep them forever
+IMMUTABLE_CACHE_CONTROL = getattr(settings, 'IMMUTABLE_CACHE_CONTROL', 'public, max-age=31536000, immutable')
+
+
+def content_hash(file):
+    """SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_path(digest, filename):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in (filename or '') else 'bin'
+    return f'{digest}.{extension}'
+
+
+def lookup(bucket, digest):
+    return StoredObject.objects.filter(bucket=bucket, sha256=digest).first()
+
+
+def store_file(file, bucket, content_type=None):
+    """
+    Store a file under the SHA-256 of its bytes and return its StoredObject.
+    Content that was stored before is answered from the index without
+    touching the network.
+    """
+    file = file if isinstance(file, File) else File(file)
+    digest = content_hash(file)
+    known = lookup(bucket, digest)
+    if known:
+        return known
+
+    path = content_path(digest, file.name)
+    # upsert: a concurrent upload of the same bytes writes the same object
+    url = upload_file(file, path, bucket, content_type, upsert=True, cache_control=IMMUTABLE_CACHE_CONTROL)
+    stored, _ = StoredObject.objects.get_or_create(bucket=bucket, sha256=digest, defaults={
+        'path': path,
+        'public_url': url,
+        'size': file.size,
+        'content_type': content_type or '',
+    })
+    return stored
+
+
+def store_upload(file, bucket, filename, content_type):
+    """store_file for a staged upload queue file, named after the original upload; returns the public URL."""
+    return store_file(File(file, name=filename), bucket, content_type).public_url
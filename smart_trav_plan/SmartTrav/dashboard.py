@@ -0,0 +1,196 @@
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.db.models import Count, DecimalField, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Destination, Itinerary, SavedDestination, Expense, UploadJob
+from .budget import annotate_budget
+from .catalog import filter_catalog, get_cached_tags, paginate_catalog
+from .pagination import keyset_paginate, DEFAULT_PAGE_SIZE
+from .search import search_destinations, SEARCH_ORDERING
+from .uploads import get_pending_upload
+from .tags import filter_destinations_by_tags, TAG_MATCH_ANY, TAG_MATCH_MODES
+
+# Stable keyset orderings; the trailing id makes every position unique
+CATALOG_ORDERING = ('name', 'id')
+SAVED_ORDERING = ('-saved_at', '-id')
+EXPENSE_ORDERING = ('-date', '-id')
+
+# Price filter bands as [low, high) in PHP per day
+PRICE_BANDS = {
+    'budget': (None, 2000),
+    'moderate': (2000, 3000),
+    'premium': (3000, 4000),
+    'luxury': (4000, None),
+}
+
+
+def _subquery_total(queryset, expression, output_field):
+    """Wrap a per-user aggregate as a scalar subquery correlated on the user row."""
+    aggregate = (
+        queryset.order_by()
+        .values('user')
+        .annotate(total=expression)
+        .values('total')
+    )
+    return Coalesce(Subquery(aggregate, output_field=output_field), Value(0), output_field=output_field)
+
+
+def get_dashboard_summary(user):
+    """Return the overview numbers for a user's dashboard in a single query."""
+    today = date.today()
+    itineraries = Itinerary.objects.filter(user=OuterRef('pk'))
+    saved = SavedDestination.objects.filter(user=OuterRef('pk'))
+    money = DecimalField(max_digits=12, decimal_places=2)
+
+    summary = User.objects.filter(pk=user.pk).annotate(
+        itinerary_count=_subquery_total(itineraries, Count('pk'), IntegerField()),
+        saved_count=_subquery_total(saved, Count('pk'), IntegerField()),
+        total_budget=_subquery_total(itineraries, Sum('budget'), money),
+        upcoming_trips=_subquery_total(
+            itineraries.filter(start_date__gte=today), Count('pk'), IntegerField()
+        ),
+    ).values('itinerary_count', 'saved_count', 'total_budget', 'upcoming_trips').first()
+
+    return summary or {
+        'itinerary_count': 0,
+        'saved_count': 0,
+        'total_budget': 0,
+        'upcoming_trips': 0,
+    }
+
+
+def get_user_itineraries(user):
+    """
+    All of a user's trips, newest first. Stop counts come from the
+    destination_count rollup and budget health is computed in the same query.
+    """
+    return list(annotate_budget(Itinerary.objects.filter(user=user)).order_by('-id'))
+
+
+def get_saved_page(user, cursor=None):
+    """One page of saved places, with their destination loaded in the same query."""
+    saved = SavedDestination.objects.filter(user=user).select_related('destination')
+    return keyset_paginate(saved, SAVED_ORDERING, cursor)
+
+
+def get_expense_page(user, cursor=None):
+    """One page of expenses across all trips, with the parent itinerary loaded."""
+    expenses = Expense.objects.filter(itinerary__user=user).select_related('itinerary')
+    return keyset_paginate(expenses, EXPENSE_ORDERING, cursor)
+
+
+def get_catalog_filters(params):
+    """Read the Explore filters from a GET QueryDict."""
+    tag_mode = params.get('tag_mode', TAG_MATCH_ANY)
+    return {
+        'active_category': params.get('category', ''),
+        'search_query': params.get('search', '').strip(),
+        'price_filter': params.get('price', ''),
+        'tags_filter': params.get('tags', '').strip(),
+        'tag_mode': tag_mode if tag_mode in TAG_MATCH_MODES else TAG_MATCH_ANY,
+    }
+
+
+def filter_destinations(filters):
+    """Apply the Explore filters; returns the queryset and its keyset ordering."""
+    destinations = Destination.objects.all()
+    ordering = CATALOG_ORDERING
+
+    if filters['active_category']:
+        destinations = destinations.filter(category=filters['active_category'])
+
+    if filters['price_filter'] in PRICE_BANDS:
+        low, high = PRICE_BANDS[filters['price_filter']]
+        if low is not None:
+            destinations = destinations.filter(price_per_day__gte=low)
+        if high is not None:
+            destinations = destinations.filter(price_per_day__lt=high)
+
+    if filters['tags_filter']:
+        destinations = filter_destinations_by_tags(
+            destinations, filters['tags_filter'].split(','), filters['tag_mode']
+        )
+
+    if filters['search_query']:
+        # Ranked full-text search; results come back best match first
+        destinations = search_destinations(destinations, filters['search_query'])
+        ordering = SEARCH_ORDERING
+
+    return destinations, ordering
+
+
+def get_destination_page(filters, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    if not filters['search_query']:
+        # Category/price/tag browsing is answered from the cached catalog snapshot
+        return paginate_catalog(filter_catalog(filters, PRICE_BANDS), cursor, page_size)
+    destinations, ordering = filter_destinations(filters)
+    return keyset_paginate(destinations, ordering, cursor, page_size)
+
+
+def get_recent_itineraries(user, limit=3):
+    return list(Itinerary.objects.filter(user=user).order_by('-id')[:limit])
+
+
+# --- Per-section contexts: each dashboard section is built on its own ---
+
+def _overview_context(user, params):
+    context = get_dashboard_summary(user)
+    context['recent_itineraries'] = get_recent_itineraries(user)
+    return context
+
+
+def _itineraries_context(user, params):
+    return {'all_itineraries': get_user_itineraries(user)}
+
+
+def _destinations_context(user, params):
+    filters = get_catalog_filters(params)
+    return {
+        **filters,
+        'destinations': get_destination_page(filters),
+        # Tag suggestions come from the maintained tag index
+        'available_tags': get_cached_tags(),
+    }
+
+
+def _saved_context(user, params):
+    return {'saved_destinations': get_saved_page(user)}
+
+
+def _budget_context(user, params):
+    return {
+        'all_itineraries': get_user_itineraries(user),
+        'expenses': get_expense_page(user),
+    }
+
+
+def _profile_context(user, params):
+    return {
+        'pending_picture_upload': get_pending_upload(
+            requested_by=user, target=UploadJob.TARGET_PROFILE_PICTURE
+        ),
+    }
+
+
+# Sections shown in the sidebar, in order
+DASHBOARD_SECTIONS = ('overview', 'itineraries', 'destinations', 'saved', 'budget', 'profile')
+
+# Every lazily loaded fragment: section name -> (template, context builder)
+DASHBOARD_FRAGMENTS = {
+    'overview': ('SmartTrav/accounts/partials/section_overview.html', _overview_context),
+    'itineraries': ('SmartTrav/accounts/partials/section_itineraries.html', _itineraries_context),
+    'destinations': ('SmartTrav/accounts/partials/section_destinations.html', _destinations_context),
+    'saved': ('SmartTrav/accounts/partials/section_saved.html', _saved_context),
+    'budget': ('SmartTrav/accounts/partials/section_budget.html', _budget_context),
+    'profile': ('SmartTrav/accounts/partials/section_profile.html', _profile_context),
+    # The add-to-trip modal's list of trips
+    'trip_options': ('SmartTrav/accounts/partials/trip_options.html', _itineraries_context),
+}
+
+
+def get_section_fragment(section, user, params):
+    """Template name and context for one dashboard section; KeyError if unknown."""
+    template, build_context = DASHBOARD_FRAGMENTS[section]
+    return template, build_context(user, params)
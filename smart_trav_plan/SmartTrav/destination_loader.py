@@ -0,0 +1,169 @@
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import transaction
+
+from .catalog import bump_catalog_version
+from .models import Destination
+from .pricing import reprice_destinations
+from .search import refresh_search_vectors
+from .tags import sync_destination_tags
+
+# Columns a catalog file may carry besides name; absent columns leave the field untouched
+LOADED_FIELDS = ('description', 'location', 'category', 'price_range', 'image_url', 'price_per_day', 'tags')
+CATEGORIES = {value for value, _ in Destination._meta.get_field('category').choices}
+CHUNK_SIZE = 2000
+BATCH_SIZE = 500
+
+
+class InvalidRow(ValueError):
+    pass
+
+
+def clean_value(field, value):
+    """Normalize a CSV cell (or a stored value) so equal data compares equal."""
+    if field == 'price_per_day':
+        try:
+            return Decimal(str(value).strip()).quantize(Decimal('0.01'))
+        except InvalidOperation:
+            raise InvalidRow(f'price_per_day {value!r} is not a number')
+    value = (value or '').strip()
+    if field == 'image_url':
+        return value or None
+    return value
+
+
+def clean_row(row, fields):
+    """(name, {field: value}) for the `fields` this row carries; a key the row leaves out is left unchanged."""
+    name = (row.get('name') or '').strip()
+    if not name:
+        raise InvalidRow('missing name')
+    values = {field: clean_value(field, row[field]) for field in fields if field in row}
+    if values.get('category', 'beach') not in CATEGORIES:
+        raise InvalidRow(f"unknown category {values['category']!r}")
+    return name, values
+
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def diff_chunk(chunk, fields, planned):
+    """
+    Compare a chunk of {name: values} against the stored destinations
+    (keyed by name; the oldest row wins if names repeat). `planned` holds
+    rows created by earlier chunks of a dry run, which are not in the
+    database. Returns (creates, updates, unchanged) where updates are
+    (existing values, changed fields) pairs.
+    """
+    existing = {}
+    stored = Destination.objects.filter(name__in=list(chunk)).order_by('-pk').values('pk', 'name', *fields)
+    for row in stored:
+        existing[row['name']] = row
+    for name, values in planned.items():
+        if name in chunk:
+            existing.setdefault(name, {'pk': None, 'name': name, **values})
+
+    creates, updates, unchanged = [], [], 0
+    for name, values in chunk.items():
+        current = existing.get(name)
+        if current is None:
+            creates.append((name, values))
+            continue
+        # A dry run's planned row only has the fields its own file row carried
+        changes = {
+            field: (clean_value(field, current[field]) if field in current else None, value)
+            for field, value in values.items()
+            if field not in current or clean_value(field, current[field]) != value
+        }
+        if changes:
+            updates.append((current, changes))
+        else:
+            unchanged += 1
+    return creates, updates, unchanged
+
+
+def _apply(creates, updates, fields, batch_size):
+    created = Destination.objects.bulk_create(
+        [Destination(name=name, **values) for name, values in creates], batch_size=batch_size,
+    )
+    if updates:
+        changed_fields = sorted({field for _, changes in updates for field in changes})
+        Destination.objects.bulk_update([
+            Destination(pk=current['pk'], **{
+                **{field: current[field] for field in fields},
+                **{field: new for field, (_, new) in changes.items()},
+            })
+            for current, changes in updates
+        ], changed_fields, batch_size=batch_size)
+
+    # bulk_create/bulk_update skip the post_save signals; do their work per chunk
+    touched = [dest.pk for dest in created] + [current['pk'] for current, _ in updates]
+    retagged = [dest for dest in created if dest.tags] + [
+        Destination(pk=current['pk'], tags=changes['tags'][1]) for current, changes in updates if 'tags' in changes
+    ]
+    if retagged:
+        sync_destination_tags(retagged)
+    if touched:
+        refresh_search_vectors(Destination.objects.filter(pk__in=touched))
+    repriced = [current['pk'] for current, changes in updates if 'price_per_day' in changes]
+    if repriced:
+        reprice_destinations(repriced)
+
+
+def load_destinations(rows, fields, dry_run=False, chunk_size=CHUNK_SIZE, batch_size=BATCH_SIZE, on_change=None):
+    """
+    Upsert destinations by name from an iterable of dicts (e.g. a
+    csv.DictReader), chunk_size rows at a time, in one transaction: each
+    chunk costs one read plus batched bulk_create/bulk_update writes.
+    Only `fields` are written, and of those only the keys a row carries, so
+    columns missing from the file (or keys missing from a JSONL row) keep
+    their stored values. Within the file later rows for a name win, key by
+    key.
+
+    on_change(action, name, detail) is called for each 'create', 'update'
+    (detail: {field: (old, new)}) and 'invalid' (detail: message) row.
+    With dry_run nothing is written. Returns the counts per outcome.
+    """
+    fields = [field for field in LOADED_FIELDS if field in fields]
+    counts = {'created': 0, 'updated': 0, 'unchanged': 0, 'invalid': 0}
+    planned = {}
+
+    with transaction.atomic():
+        for chunk_rows in _chunks(enumerate(rows, start=2), chunk_size):
+            chunk = {}
+            for line, row in chunk_rows:
+                try:
+                    name, values = clean_row(row, fields)
+                except InvalidRow as e:
+                    counts['invalid'] += 1
+                    if on_change:
+                        on_change('invalid', row.get('name') or f'line {line}', f'line {line}: {e}')
+                    continue
+                # A later row for the same name overrides the keys it carries
+                chunk[name] = {**chunk.pop(name, {}), **values}
+
+            creates, updates, unchanged = diff_chunk(chunk, fields, planned)
+            counts['created'] += len(creates)
+            counts['updated'] += len(updates)
+            counts['unchanged'] += unchanged
+            if on_change:
+                for name, values in creates:
+                    on_change('create', name, values)
+                for current, changes in updates:
+                    on_change('update', current['name'], changes)
+
+            if dry_run:
+                planned.update(creates)
+                for current, changes in updates:
+                    if current['pk'] is None:
+                        planned[current['name']].update({field: new for field, (_, new) in changes.items()})
+            else:
+                _apply(creates, updates, fields, batch_size)
+
+        if not dry_run and (counts['created'] or counts['updated']):
+            bump_catalog_version()
+    return counts
+
@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import httpx
+from django.utils import timezone
+
+from .models import Destination, ImageProbe, Profile
+
+# HEAD is not allowed everywhere; these answers fall back to a one-byte ranged GET
+HEAD_UNSUPPORTED = {403, 405, 501}
+
+
+class HostRateLimiter:
+    """Spaces requests to the same host at least 1/rate seconds apart, across threads."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = defaultdict(float)
+
+    def wait(self, host):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot[host])
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def collect_image_urls():
+    """{url: ['destination #3', 'profile #7', ...]} for every image URL in use."""
+    owners = defaultdict(list)
+    sources = (
+        ('destination', Destination.objects.values_list('pk', 'image_url')),
+        ('profile', Profile.objects.values_list('pk', 'profile_picture_url')),
+    )
+    for label, rows in sources:
+        for pk, url in rows.iterator(chunk_size=1000):
+            if url and url.startswith(('http://', 'https://')):
+                owners[url].append(f'{label} #{pk}')
+    return dict(owners)
+
+
+def stale_urls(urls, max_age):
+    """The urls never probed or last probed longer than max_age ago."""
+    cutoff = timezone.now() - max_age
+    fresh = set(
+        ImageProbe.objects.filter(url__in=urls, checked_at__gte=cutoff).values_list('url', flat=True)
+    )
+    return [url for url in urls if url not in fresh]
+
+
+def _header_size(name, value):
+    try:
+        size = int(value.strip())
+    except ValueError:
+        size = -1
+    if size < 0:
+        raise ValueError(f'Malformed {name} header: {value!r}')
+    return size
+
+
+def _size(response):
+    """The object's size in bytes, or None if not reported; ValueError if a header is malformed."""
+    # A ranged GET reports the full size after the slash: "bytes 0-0/48213"
+    content_range = response.headers.get('content-range', '')
+    if '/' in content_range and not content_range.endswith('/*'):
+        return _header_size('Content-Range', content_range.rsplit('/', 1)[1])
+    length = response.headers.get('content-length')
+    return _header_size('Content-Length', length) if length is not None and response.status_code == 200 else None
+
+
+def probe(client, url, limiter):
+    """HEAD the url (ranged GET where HEAD is refused) and describe the answer."""
+    started = time.perf_counter()
+    try:
+        host = httpx.URL(url).host
+        limiter.wait(host)
+        started = time.perf_counter()
+        response = client.head(url)
+        if response.status_code in HEAD_UNSUPPORTED:
+            limiter.wait(host)
+            with client.stream('GET', url, headers={'Range': 'bytes=0-0'}) as response:
+                pass
+    except (httpx.HTTPError, httpx.InvalidURL) as e:
+        # A URL that does not even parse is that row's error too
+        return {'url': url, 'status': None, 'content_type': '', 'size': None,
+                'latency_ms': (time.perf_counter() - started) * 1000,
+                'error': f'{type(e).__name__}: {e}'[:255]}
+    latency_ms = (time.perf_counter() - started) * 1000
+    try:
+        size, error = _size(response), ''
+    except ValueError as e:
+        # One host's odd headers are that URL's problem, not the whole run's
+        size, error = None, str(e)[:255]
+    return {
+        'url': url,
+        'status': response.status_code,
+        'content_type': response.headers.get('content-type', '').split(';')[0].strip()[:100],
+        'size': size,
+        'latency_ms': latency_ms,
+        'error': error,
+    }
+
+
+def probe_urls(urls, concurrency=16, per_host_rate=10, timeout=10.0):
+    """
+    Probe every url on `concurrency` threads sharing one keep-alive pool,
+    never exceeding per_host_rate requests a second to any single host.
+    Returns the results in the order of urls.
+    """
+    limiter = HostRateLimiter(per_host_rate)
+    client = httpx.Client(
+        timeout=timeout,
+        follow_redirects=True,
+        limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        headers={'User-Agent': 'SmartTrav image check'},
+    )
+    with client, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(lambda url: probe(client, url, limiter), urls))
+
+
+def save_probes(results):
+    """Upsert the results into the ImageProbe table (one row per url)."""
+    now = timezone.now()
+    ImageProbe.objects.bulk_create(
+        [ImageProbe(checked_at=now, **result) for result in results],
+        update_conflicts=True,
+        unique_fields=['url'],
+        update_fields=['status', 'content_type', 'size', 'latency_ms', 'error', 'checked_at'],
+    )
+
+
+def check_images(max_age=timedelta(hours=24), recheck_all=False, **probe_options):
+    """
+    Probe the image URLs whose last result is older than max_age (all of
+    them with recheck_all) and record the results.
+    Returns (owners by url, ImageProbes of every url in use, number probed).
+    """
+    owners = collect_image_urls()
+    urls = list(owners) if recheck_all else stale_urls(list(owners), max_age)
+    save_probes(probe_urls(urls, **probe_options))
+    probes = ImageProbe.objects.filter(url__in=list(owners)).order_by('url')
+    return owners, list(probes), len(urls)
@@ -0,0 +1,208 @@
+import json
+import mimetypes
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from django.core.files import File
+
+from .catalog import bump_catalog_version
+from .content_store import IMMUTABLE_CACHE_CONTROL, content_hash, content_path
+from .models import Destination, StoredObject
+from .streaming_upload import upload_file
+
+
+class Checkpoint:
+    """
+    Append-only JSON-lines log of finished uploads. A run that is interrupted
+    after uploading but before its database batch was written replays the
+    log on the next start instead of uploading those files again.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._handle = None
+
+    def load(self):
+        if not self.path.exists():
+            return []
+        entries = []
+        with open(self.path) as handle:
+            for line in handle:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    # A line cut short by the interruption; that file is simply uploaded again
+                    continue
+        return entries
+
+    def record(self, entry):
+        with self._lock:
+            if self._handle is None:
+                self._handle = open(self.path, 'a')
+            self._handle.write(json.dumps(entry) + '\n')
+            self._handle.flush()
+
+    def close(self):
+        with self._lock:
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+
+    def clear(self):
+        self.close()
+        self.path.unlink(missing_ok=True)
+
+
+class Progress:
+    """Completed/failed counts and throughput (images/s, MB/s) since the run started."""
+
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.uploaded = 0
+        self.bytes = 0
+        self.started = time.perf_counter()
+
+    def add(self, result):
+        self.done += 1
+        self.bytes += result['size']
+        self.uploaded += result['uploaded']
+
+    def line(self):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        return (
+            f'{self.done + self.failed}/{self.total} | {self.done / elapsed:.1f} img/s | '
+            f'{self.bytes / elapsed / (1024 * 1024):.2f} MB/s | failed {self.failed}'
+        )
+
+
+def is_local(image_url):
+    return bool(image_url) and not image_url.startswith(('http://', 'https://'))
+
+
+def find_candidates(source_dir, queryset=None):
+    """
+    Destinations whose image_url is still a path under MEDIA_ROOT (what the
+    old ImageField stored, e.g. "images/beach.jpg"), as
+    (pk, stored path, absolute file path) tuples.
+    """
+    queryset = Destination.objects.all() if queryset is None else queryset
+    rows = queryset.exclude(image_url__isnull=True).exclude(image_url='').values_list('pk', 'image_url')
+    return [
+        (pk, image_url, Path(source_dir) / image_url.lstrip('/'))
+        for pk, image_url in rows.iterator(chunk_size=1000)
+        if is_local(image_url)
+    ]
+
+
+def upload_one(candidate, bucket, known):
+    """
+    Hash and upload one file (runs on a pool thread, so no database access:
+    known maps sha256 -> public URL of content already in the bucket).
+    """
+    pk, source, file_path = candidate
+    with open(file_path, 'rb') as handle:
+        file = File(handle, name=file_path.name)
+        digest = content_hash(file)
+        content_type = mimetypes.guess_type(file_path.name)[0] or 'application/octet-stream'
+        result = {
+            'id': pk, 'source': source, 'sha256': digest, 'size': file.size,
+            'content_type': content_type, 'path': content_path(digest, file_path.name),
+        }
+        if digest in known:
+            return {**result, 'url': known[digest], 'uploaded': False}
+        file.seek(0)
+        url = upload_file(file, result['path'], bucket, content_type, upsert=True,
+                          cache_control=IMMUTABLE_CACHE_CONTROL)
+    return {**result, 'url': url, 'uploaded': True}
+
+
+def write_batch(results, bucket):
+    """
+    Point the destinations at their uploaded copies and index the new
+    objects. Rows whose image_url changed since they were read are left
+    alone. bulk_update skips the post_save signals, so the catalog cache is
+    bumped here.
+    """
+    if not results:
+        return 0
+    current = dict(Destination.objects.filter(pk__in=[r['id'] for r in results]).values_list('pk', 'image_url'))
+    changed = [
+        Destination(pk=r['id'], image_url=r['url'])
+        for r in results if current.get(r['id']) == r['source']
+    ]
+    Destination.objects.bulk_update(changed, ['image_url'])
+    StoredObject.objects.bulk_create([
+        StoredObject(bucket=bucket, sha256=r['sha256'], path=r['path'], public_url=r['url'],
+                     size=r['size'], content_type=r['content_type'])
+        for r in results if r['uploaded']
+    ], ignore_conflicts=True)
+    if changed:
+        bump_catalog_version()
+    return len(changed)
+
+
+def migrate_images(candidates, bucket, checkpoint, concurrency=8, batch_size=200,
+                   report=None, progress_every=50):
+    """
+    Upload the candidates on a pool of `concurrency` threads, writing
+    results to the database every `batch_size` completions. At most
+    2 x concurrency uploads are queued at a time so huge migrations don't
+    hold every pending future (and its file) at once. report(progress,
+    failure) is called after each failure and every `progress_every`
+    completions. Returns the Progress.
+    """
+    # Uploads an interrupted run logged but never wrote to the database
+    resumed = {entry['id']: entry for entry in checkpoint.load()}
+    write_batch(list(resumed.values()), bucket)
+    candidates = [candidate for candidate in candidates if candidate[0] not in resumed]
+
+    known = dict(StoredObject.objects.filter(bucket=bucket).values_list('sha256', 'public_url'))
+    progress = Progress(len(candidates))
+    pending_rows = []
+    remaining = iter(candidates)
+
+    def flush():
+        write_batch(pending_rows, bucket)
+        pending_rows.clear()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        in_flight = {}
+
+        def fill():
+            for candidate in remaining:
+                in_flight[pool.submit(upload_one, candidate, bucket, known)] = candidate
+                if len(in_flight) >= concurrency * 2:
+                    return
+
+        fill()
+        while in_flight:
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                candidate = in_flight.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    progress.failed += 1
+                    if report:
+                        report(progress, (candidate, e))
+                    continue
+                known[result['sha256']] = result['url']
+                checkpoint.record(result)
+                pending_rows.append(result)
+                progress.add(result)
+                if report and progress.done % progress_every == 0:
+                    report(progress, None)
+            if len(pending_rows) >= batch_size:
+                flush()
+            fill()
+
+    flush()
+    # Everything logged is in the database now; failures are retried as
+    # ordinary candidates on the next run since their image_url is unchanged
+    checkpoint.clear()
+    return progress
@@ -0,0 +1,81 @@
+import io
+import re
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .content_store import IMMUTABLE_CACHE_CONTROL
+from .streaming_upload import upload_file
+
+# Widths (px) of the WebP derivatives generated for every uploaded image
+DERIVATIVE_WIDTHS = getattr(settings, 'IMAGE_DERIVATIVE_WIDTHS', (320, 640, 1024))
+WEBP_QUALITY = getattr(settings, 'IMAGE_WEBP_QUALITY', 80)
+
+PUBLIC_URL_RE = re.compile(r'/storage/v1/object/public/(?P<bucket>[^/]+)/(?P<path>.+)$')
+
+
+def parse_public_url(url):
+    """(bucket, path) of a Supabase public object URL, or None for other URLs."""
+    match = PUBLIC_URL_RE.search(url or '')
+    return (match.group('bucket'), match.group('path')) if match else None
+
+
+def derivative_path(path, width):
+    """photos/beach.jpg -> photos/beach-640w.webp, stored next to the original."""
+    stem = path.rsplit('.', 1)[0] if '.' in path.rsplit('/', 1)[-1] else path
+    return f'{stem}-{width}w.webp'
+
+
+def render_derivatives(source, widths=DERIVATIVE_WIDTHS):
+    """
+    Resize an image (bytes or file) to each width and encode it as WebP.
+    Widths larger than the original are skipped, but the smallest one is
+    always produced so every image gets at least one derivative.
+    Returns {width: webp bytes}; {} if the source is not a readable image.
+    """
+    try:
+        image = Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+        image = ImageOps.exif_transpose(image)
+    except (UnidentifiedImageError, OSError):
+        return {}
+    image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+
+    targets = [width for width in sorted(widths) if width < image.width] or [min(image.width, min(widths))]
+    derivatives = {}
+    for width in targets:
+        height = max(round(image.height * width / image.width), 1)
+        resized = image.resize((width, height), Image.LANCZOS)
+        buffer = io.BytesIO()
+        resized.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=4)
+        derivatives[width] = buffer.getvalue()
+    return derivatives
+
+
+def build_variants(source, public_url):
+    """
+    Generate and upload the derivatives of the image at `public_url`.
+    Returns {'source': public_url, '<width>': url, ...} for the model's
+    variants field; 'source' lets stale variants be detected after the
+    original URL changes.
+    """
+    location = parse_public_url(public_url)
+    if location is None:
+        return {}
+    bucket, path = location
+    variants = {'source': public_url}
+    for width, data in render_derivatives(source).items():
+        target = derivative_path(path, width)
+        variants[str(width)] = upload_file(
+            ContentFile(data, name=target), target, bucket, 'image/webp',
+            upsert=True, cache_control=IMMUTABLE_CACHE_CONTROL,
+        )
+    return variants
+
+
+def srcset(variants, source_url):
+    """'url 320w, url 640w' for an <img srcset>, smallest first; '' if the variants are for another image."""
+    if not variants or variants.get('source') != source_url:
+        return ''
+    widths = sorted(int(key) for key in variants if key.isdigit())
+    return ', '.join(f'{variants[str(width)]} {width}w' for width in widths)
@@ -0,0 +1,68 @@
+from django.db import transaction
+
+from .models import ItineraryDestination
+from .rollups import defer_rollups, refresh_itinerary_rollups
+
+SCHEDULE_FIELDS = ('visit_date', 'visit_time', 'notes')
+
+
+def apply_stop_batch(itinerary, batch):
+    """
+    Apply a validated StopBatchSerializer batch to `itinerary` in one
+    transaction: a single DELETE for the removals, bulk_update for the
+    reschedules and new positions, bulk_create for the additions, and one
+    rollup refresh instead of one rollup update per stop.
+
+    Returns the diff: {'added': [new stops], 'changed': [{'id': pk, field:
+    new value, ...}] (changed fields only), 'removed': [pks]}.
+    """
+    stops, destinations = batch['stops'], batch['destinations']
+    removed = sorted(set(batch['remove']))
+    changed = {}
+
+    for item in batch['update']:
+        stop = stops[item['id']]
+        for field in SCHEDULE_FIELDS:
+            if field in item and getattr(stop, field) != item[field]:
+                setattr(stop, field, item[field])
+                changed.setdefault(stop.pk, {})[field] = item[field]
+
+    if batch.get('order') is not None:
+        for position, pk in enumerate(batch['order']):
+            if stops[pk].position != position:
+                stops[pk].position = position
+                changed.setdefault(pk, {})['position'] = position
+
+    remaining = [stop for pk, stop in stops.items() if pk not in removed]
+    next_position = max((stop.position for stop in remaining), default=-1) + 1
+    days = itinerary.get_duration_days()
+    new_stops = [
+        ItineraryDestination(
+            itinerary=itinerary,
+            destination=destinations[item['destination']],
+            visit_date=item.get('visit_date'),
+            visit_time=item.get('visit_time'),
+            notes=item.get('notes', ''),
+            position=next_position + offset,
+            # bulk_create skips ItineraryDestination.save, which normally prices the stop
+            calculated_price=destinations[item['destination']].calculate_total_cost(days),
+        )
+        for offset, item in enumerate(batch['add'])
+    ]
+
+    with transaction.atomic(), defer_rollups():
+        if removed:
+            ItineraryDestination.objects.filter(itinerary=itinerary, pk__in=removed).delete()
+        if changed:
+            fields = sorted({field for values in changed.values() for field in values})
+            ItineraryDestination.objects.bulk_update([stops[pk] for pk in changed], fields)
+        if new_stops:
+            ItineraryDestination.objects.bulk_create(new_stops)
+        if removed or changed or new_stops:
+            refresh_itinerary_rollups([itinerary.pk])
+
+    return {
+        'added': new_stops,
+        'changed': [{'id': pk, **values} for pk, values in sorted(changed.items())],
+        'removed': removed,
+    }
@@ -0,0 +1,73 @@
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from SmartTrav.catalog_io import FORMATS, read_catalog, write_catalog
+
+CATEGORIES = ('resort', 'restaurant', 'attraction', 'beach', 'historical')
+
+
+def synthetic_rows(count):
+    """Generated lazily, like rows streamed from the database."""
+    for i in range(count):
+        yield {
+            'name': f'Destination {i}',
+            'description': f'Synthetic destination number {i} with a sentence or two of description text',
+            'location': ('Cebu City', 'Lapu-Lapu', 'Moalboal', 'Bantayan')[i % 4],
+            'category': CATEGORIES[i % 5],
+            'price_range': '500-1000',
+            'image_url': f'https://images.example.com/destinations/{i}.jpg' if i % 10 else None,
+            'price_per_day': Decimal(1000 + i % 4000).quantize(Decimal('0.01')),
+            'tags': f'beach, family, tag{i % 50}',
+        }
+
+
+def _peak_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _measure(format, rows, path, results):
+    """Runs in a fresh child process so each format has its own peak RSS."""
+    before = _peak_rss_kb()
+    started = time.perf_counter()
+    with open(path, 'wb') as handle:
+        write_catalog(synthetic_rows(rows), handle, format)
+    written = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with open(path, 'rb') as handle:
+        read = sum(1 for _ in read_catalog(handle, format)[1])
+    assert read == rows
+    results.put((written, time.perf_counter() - started, os.path.getsize(path), _peak_rss_kb() - before))
+
+
+class Command(BaseCommand):
+    help = 'Compare write/read throughput, file size and memory of the catalog formats (no database involved)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        context = multiprocessing.get_context('fork')
+
+        self.stdout.write("\n" + "="*80)
+        self.stdout.write(f"CATALOG FORMAT BENCHMARK ({rows} destinations)")
+        self.stdout.write("="*80)
+        self.stdout.write(f"{'format':<10} {'write rows/s':>13} {'read rows/s':>13} {'size':>10} {'peak RSS +':>12}")
+
+        with tempfile.TemporaryDirectory() as directory:
+            for format in FORMATS:
+                results = context.Queue()
+                child = context.Process(target=_measure, args=(format, rows, os.path.join(directory, format), results))
+                child.start()
+                written, read, size, grown_kb = results.get()
+                child.join()
+                self.stdout.write(
+                    f'{format:<10} {rows / written:>13,.0f} {rows / read:>13,.0f} '
+                    f'{size / (1024 * 1024):>7.1f} MB {grown_kb / 1024:>9.1f} MB'
+                )
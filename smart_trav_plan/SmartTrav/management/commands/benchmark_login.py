@@ -0,0 +1,79 @@
+import statistics
+import time
+
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+PASSWORD = 'season-peak-2026'
+
+
+def legacy_login(input_value, password):
+    """What login_view did before EmailOrUsernameBackend, kept for comparison."""
+    input_value = input_value.strip().lower()
+    user = None
+    if '@' in input_value:
+        email_users = User.objects.filter(email__iexact=input_value)
+        if email_users.exists():
+            user = email_users.first()
+    if not user:
+        username_users = User.objects.filter(username__iexact=input_value)
+        if username_users.exists():
+            user = username_users.first()
+        else:
+            user = authenticate(username=input_value, password=password)
+    return user if user and user.check_password(password) else None
+
+
+def backend_login(input_value, password):
+    return authenticate(username=input_value, password=password)
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compare queries and latency per login attempt for the old login path and EmailOrUsernameBackend'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--attempts', type=int, default=20, help='Attempts per scenario')
+
+    def _measure(self, login, identifier, password, attempts):
+        timings = []
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(attempts):
+                started = time.perf_counter()
+                login(identifier, password)
+                timings.append((time.perf_counter() - started) * 1000)
+        return len(queries) / attempts, statistics.median(timings)
+
+    def handle(self, *args, **options):
+        attempts = options['attempts']
+        scenarios = [
+            ('email, right password', 'Traveler@Example.com', PASSWORD),
+            ('username, right password', 'BENCH_TRAVELER', PASSWORD),
+            ('wrong password', 'bench_traveler', 'wrong'),
+            ('unknown account', 'nobody@example.com', PASSWORD),
+        ]
+
+        self.stdout.write("\n" + "="*80)
+        self.stdout.write(f"LOGIN BENCHMARK (median of {attempts} attempts)")
+        self.stdout.write("="*80)
+        self.stdout.write(f"{'scenario':<26} {'legacy q':>9} {'legacy ms':>10} {'backend q':>10} {'backend ms':>11}")
+
+        # Runs against the configured database; the benchmark user is rolled back
+        try:
+            with transaction.atomic():
+                User.objects.create_user('bench_traveler', 'traveler@example.com', PASSWORD)
+                for label, identifier, password in scenarios:
+                    legacy = self._measure(legacy_login, identifier, password, attempts)
+                    backend = self._measure(backend_login, identifier, password, attempts)
+                    self.stdout.write(
+                        f'{label:<26} {legacy[0]:>9.1f} {legacy[1]:>10.1f} {backend[0]:>10.1f} {backend[1]:>11.1f}'
+                    )
+                raise Rollback
+        except Rollback:
+            pass
@@ -0,0 +1,91 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from SmartTrav.models import Destination
+from SmartTrav.tags import filter_destinations_by_tags, sync_destination_tags, TAG_MATCH_ANY, TAG_MATCH_ALL
+
+VOCABULARY = [
+    'beach', 'family', 'budget', 'luxury', 'bar', 'barbecue', 'diving', 'snorkeling',
+    'history', 'museum', 'nightlife', 'seafood', 'spa', 'sunset', 'island', 'shopping',
+]
+
+
+class _Rollback(Exception):
+    pass
+
+
+def legacy_tag_filter(queryset, tags):
+    """The substring OR-chain dashboard_view used before the tag index."""
+    tag_query = Q()
+    for tag in tags:
+        tag_query |= Q(tags__icontains=tag)
+    return queryset.filter(tag_query)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark indexed tag filtering against the legacy tags__icontains filter'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--destinations', type=int, default=100000,
+                            help='Synthetic destinations to generate (rolled back afterwards)')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per query')
+        parser.add_argument('--tags', default='bar,seafood', help='Comma-separated tags to filter on')
+
+    def handle(self, *args, **options):
+        tags = [tag.strip() for tag in options['tags'].split(',') if tag.strip()]
+        try:
+            with transaction.atomic():
+                self._seed(options['destinations'])
+                self._run(tags, options['repeat'])
+                raise _Rollback
+        except _Rollback:
+            self.stdout.write(self.style.WARNING('\nSynthetic destinations rolled back.'))
+
+    def _seed(self, count):
+        rng = random.Random(42)
+        self.stdout.write(self.style.WARNING(f'Seeding {count} synthetic destinations...'))
+        started = time.perf_counter()
+        created = Destination.objects.bulk_create([
+            Destination(
+                name=f'Benchmark {i}',
+                description='Synthetic destination',
+                location='Mactan',
+                category='attraction',
+                tags=', '.join(rng.sample(VOCABULARY, 3)),
+            )
+            for i in range(count)
+        ], batch_size=2000)
+        sync_destination_tags(created)
+        self.stdout.write(f'   Seeded and indexed in {time.perf_counter() - started:.2f}s')
+
+    def _time(self, queryset, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            ids = list(queryset.values_list('id', flat=True))
+            timings.append(time.perf_counter() - started)
+        return min(timings), set(ids)
+
+    def _run(self, tags, repeat):
+        destinations = Destination.objects.all()
+        cases = [
+            ('legacy icontains (any)', legacy_tag_filter(destinations, tags)),
+            ('tag index (any)', filter_destinations_by_tags(destinations, tags, TAG_MATCH_ANY)),
+            ('tag index (all)', filter_destinations_by_tags(destinations, tags, TAG_MATCH_ALL)),
+        ]
+
+        self.stdout.write("\n" + "="*80)
+        self.stdout.write(f"TAG FILTER BENCHMARK: {', '.join(tags)} (best of {repeat})")
+        self.stdout.write("="*80)
+
+        results = {}
+        for label, queryset in cases:
+            best, ids = self._time(queryset, repeat)
+            results[label] = ids
+            self.stdout.write(f'{label:<28} {best * 1000:>10.1f} ms   {len(ids):>8} rows')
+
+        false_hits = results['legacy icontains (any)'] - results['tag index (any)']
+        self.stdout.write(f'\nLegacy false hits (substring matches): {len(false_hits)}')
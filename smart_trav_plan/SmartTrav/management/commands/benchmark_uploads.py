@@ -0,0 +1,112 @@
+import multiprocessing
+import os
+import resource
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from SmartTrav.streaming_upload import upload_file
+from SmartTrav.supabase_client import get_supabase_client
+
+READ_SIZE = 1024 * 1024
+
+
+class SinkHandler(BaseHTTPRequestHandler):
+    """Local storage stand-in that accepts uploads (plain and resumable) and discards the bytes."""
+    protocol_version = 'HTTP/1.1'
+    offsets = {}
+
+    def log_message(self, *args):
+        pass
+
+    def _drain(self):
+        remaining = int(self.headers.get('Content-Length', 0))
+        while remaining:
+            remaining -= len(self.rfile.read(min(remaining, READ_SIZE)))
+
+    def _reply(self, status, body=b'', **headers):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name.replace('_', '-'), value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self._drain()
+        if self.path.endswith('/upload/resumable'):
+            upload_id = str(len(self.offsets) + 1)
+            self.offsets[upload_id] = 0
+            self._reply(201, Location=f'/storage/v1/upload/resumable/{upload_id}')
+        else:
+            self._reply(200, b'{"Key": "sink", "Id": "sink"}', Content_Type='application/json')
+
+    def do_PATCH(self):
+        upload_id = self.path.rsplit('/', 1)[1]
+        self.offsets[upload_id] += int(self.headers.get('Content-Length', 0))
+        self._drain()
+        self._reply(204, Upload_Offset=str(self.offsets[upload_id]))
+
+    def do_HEAD(self):
+        self._reply(200, Upload_Offset=str(self.offsets.get(self.path.rsplit('/', 1)[1], 0)))
+
+
+def _peak_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _measure(mode, path, results):
+    """Runs in a fresh child process so each measurement has its own peak RSS."""
+    before = _peak_rss_kb()
+    started = time.perf_counter()
+    with open(path, 'rb') as handle:
+        if mode == 'legacy read()':
+            # What SupabaseStorage._save and the old upload helper used to do
+            get_supabase_client().storage.from_('bench').upload('bench.bin', handle.read())
+        else:
+            upload_file(File(handle, name='bench.bin'), 'bench.bin', 'bench')
+    results.put((time.perf_counter() - started, _peak_rss_kb() - before))
+
+
+class Command(BaseCommand):
+    help = 'Compare peak RSS of whole-file and streaming uploads against a local storage stand-in'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1,8,32,128', help='Comma-separated file sizes in MB')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        server = ThreadingHTTPServer(('127.0.0.1', 0), SinkHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        context = multiprocessing.get_context('fork')
+
+        self.stdout.write("\n" + "="*80)
+        self.stdout.write("UPLOAD MEMORY BENCHMARK (peak RSS growth per upload)")
+        self.stdout.write("="*80)
+        self.stdout.write(f"{'size':>8}  {'mode':<16} {'time':>10} {'peak RSS +':>14}")
+
+        try:
+            with override_settings(SUPABASE_URL=f'http://127.0.0.1:{server.server_port}', SUPABASE_KEY='bench'):
+                for size in sizes:
+                    with tempfile.NamedTemporaryFile() as temp:
+                        block = os.urandom(READ_SIZE)
+                        for _ in range(size):
+                            temp.write(block)
+                        temp.flush()
+
+                        for mode in ('legacy read()', 'streaming'):
+                            results = context.Queue()
+                            child = context.Process(target=_measure, args=(mode, temp.name, results))
+                            child.start()
+                            elapsed, grown_kb = results.get()
+                            child.join()
+                            self.stdout.write(
+                                f'{size:>6} MB  {mode:<16} {elapsed * 1000:>8.0f} ms {grown_kb / 1024:>11.1f} MB'
+                            )
+        finally:
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,63 @@
+import tempfile
+
+from django.core.management.base import BaseCommand
+from SmartTrav.catalog import bump_catalog_version
+from SmartTrav.images import build_variants, parse_public_url
+from SmartTrav.models import Destination, Profile
+from SmartTrav.supabase_client import get_http_client
+
+# (model, url field, variants field)
+TARGETS = {
+    'destinations': (Destination, 'image_url', 'image_variants'),
+    'profiles': (Profile, 'profile_picture_url', 'profile_picture_variants'),
+}
+SPOOL_SIZE = 8 * 1024 * 1024
+
+
+class Command(BaseCommand):
+    help = 'Generate resized WebP derivatives for images uploaded before the derivative pipeline existed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', choices=sorted(TARGETS), help='Backfill one kind of image')
+        parser.add_argument('--force', action='store_true', help='Rebuild derivatives that are already current')
+
+    def _download(self, url):
+        # Spooled to disk past SPOOL_SIZE so large originals don't sit in memory
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+        with get_http_client().stream('GET', url) as response:
+            response.raise_for_status()
+            for chunk in response.iter_bytes():
+                spool.write(chunk)
+        spool.seek(0)
+        return spool
+
+    def handle(self, *args, **options):
+        kinds = [options['only']] if options['only'] else sorted(TARGETS)
+        for kind in kinds:
+            model, url_field, variants_field = TARGETS[kind]
+            rows = model.objects.exclude(**{f'{url_field}__isnull': True}).exclude(**{url_field: ''})
+            rows = rows.values_list('pk', url_field, variants_field)
+
+            built = skipped = failed = 0
+            self.stdout.write(self.style.WARNING(f'Building derivatives for {kind}...'))
+            for pk, url, variants in rows.iterator(chunk_size=500):
+                current = (variants or {}).get('source') == url
+                if (current and not options['force']) or parse_public_url(url) is None:
+                    skipped += 1
+                    continue
+                try:
+                    with self._download(url) as original:
+                        variants = build_variants(original, url)
+                except Exception as e:
+                    failed += 1
+                    self.stdout.write(self.style.ERROR(f'✗ {kind} #{pk}: {e}'))
+                    continue
+                model.objects.filter(pk=pk).update(**{variants_field: variants})
+                built += 1
+                self.stdout.write(self.style.SUCCESS(f'✓ {kind} #{pk}: {len(variants) - 1} sizes'))
+
+            if kind == 'destinations' and built:
+                bump_catalog_version()
+            self.stdout.write(self.style.SUCCESS(
+                f'\n✅ {kind}: Built: {built}, Skipped: {skipped}, Failed: {failed}'
+            ))
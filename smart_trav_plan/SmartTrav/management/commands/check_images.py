@@ -1,13 +1,34 @@
+import json
+from datetime import timedelta
+
 from django.core.management.base import BaseCommand
 from django.conf import settings
-from SmartTrav.models import Destination
+from SmartTrav.image_health import check_images
+from SmartTrav.models import Destination, ImageProbe
 import re
 
 
 class Command(BaseCommand):
     help = 'Check all destination images and their URLs'
 
-    def handle(self, *args, **kwargs):
+    def add_arguments(self, parser):
+        parser.add_argument('--probe', action='store_true',
+                            help='Request every image URL and record status, type, size and latency')
+        parser.add_argument('--concurrency', type=int, default=16, help='Parallel probes')
+        parser.add_argument('--rate', type=float, default=10, help='Max requests per second to one host')
+        parser.add_argument('--max-age', type=float, default=24,
+                            help='Hours before a recorded result is probed again')
+        parser.add_argument('--all', action='store_true', help='Probe every URL, ignoring --max-age')
+        parser.add_argument('--timeout', type=float, default=10.0)
+        parser.add_argument('--json', metavar='PATH', help='Also write the results to a JSON report')
+
+    def handle(self, *args, **options):
+        if options['probe']:
+            self.probe(options)
+        else:
+            self.audit()
+
+    def audit(self):
         destinations = Destination.objects.all()
 
         self.stdout.write("="*80)
@@ -15,7 +36,7 @@ class Command(BaseCommand):
         self.stdout.write("="*80)
 
         # Extract project reference
-        supabase_url = settings.SUPABASE_URL
+        supabase_url = settings.SUPABASE_URL or ''
         match = re.search(r'https?://(.*?)\.supabase\.co', supabase_url)
         project_ref = match.group(1) if match else 'unknown'
 
@@ -25,6 +46,7 @@ class Command(BaseCommand):
 
         with_images = 0
         without_images = 0
+        probes = {probe.url: probe for probe in ImageProbe.objects.all()}
 
         self.stdout.write("\n" + "="*80)
         self.stdout.write("DESTINATION IMAGES:")
@@ -34,40 +56,80 @@ class Command(BaseCommand):
             self.stdout.write(f"\n📍 {dest.name}")
             self.stdout.write(f"   ID: {dest.id}")
 
-            if dest.image:
+            if dest.image_url:
                 with_images += 1
-                self.stdout.write(self.style.SUCCESS(f"   ✓ Has image"))
-                self.stdout.write(f"   📁 Path: {dest.image.name}")
-
-                try:
-                    url = dest.image.url
-                    self.stdout.write(f"   🔗 URL: {url}")
-
-                    if 'supabase.co' in url and settings.SUPABASE_BUCKET in url:
-                        self.stdout.write(self.style.SUCCESS("   ✓ URL looks correct"))
-                    else:
-                        self.stdout.write(self.style.ERROR("   ✗ URL format seems wrong!"))
-
-                except Exception as e:
-                    self.stdout.write(self.style.ERROR(f"   ✗ Error generating URL: {e}"))
+                url = dest.image_url
+                self.stdout.write(f"   🔗 URL: {url}")
+
+                if 'supabase.co' in url and settings.SUPABASE_BUCKET in url:
+                    self.stdout.write(self.style.SUCCESS("   ✓ URL looks correct"))
+                elif not url.startswith('http'):
+                    self.stdout.write(self.style.ERROR("   ✗ Local path, run migrate_images"))
+                else:
+                    self.stdout.write(self.style.WARNING("   ⊘ External URL"))
+
+                probe = probes.get(url)
+                if probe:
+                    style = self.style.SUCCESS if probe.ok else self.style.ERROR
+                    self.stdout.write(style(f"   {'✓' if probe.ok else '✗'} Last probe: {probe.status or probe.error} "
+                                            f"({probe.checked_at:%Y-%m-%d %H:%M})"))
             else:
                 without_images += 1
-                self.stdout.write(self.style.WARNING(f"   ✗ No image set"))
+                self.stdout.write(self.style.WARNING("   ✗ No image set"))
 
         self.stdout.write("\n" + "="*80)
         self.stdout.write("SUMMARY:")
         self.stdout.write("="*80)
         self.stdout.write(f"✓ With images: {with_images}")
         self.stdout.write(f"✗ Without images: {without_images}")
+        self.stdout.write("\nRun with --probe to check that every image URL resolves.")
+        self.stdout.write("\n" + "="*80)
 
-        if with_images > 0:
-            self.stdout.write("\n" + "="*80)
-            self.stdout.write("TEST A URL IN YOUR BROWSER:")
-            self.stdout.write("="*80)
-            first_with_image = destinations.filter(image__isnull=False).first()
-            if first_with_image:
-                test_url = first_with_image.image.url
-                self.stdout.write(f"\nCopy this URL and test in browser:")
-                self.stdout.write(self.style.WARNING(f"{test_url}"))
-
-        self.stdout.write("\n" + "="*80)
\ No newline at end of file
+    def probe(self, options):
+        owners, probes, probed = check_images(
+            max_age=timedelta(hours=options['max_age']),
+            recheck_all=options['all'],
+            concurrency=options['concurrency'],
+            per_host_rate=options['rate'],
+            timeout=options['timeout'],
+        )
+
+        self.stdout.write("="*80)
+        self.stdout.write(self.style.SUCCESS("🖼️  IMAGE HEALTH CHECK"))
+        self.stdout.write("="*80)
+        self.stdout.write(f"\n🔗 URLs in use: {len(owners)}  (probed now: {probed}, "
+                          f"recent results reused: {len(owners) - probed})\n")
+        self.stdout.write(f"{'status':>6}  {'type':<12} {'size':>10} {'latency':>9}  url")
+
+        broken = [probe for probe in probes if not probe.ok]
+        for probe in broken:
+            size = f'{probe.size / 1024:.0f} KB' if probe.size is not None else '-'
+            latency = f'{probe.latency_ms:.0f} ms' if probe.latency_ms is not None else '-'
+            self.stdout.write(self.style.ERROR(
+                f"{probe.status or 'ERR':>6}  {probe.content_type or '-':<12} {size:>10} {latency:>9}  {probe.url}"
+            ))
+            self.stdout.write(f"{'':>42}{probe.error or ', '.join(owners[probe.url])}")
+
+        latencies = sorted(probe.latency_ms for probe in probes if probe.latency_ms is not None)
+        self.stdout.write("\n" + "="*80)
+        self.stdout.write(self.style.SUCCESS(f"✓ OK: {len(probes) - len(broken)}"))
+        self.stdout.write(self.style.ERROR(f"✗ Broken: {len(broken)}"))
+        if latencies:
+            self.stdout.write(f"⏱  Latency p50 {latencies[len(latencies) // 2]:.0f} ms, max {latencies[-1]:.0f} ms")
+
+        if options['json']:
+            report = [{
+                'url': probe.url,
+                'used_by': owners[probe.url],
+                'ok': probe.ok,
+                'status': probe.status,
+                'content_type': probe.content_type,
+                'size': probe.size,
+                'latency_ms': probe.latency_ms,
+                'error': probe.error,
+                'checked_at': probe.checked_at.isoformat(),
+            } for probe in probes]
+            with open(options['json'], 'w') as handle:
+                json.dump(report, handle, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"📝 Report written to {options['json']}"))
+        self.stdout.write("="*80)
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from SmartTrav.catalog_io import FORMATS, export_rows, guess_format, write_catalog
+from SmartTrav.models import Destination
+
+
+class Command(BaseCommand):
+    help = 'Stream every destination (tags, prices, image URLs) to a CSV, JSONL or columnar catalog file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Output file (.csv, .jsonl or .stcol)')
+        parser.add_argument('--format', choices=sorted(FORMATS), help='Override the format implied by the extension')
+        parser.add_argument('--category', help='Only export this category')
+
+    def handle(self, *args, **options):
+        try:
+            format = options['format'] or guess_format(options['path'])
+        except ValueError as e:
+            raise CommandError(e)
+
+        destinations = Destination.objects.all()
+        if options['category']:
+            destinations = destinations.filter(category=options['category'])
+
+        started = time.perf_counter()
+        with open(options['path'], 'wb') as handle:
+            count = write_catalog(export_rows(destinations), handle, format)
+            size = handle.tell()
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Exported {count} destinations to {options["path"]} ({format}, {size / 1024:.0f} KB) '
+            f'in {elapsed:.1f}s'
+        ))
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from SmartTrav.catalog_io import FORMATS, guess_format, read_catalog
+from SmartTrav.destination_loader import BATCH_SIZE, CHUNK_SIZE, load_destinations
+
+
+class Command(BaseCommand):
+    help = 'Upsert destinations by name from a catalog written by export_catalog (or any CSV/JSONL with those fields)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Catalog file (.csv, .jsonl or .stcol)')
+        parser.add_argument('--format', choices=sorted(FORMATS), help='Override the format implied by the extension')
+        parser.add_argument('--dry-run', action='store_true', help='Count what would change without writing')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def _show_errors(self, action, name, detail):
+        if action == 'invalid':
+            self.stdout.write(self.style.ERROR(f'✗ Skipped: {detail}'))
+
+    def handle(self, *args, **options):
+        try:
+            format = options['format'] or guess_format(options['path'])
+        except ValueError as e:
+            raise CommandError(e)
+
+        started = time.perf_counter()
+        with open(options['path'], 'rb') as handle:
+            try:
+                fields, rows = read_catalog(handle, format)
+                counts = load_destinations(
+                    rows, fields,
+                    dry_run=options['dry_run'],
+                    chunk_size=options['chunk_size'],
+                    batch_size=options['batch_size'],
+                    on_change=self._show_errors,
+                )
+            except ValueError as e:
+                raise CommandError(f'{options["path"]}: {e}')
+        elapsed = time.perf_counter() - started
+
+        prefix = 'Dry run, nothing written' if options['dry_run'] else 'Done!'
+        self.stdout.write(self.style.SUCCESS(
+            f"\n✅ {prefix} Created: {counts['created']}, Updated: {counts['updated']}, "
+            f"Unchanged: {counts['unchanged']}, Invalid: {counts['invalid']} "
+            f"({sum(counts.values())} rows in {elapsed:.1f}s)"
+        ))
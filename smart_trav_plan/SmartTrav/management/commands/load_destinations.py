@@ -1,17 +1,37 @@
 import csv
 import os
-from django.core.management.base import BaseCommand
+import time
+from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
-from SmartTrav.models import Destination
+from SmartTrav.destination_loader import BATCH_SIZE, CHUNK_SIZE, LOADED_FIELDS, load_destinations
 
 
 class Command(BaseCommand):
     help = 'Load destinations from CSV file'
 
-    def handle(self, *args, **kwargs):
-        # Path to CSV file
-        csv_file = os.path.join(settings.BASE_DIR, 'SmartTrav', 'data', 'destinations.csv')
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', nargs='?',
+                            default=os.path.join(settings.BASE_DIR, 'SmartTrav', 'data', 'destinations.csv'))
+        parser.add_argument('--dry-run', action='store_true', help='Show what would change without writing')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Rows diffed per database read')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows per bulk insert/update')
 
+    def _show(self, action, name, detail):
+        if action == 'invalid':
+            self.stdout.write(self.style.ERROR(f'✗ Skipped: {detail}'))
+        elif action == 'create':
+            self.stdout.write(self.style.SUCCESS(f'+ Create: {name}'))
+        else:
+            self.stdout.write(self.style.WARNING(f'↻ Update: {name}'))
+            for field, (old, new) in detail.items():
+                self.stdout.write(f'    {field}: {old!r} → {new!r}')
+
+    def _show_errors(self, action, name, detail):
+        if action == 'invalid':
+            self._show(action, name, detail)
+
+    def handle(self, *args, **options):
+        csv_file = options['csv_file']
         self.stdout.write(self.style.WARNING(f'Loading destinations from: {csv_file}'))
 
         # Check if file exists
@@ -19,28 +39,31 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR(f'CSV file not found at: {csv_file}'))
             return
 
-        # Read CSV and create destinations
-        with open(csv_file, 'r', encoding='utf-8') as file:
+        started = time.perf_counter()
+        # Read CSV in chunks rather than all at once
+        with open(csv_file, 'r', encoding='utf-8', newline='') as file:
             reader = csv.DictReader(file)
-            created_count = 0
-            updated_count = 0
-
-            for row in reader:
-                destination, created = Destination.objects.update_or_create(
-                    name=row['name'],
-                    defaults={
-                        'description': row['description'],
-                        'location': row['location'],
-                        'category': row['category'],
-                        'price_range': row['price_range'],
-                    }
-                )
-
-                if created:
-                    created_count += 1
-                    self.stdout.write(self.style.SUCCESS(f'✓ Created: {destination.name}'))
-                else:
-                    updated_count += 1
-                    self.stdout.write(self.style.WARNING(f'↻ Updated: {destination.name}'))
-
-        self.stdout.write(self.style.SUCCESS(f'\n✅ Done! Created: {created_count}, Updated: {updated_count}'))
+            columns = reader.fieldnames or []
+            if 'name' not in columns:
+                raise CommandError('The CSV needs a "name" column')
+            ignored = set(columns) - set(LOADED_FIELDS) - {'name'}
+            if ignored:
+                self.stdout.write(self.style.WARNING(f'Ignoring columns: {", ".join(sorted(ignored))}'))
+
+            counts = load_destinations(
+                reader, columns,
+                dry_run=options['dry_run'],
+                chunk_size=options['chunk_size'],
+                batch_size=options['batch_size'],
+                # Large files only list problems unless it is a dry run
+                on_change=self._show if options['dry_run'] or options['verbosity'] > 1 else self._show_errors,
+            )
+
+        elapsed = time.perf_counter() - started
+        rows = sum(counts.values())
+        prefix = 'Dry run, nothing written' if options['dry_run'] else 'Done!'
+        self.stdout.write(self.style.SUCCESS(
+            f"\n✅ {prefix} Created: {counts['created']}, Updated: {counts['updated']}, "
+            f"Unchanged: {counts['unchanged']}, Invalid: {counts['invalid']} "
+            f"({rows} rows in {elapsed:.1f}s)"
+        ))
@@ -1,85 +1,57 @@
+from django.conf import settings
 from django.core.management.base import BaseCommand
-from SmartTrav.models import Destination
-from SmartTrav.utils import get_supabase_client
-import os
-from pathlib import Path
+from SmartTrav.image_migration import Checkpoint, find_candidates, migrate_images
 
 
 class Command(BaseCommand):
     help = 'Migrate local images to Supabase Storage and update image_url field'
 
-    def handle(self, *args, **options):
-        supabase = get_supabase_client()
-        bucket_name = "destination-images"
-
-        destinations = Destination.objects.all()
-        migrated = 0
-        failed = 0
-        skipped = 0
-
-        for dest in destinations:
-            # Check if already has Supabase URL
-            if dest.image_url and 'supabase.co' in dest.image_url:
-                self.stdout.write(self.style.WARNING(f'⊘ Already migrated: {dest.name}'))
-                skipped += 1
-                continue
-
-            # Convert ImageFieldFile to string
-            image_path = str(dest.image) if dest.image else None
-
-            if image_path and not image_path.startswith('http'):
-                # This is a local file path
-                local_path = os.path.join('media', image_path)
-
-                if os.path.exists(local_path):
-                    try:
-                        # Read the file
-                        with open(local_path, 'rb') as f:
-                            file_content = f.read()
-
-                        # Get file extension
-                        file_ext = Path(local_path).suffix.lower()
-                        content_types = {
-                            '.jpg': 'image/jpeg',
-                            '.jpeg': 'image/jpeg',
-                            '.png': 'image/png',
-                            '.webp': 'image/webp',
-                            '.gif': 'image/gif'
-                        }
-                        content_type = content_types.get(file_ext, 'image/jpeg')
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=8, help='Parallel uploads')
+        parser.add_argument('--batch-size', type=int, default=200, help='Destinations per bulk_update')
+        parser.add_argument('--source-dir', default=str(settings.MEDIA_ROOT),
+                            help='Directory the local image paths are relative to')
+        parser.add_argument('--bucket', default=getattr(settings, 'SUPABASE_BUCKET', 'destination-images'))
+        parser.add_argument('--checkpoint', default=str(settings.BASE_DIR / 'migrate_images.checkpoint'),
+                            help='Progress log that lets an interrupted run resume')
+        parser.add_argument('--progress-every', type=int, default=50)
+        parser.add_argument('--dry-run', action='store_true', help='List what would be migrated')
+
+    def _report(self, progress, failure):
+        if failure:
+            (pk, source, file_path), error = failure
+            self.stdout.write(self.style.ERROR(f'✗ Failed: #{pk} {source} - {error}'))
+        else:
+            self.stdout.write(f'  {progress.line()}')
 
-                        # Upload to Supabase
-                        file_path = image_path  # Keep same path structure
-                        supabase.storage.from_(bucket_name).upload(
-                            file_path,
-                            file_content,
-                            file_options={"content-type": content_type, "upsert": "true"}
-                        )
-
-                        # Get public URL
-                        public_url = supabase.storage.from_(bucket_name).get_public_url(file_path)
-
-                        # Update database - use image_url field
-                        Destination.objects.filter(id=dest.id).update(image_url=public_url)
-
-                        self.stdout.write(self.style.SUCCESS(f'✓ Migrated: {dest.name} -> {file_path}'))
-                        migrated += 1
-
-                    except Exception as e:
-                        self.stdout.write(self.style.ERROR(f'✗ Failed: {dest.name} - {str(e)}'))
-                        failed += 1
-                else:
-                    self.stdout.write(self.style.WARNING(f'⚠ File not found: {local_path}'))
-                    failed += 1
-            elif dest.image_url and dest.image_url.startswith('http'):
-                # Keep existing external URLs (like Unsplash)
-                self.stdout.write(self.style.WARNING(f'⊘ External URL kept: {dest.name}'))
-                skipped += 1
-            else:
-                self.stdout.write(self.style.WARNING(f'⊘ No image: {dest.name}'))
-                skipped += 1
-
-        self.stdout.write(self.style.SUCCESS(f'\n✓ Migration complete!'))
-        self.stdout.write(self.style.SUCCESS(f'  Migrated: {migrated}'))
-        self.stdout.write(self.style.WARNING(f'  Skipped: {skipped}'))
-        self.stdout.write(self.style.ERROR(f'  Failed: {failed}'))
\ No newline at end of file
+    def handle(self, *args, **options):
+        candidates = find_candidates(options['source_dir'])
+
+        if options['dry_run']:
+            missing = [c for c in candidates if not c[2].exists()]
+            size = sum(c[2].stat().st_size for c in candidates if c[2].exists())
+            self.stdout.write(self.style.WARNING(
+                f'Would migrate {len(candidates) - len(missing)} images ({size / (1024 * 1024):.1f} MB) '
+                f'to "{options["bucket"]}"'
+            ))
+            for pk, source, file_path in missing:
+                self.stdout.write(self.style.WARNING(f'⚠ File not found: #{pk} {file_path}'))
+            return
+
+        checkpoint = Checkpoint(options['checkpoint'])
+        if checkpoint.path.exists():
+            self.stdout.write(self.style.WARNING(f'↻ Resuming from {checkpoint.path}'))
+        self.stdout.write(self.style.WARNING(
+            f'Migrating {len(candidates)} images with {options["concurrency"]} workers...'
+        ))
+
+        progress = migrate_images(
+            candidates, options['bucket'], checkpoint,
+            concurrency=options['concurrency'], batch_size=options['batch_size'],
+            report=self._report, progress_every=options['progress_every'],
+        )
+
+        self.stdout.write(self.style.SUCCESS(f'\n✓ Migration complete! {progress.line()}'))
+        self.stdout.write(self.style.SUCCESS(f'  Migrated: {progress.done} ({progress.uploaded} uploaded, '
+                                             f'{progress.done - progress.uploaded} already stored)'))
+        self.stdout.write(self.style.ERROR(f'  Failed: {progress.failed}'))
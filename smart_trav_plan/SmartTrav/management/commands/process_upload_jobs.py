@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+from SmartTrav.models import UploadJob
+from SmartTrav.uploads import run_pending_jobs, requeue
+
+
+class Command(BaseCommand):
+    help = 'Upload queued profile pictures and destination images to Supabase'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process the jobs that are due now, then exit')
+        parser.add_argument('--batch-size', type=int, default=10)
+        parser.add_argument('--sleep', type=float, default=2.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--requeue-dead', action='store_true',
+                            help='Move dead-lettered jobs back to the queue before starting')
+
+    def handle(self, *args, **options):
+        if options['requeue_dead']:
+            count = requeue(UploadJob.objects.all())
+            self.stdout.write(self.style.WARNING(f'Requeued {count} dead jobs'))
+
+        self.stdout.write(self.style.WARNING('Upload worker started...'))
+        try:
+            while True:
+                outcome = run_pending_jobs(options['batch_size'])
+                if outcome:
+                    self.stdout.write(
+                        f"Done: {outcome.get(UploadJob.STATUS_DONE, 0)}, "
+                        f"Retrying: {outcome.get(UploadJob.STATUS_PENDING, 0)}, "
+                        f"Dead: {outcome.get(UploadJob.STATUS_DEAD, 0)}"
+                    )
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS('\n✅ Upload worker stopped'))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from SmartTrav.models import Itinerary
+from SmartTrav.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the running cost/expense totals stored on each Itinerary'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help='Only report itineraries whose stored totals are wrong; do not write')
+        parser.add_argument('--itinerary', type=int, action='append',
+                            help='Limit to this itinerary id (repeatable)')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        itineraries = Itinerary.objects.all()
+        if options['itinerary']:
+            itineraries = itineraries.filter(pk__in=options['itinerary'])
+
+        total = itineraries.count()
+        mode = 'Verifying' if options['verify'] else 'Rebuilding'
+        self.stdout.write(self.style.WARNING(f'{mode} rollups for {total} itineraries...'))
+
+        drifted = rebuild_rollups(itineraries, batch_size=options['batch_size'], dry_run=options['verify'])
+
+        for pk in drifted:
+            self.stdout.write(self.style.ERROR(f'✗ Drifted: itinerary {pk}'))
+
+        if options['verify']:
+            if drifted:
+                self.stdout.write(self.style.ERROR(f'\n✗ {len(drifted)} of {total} itineraries have stale totals'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'\n✅ All {total} itineraries are consistent'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'\n✅ Done! Fixed: {len(drifted)}, Checked: {total}'))
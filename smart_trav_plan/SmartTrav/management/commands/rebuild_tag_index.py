@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from SmartTrav.models import Destination, Tag, DestinationTag
+from SmartTrav.tags import prune_unused_tags, sync_destination_tags
+from SmartTrav.catalog import bump_catalog_version
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the Tag/DestinationTag index from Destination.tags'
+
+    def handle(self, *args, **options):
+        destinations = Destination.objects.only('id', 'tags')
+
+        self.stdout.write(self.style.WARNING(f'Indexing tags for {destinations.count()} destinations...'))
+        sync_destination_tags(destinations.iterator(chunk_size=2000))
+        # Also catches entries orphaned by writes that bypassed the index
+        prune_unused_tags()
+        bump_catalog_version()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✅ Done! Tags: {Tag.objects.count()}, Links: {DestinationTag.objects.count()}'
+        ))
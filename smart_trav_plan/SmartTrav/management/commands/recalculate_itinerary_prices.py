@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from SmartTrav.models import ItineraryDestination
+from SmartTrav.pricing import recalculate_prices
+
+
+class Command(BaseCommand):
+    help = 'Recompute ItineraryDestination.calculated_price from current dates and destination prices'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--itinerary', type=int, action='append',
+                            help='Limit to this itinerary id (repeatable)')
+        parser.add_argument('--destination', type=int, action='append',
+                            help='Limit to stops at this destination id (repeatable)')
+
+    def handle(self, *args, **options):
+        stops = ItineraryDestination.objects.all()
+        if options['itinerary']:
+            stops = stops.filter(itinerary_id__in=options['itinerary'])
+        if options['destination']:
+            stops = stops.filter(destination_id__in=options['destination'])
+
+        self.stdout.write(self.style.WARNING(f'Repricing {stops.count()} itinerary stops...'))
+        changed = recalculate_prices(stops)
+        self.stdout.write(self.style.SUCCESS(f'\n✅ Done! Repriced: {changed}'))
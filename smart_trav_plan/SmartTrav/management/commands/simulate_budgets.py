@@ -0,0 +1,54 @@
+from collections import Counter
+from decimal import Decimal
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from SmartTrav.budget import annotate_budget, simulate_budgets, BUDGET_GOOD, BUDGET_AT_RISK, BUDGET_OVER
+from SmartTrav.models import Itinerary
+
+STATUSES = (BUDGET_GOOD, BUDGET_AT_RISK, BUDGET_OVER)
+
+
+class Command(BaseCommand):
+    help = 'Show how itinerary budgets would fare if prices, expenses or trip lengths changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--price-change', type=Decimal, default=Decimal('0'),
+                            help='Relative change in destination prices, e.g. 0.10 for +10%%')
+        parser.add_argument('--expense-change', type=Decimal, default=Decimal('0'),
+                            help='Relative change in expenses, e.g. -0.05 for -5%%')
+        parser.add_argument('--extra-days', type=int, default=0, help='Days added to (or taken off) every trip')
+        parser.add_argument('--itinerary', type=int, action='append',
+                            help='Limit to this itinerary id (repeatable)')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        itineraries = Itinerary.objects.only(
+            'id', 'title', 'start_date', 'end_date', 'budget', 'destination_cost_total', 'expense_total',
+        )
+        if options['itinerary']:
+            itineraries = itineraries.filter(pk__in=options['itinerary'])
+        rows = annotate_budget(itineraries).order_by('id').iterator(chunk_size=options['batch_size'])
+
+        before, after = Counter(), Counter()
+        while batch := list(islice(rows, options['batch_size'])):
+            projected = simulate_budgets(
+                batch,
+                price_change=options['price_change'],
+                expense_change=options['expense_change'],
+                extra_days=options['extra_days'],
+            )
+            for itinerary in batch:
+                outcome = projected[itinerary.pk]
+                before[itinerary.budget_status] += 1
+                after[outcome['budget_status']] += 1
+                if outcome['budget_status'] == BUDGET_OVER and itinerary.budget_status != BUDGET_OVER:
+                    self.stdout.write(self.style.ERROR(
+                        f'✗ Would go over: itinerary {itinerary.pk} ({itinerary.title}) '
+                        f'by ₱{abs(outcome["budget_remaining"]):,.2f}'
+                    ))
+
+        self.stdout.write(f'\n{"Status":<10}{"Now":>8}{"Projected":>12}')
+        for status in STATUSES:
+            self.stdout.write(f'{status:<10}{before[status]:>8}{after[status]:>12}')
+        self.stdout.write(self.style.SUCCESS(f'\n✅ Simulated {sum(before.values())} itineraries; nothing written'))
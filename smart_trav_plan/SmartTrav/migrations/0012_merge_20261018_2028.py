@@ -0,0 +1,14 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:28
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SmartTrav', '0010_alter_itinerarydestination_options_and_more'),
+        ('SmartTrav', '0011_alter_destination_price_per_day'),
+    ]
+
+    operations = [
+    ]
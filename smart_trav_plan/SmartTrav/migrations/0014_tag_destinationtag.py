@@ -0,0 +1,60 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_tag_index(apps, schema_editor):
+    Destination = apps.get_model('SmartTrav', 'Destination')
+    Tag = apps.get_model('SmartTrav', 'Tag')
+    DestinationTag = apps.get_model('SmartTrav', 'DestinationTag')
+
+    wanted = {}
+    for pk, tags in Destination.objects.values_list('id', 'tags'):
+        names = []
+        for tag in (tags or '').split(','):
+            tag = tag.strip().lower()[:100]
+            if tag and tag not in names:
+                names.append(tag)
+        wanted[pk] = names
+
+    all_names = {name for names in wanted.values() for name in names}
+    Tag.objects.bulk_create([Tag(name=name) for name in all_names])
+    tag_ids = dict(Tag.objects.values_list('name', 'id'))
+    DestinationTag.objects.bulk_create([
+        DestinationTag(destination_id=pk, tag_id=tag_ids[name])
+        for pk, names in wanted.items()
+        for name in names
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SmartTrav', '0013_contactmessage_profile_profile_picture_url'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DestinationTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('destination', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='destination_tags', to='SmartTrav.destination')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='destination_tags', to='SmartTrav.tag')),
+            ],
+            options={
+                'unique_together': {('destination', 'tag')},
+            },
+        ),
+        migrations.RunPython(backfill_tag_index, migrations.RunPython.noop),
+    ]
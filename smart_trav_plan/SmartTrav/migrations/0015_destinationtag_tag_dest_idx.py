@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SmartTrav', '0014_tag_destinationtag'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='destinationtag',
+            index=models.Index(fields=['tag', 'destination'], name='destinationtag_tag_dest_idx'),
+        ),
+    ]
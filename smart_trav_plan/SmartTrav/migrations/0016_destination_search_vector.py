@@ -0,0 +1,44 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:31
+
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+
+def build_search_index(apps, schema_editor):
+    # The GIN index and stored vectors only exist on Postgres; SQLite uses
+    # the in-memory index in SmartTrav.search instead.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS destination_search_vector_gin '
+        'ON "SmartTrav_destination" USING gin (search_vector)'
+    )
+    Destination = apps.get_model('SmartTrav', 'Destination')
+    Destination.objects.update(search_vector=(
+        SearchVector('name', weight='A', config='english')
+        + SearchVector('location', weight='B', config='english')
+        + SearchVector('description', weight='C', config='english')
+    ))
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS destination_search_vector_gin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SmartTrav', '0015_destinationtag_tag_dest_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='destination',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(build_search_index, drop_search_index),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:37
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_rollups(apps, schema_editor):
+    Itinerary = apps.get_model('SmartTrav', 'Itinerary')
+    ItineraryDestination = apps.get_model('SmartTrav', 'ItineraryDestination')
+    Expense = apps.get_model('SmartTrav', 'Expense')
+    cents = Decimal('0.01')
+
+    rollups = defaultdict(dict)
+    for row in ItineraryDestination.objects.values('itinerary_id').annotate(
+            total=Sum('calculated_price'), count=Count('id')).order_by():
+        rollups[row['itinerary_id']]['destination_cost_total'] = (row['total'] or Decimal(0)).quantize(cents)
+        rollups[row['itinerary_id']]['destination_count'] = row['count']
+
+    for row in Expense.objects.values('itinerary_id', 'category').annotate(total=Sum('amount')).order_by():
+        amount = (row['total'] or Decimal(0)).quantize(cents)
+        values = rollups[row['itinerary_id']]
+        values['expense_total'] = values.get('expense_total', Decimal(0)) + amount
+        if amount:
+            values.setdefault('expense_category_totals', {})[row['category']] = str(amount)
+
+    for pk, values in rollups.items():
+        Itinerary.objects.filter(pk=pk).update(**values)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SmartTrav', '0016_destination_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itinerary',
+            name='destination_cost_total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='itinerary',
+            name='destination_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='itinerary',
+            name='expense_category_totals',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='itinerary',
+            name='expense_total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SmartTrav', '0019_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredObject',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.CharField(max_length=100)),
+                ('sha256', models.CharField(max_length=64)),
+                ('path', models.CharField(max_length=255)),
+                ('public_url', models.URLField(max_length=500)),
+                ('size', models.BigIntegerField()),
+                ('content_type', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('bucket', 'sha256')},
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:20
+
+from django.db import migrations
+
+# auth.User belongs to django.contrib.auth, so its functional indexes for
+# SmartTrav.backends.EmailOrUsernameBackend are created here in SQL.
+LOGIN_INDEXES = {
+    'auth_user_email_lower_idx': 'email',
+    'auth_user_username_lower_idx': 'username',
+}
+
+
+def create_login_indexes(apps, schema_editor):
+    for name, column in LOGIN_INDEXES.items():
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON "auth_user" (LOWER("{column}"))')
+
+
+def drop_login_indexes(apps, schema_editor):
+    for name in LOGIN_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SmartTrav', '0021_imageprobe'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_login_indexes, drop_login_indexes),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SmartTrav', '0023_backfill_profiles'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='itinerarydestination',
+            options={'ordering': ['visit_date', 'visit_time', 'position', 'added_at']},
+        ),
+        migrations.AddField(
+            model_name='itinerarydestination',
+            name='position',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:32
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def create_catalog_state(apps, schema_editor):
+    # The single row SmartTrav.catalog bumps; created lazily too, but not on a read path
+    apps.get_model('SmartTrav', 'CatalogState').objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SmartTrav', '0024_itinerarydestination_position'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=1)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RunPython(create_catalog_state, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:37
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_requested_at(apps, schema_editor):
+    apps.get_model('SmartTrav', 'UploadJob').objects.update(requested_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SmartTrav', '0025_catalogstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadjob',
+            name='requested_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='uploadjob',
+            name='result_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.RunPython(backfill_requested_at, migrations.RunPython.noop),
+    ]
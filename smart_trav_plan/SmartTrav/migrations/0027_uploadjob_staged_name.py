@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:39
+
+from django.core.files.base import ContentFile
+from django.db import migrations, models
+
+
+def stage_queued_content(apps, schema_editor):
+    # Jobs queued before this migration still carry their bytes in the row
+    UploadJob = apps.get_model('SmartTrav', 'UploadJob')
+    queued = UploadJob.objects.exclude(content=None)
+    if not queued.exists():
+        return
+    from SmartTrav.uploads import get_staging_storage
+    storage = get_staging_storage()
+    for job in queued.iterator():
+        job.staged_name = storage.save(job.idempotency_key, ContentFile(bytes(job.content)))
+        job.save(update_fields=['staged_name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SmartTrav', '0026_uploadjob_requested_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadjob',
+            name='staged_name',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(stage_queued_content, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='uploadjob',
+            name='content',
+        ),
+    ]
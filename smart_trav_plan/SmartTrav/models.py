@@ -1,6 +1,10 @@
+from decimal import Decimal
+
 from django.db import models
+from django.utils import timezone
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 
 class Destination(models.Model):
@@ -29,6 +33,10 @@ class Destination(models.Model):
         blank=True,
         help_text="Comma-separated tags (e.g., beach, family, budget)"
     )
+    # Resized WebP copies of image_url (see SmartTrav.images)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    # Weighted name/location/description vector, maintained by SmartTrav.search (Postgres only)
+    search_vector = SearchVectorField(null=True, editable=False)
 
     def __str__(self):
         return self.name
@@ -38,8 +46,51 @@ class Destination(models.Model):
             return [tag.strip().lower() for tag in self.tags.split(',')]
         return []
 
+    def get_image_srcset(self):
+        from .images import srcset
+        return srcset(self.image_variants, self.image_url)
+
     def calculate_total_cost(self, days):
-        return float(self.price_per_day) * days
+        return Decimal(str(self.price_per_day)) * days
+
+
+class CatalogState(models.Model):
+    """
+    Single row holding the destination catalog's version, bumped on every
+    Destination change (see SmartTrav.catalog). Kept in the database so all
+    workers and management commands see the same version.
+    """
+    version = models.PositiveBigIntegerField(default=1)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Catalog v{self.version}"
+
+
+class Tag(models.Model):
+    """Normalized tag vocabulary, rebuilt from Destination.tags"""
+    name = models.CharField(max_length=100, unique=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
+class DestinationTag(models.Model):
+    destination = models.ForeignKey(Destination, on_delete=models.CASCADE, related_name='destination_tags')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='destination_tags')
+
+    class Meta:
+        unique_together = ('destination', 'tag')
+        indexes = [
+            # Tag-first lookups for filtering destinations by tag
+            models.Index(fields=['tag', 'destination'], name='destinationtag_tag_dest_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tag.name} on {self.destination.name}"
 
 
 class Itinerary(models.Model):
@@ -50,8 +101,17 @@ class Itinerary(models.Model):
     budget = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Also touched by SmartTrav.rollups whenever one of its stops or expenses
+    # changes, so it validates API responses that include them
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Running totals kept in step with ItineraryDestination/Expense rows by
+    # SmartTrav.rollups; rebuild with `manage.py rebuild_itinerary_rollups`
+    destination_cost_total = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+    destination_count = models.PositiveIntegerField(default=0, editable=False)
+    expense_total = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+    expense_category_totals = models.JSONField(default=dict, blank=True, editable=False)
+
     def __str__(self):
         return f"{self.title} - {self.user.username}"
 
@@ -60,11 +120,7 @@ class Itinerary(models.Model):
         return max(delta.days + 1, 1)
 
     def get_total_destination_cost(self):
-        total = 0
-        for itinerary_dest in self.itinerary_destinations.all():
-            if itinerary_dest.calculated_price:
-                total += float(itinerary_dest.calculated_price)
-        return total
+        return self.destination_cost_total
 
     class Meta:
         ordering = ['-created_at']
@@ -78,10 +134,12 @@ class ItineraryDestination(models.Model):
     added_at = models.DateTimeField(auto_now_add=True)
     notes = models.TextField(blank=True)
     calculated_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    # Order among stops in the same date/time slot, e.g. a day planned without times
+    position = models.PositiveIntegerField(default=0)
 
     class Meta:
         unique_together = ('itinerary', 'destination')
-        ordering = ['visit_date', 'visit_time', 'added_at']
+        ordering = ['visit_date', 'visit_time', 'position', 'added_at']
 
     def __str__(self):
         return f"{self.destination.name} in {self.itinerary.title}"
@@ -126,6 +184,7 @@ class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     profile_picture = models.ImageField(upload_to='profile_pictures/', blank=True, null=True)
     profile_picture_url = models.URLField(max_length=500, blank=True, null=True)
+    profile_picture_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     def get_profile_picture_url(self):
         if self.profile_picture_url:
@@ -134,16 +193,216 @@ class Profile(models.Model):
             return self.profile_picture.url
         return None
 
+    def get_profile_picture_srcset(self):
+        from .images import srcset
+        return srcset(self.profile_picture_variants, self.profile_picture_url)
+
+class UploadJob(models.Model):
+    """An image waiting to be uploaded to Supabase by `manage.py process_upload_jobs`"""
+    TARGET_PROFILE_PICTURE = 'profile_picture'
+    TARGET_DESTINATION_IMAGE = 'destination_image'
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_DEAD = 'dead'
+
+    target = models.CharField(max_length=30, choices=[
+        (TARGET_PROFILE_PICTURE, 'Profile picture'),
+        (TARGET_DESTINATION_IMAGE, 'Destination image'),
+    ])
+    object_id = models.PositiveIntegerField()
+    bucket = models.CharField(max_length=100)
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, blank=True)
+    # Name of the file in upload staging storage; removed once the upload succeeds,
+    # kept on dead jobs so they can be requeued
+    staged_name = models.CharField(max_length=255, blank=True, editable=False)
+    idempotency_key = models.CharField(max_length=64, unique=True)
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='upload_jobs')
+
+    status = models.CharField(max_length=10, default=STATUS_PENDING, choices=[
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_DEAD, 'Dead'),
+    ])
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    result_url = models.URLField(max_length=500, blank=True)
+    result_variants = models.JSONField(default=dict, blank=True)
+    # Moved forward when the same image is submitted again; the latest request wins
+    requested_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            # The worker's "what is due" scan
+            models.Index(fields=['status', 'next_attempt_at'], name='uploadjob_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_target_display()} #{self.object_id} ({self.status})"
+
+
+class StoredObject(models.Model):
+    """Index of uploaded objects by content hash, so identical bytes are stored once"""
+    bucket = models.CharField(max_length=100)
+    sha256 = models.CharField(max_length=64)
+    path = models.CharField(max_length=255)
+    public_url = models.URLField(max_length=500)
+    size = models.BigIntegerField()
+    content_type = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('bucket', 'sha256')
+
+    def __str__(self):
+        return f"{self.bucket}/{self.path}"
+
+
+class ImageProbe(models.Model):
+    """Last health check of an image URL, written by `manage.py check_images --probe`"""
+    url = models.URLField(max_length=500, unique=True)
+    # None when the request itself failed (DNS, timeout, refused)
+    status = models.PositiveSmallIntegerField(null=True, blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    size = models.BigIntegerField(null=True, blank=True)
+    latency_ms = models.FloatField(null=True, blank=True)
+    error = models.CharField(max_length=255, blank=True)
+    checked_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [models.Index(fields=['checked_at'], name='imageprobe_checked_idx')]
+
+    def __str__(self):
+        return f"{self.url} ({self.status or self.error})"
+
+    @property
+    def ok(self):
+        return (
+            self.status is not None and 200 <= self.status < 300 and self.content_type.startswith('image/')
+            and not self.error
+        )
+
+
 # --- SIGNALS ---
+# Every user gets a profile once, when the account is created (migration 0023
+# backfilled older accounts); User saves such as last_login no longer touch it
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
     if created:
         Profile.objects.create(user=instance)
 
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    if hasattr(instance, 'profile'):
-        instance.profile.save()
+@receiver(post_save, sender=Destination)
+def sync_destination_tag_index(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'tags' not in update_fields:
+        return
+    from .tags import sync_destination_tags
+    sync_destination_tags([instance])
+
+@receiver(post_delete, sender=Destination)
+def prune_destination_tag_index(sender, instance, **kwargs):
+    from .tags import parse_tags, prune_unused_tags
+    # Its index rows went with it; only its own tags can have become unused
+    names = parse_tags(instance.tags)
+    if names:
+        prune_unused_tags(Tag.objects.filter(name__in=names))
+
+@receiver(post_save, sender=Destination)
+def refresh_destination_search_vector(sender, instance, **kwargs):
+    from .search import refresh_search_vectors
+    refresh_search_vectors(Destination.objects.filter(pk=instance.pk))
+
+@receiver(post_delete, sender=Destination)
+def drop_destination_from_search_index(sender, instance, **kwargs):
+    from .search import invalidate_search_index
+    invalidate_search_index()
+
+@receiver(post_save, sender=Destination)
+@receiver(post_delete, sender=Destination)
+def bump_catalog_cache_version(sender, instance, **kwargs):
+    from .catalog import bump_catalog_version
+    bump_catalog_version()
+
+@receiver(pre_save, sender=Destination)
+def remember_previous_price(sender, instance, update_fields=None, **kwargs):
+    instance._previous_price_per_day = None
+    if instance.pk and (update_fields is None or 'price_per_day' in update_fields):
+        instance._previous_price_per_day = (
+            Destination.objects.filter(pk=instance.pk).values_list('price_per_day', flat=True).first()
+        )
+
+@receiver(post_save, sender=Destination)
+def reprice_itineraries_for_destination(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_price_per_day', None)
+    if created or previous is None:
+        return
+    from .rollups import to_decimal
+    if to_decimal(previous) != to_decimal(instance.price_per_day):
+        from .pricing import reprice_destinations
+        reprice_destinations([instance.pk])
+
+# --- ITINERARY ROLLUPS ---
+@receiver(pre_save, sender=ItineraryDestination)
+@receiver(pre_save, sender=Expense)
+def remember_rollup_previous(sender, instance, **kwargs):
+    # The stored row before this save, so post_save can apply the difference
+    instance._rollup_previous = None
+    if instance.pk:
+        fields = ('itinerary_id', 'calculated_price') if sender is ItineraryDestination else ('itinerary_id', 'amount', 'category')
+        instance._rollup_previous = sender.objects.filter(pk=instance.pk).values(*fields).first()
+
+@receiver(post_save, sender=ItineraryDestination)
+def roll_up_itinerary_destination_save(sender, instance, **kwargs):
+    from .rollups import apply_rollup_delta, rollups_deferred, to_decimal
+    if rollups_deferred():
+        return
+    previous = getattr(instance, '_rollup_previous', None)
+    price = to_decimal(instance.calculated_price)
+
+    if previous and previous['itinerary_id'] == instance.itinerary_id:
+        apply_rollup_delta(instance.itinerary_id, destination_cost=price - to_decimal(previous['calculated_price']))
+        return
+    if previous:
+        apply_rollup_delta(previous['itinerary_id'], destination_cost=-to_decimal(previous['calculated_price']),
+                           destination_count=-1)
+    apply_rollup_delta(instance.itinerary_id, destination_cost=price, destination_count=1)
+
+@receiver(post_delete, sender=ItineraryDestination)
+def roll_up_itinerary_destination_delete(sender, instance, origin=None, **kwargs):
+    from .rollups import apply_rollup_delta, deleted_with_itinerary, rollups_deferred, to_decimal
+    if rollups_deferred() or deleted_with_itinerary(origin):
+        return
+    apply_rollup_delta(instance.itinerary_id, destination_cost=-to_decimal(instance.calculated_price),
+                       destination_count=-1)
+
+@receiver(post_save, sender=Expense)
+def roll_up_expense_save(sender, instance, **kwargs):
+    from .rollups import apply_rollup_delta, rollups_deferred, to_decimal
+    if rollups_deferred():
+        return
+    previous = getattr(instance, '_rollup_previous', None)
+    if previous:
+        old_amount = to_decimal(previous['amount'])
+        apply_rollup_delta(previous['itinerary_id'], expense=-old_amount,
+                           category_deltas={previous['category']: -old_amount})
+    amount = to_decimal(instance.amount)
+    apply_rollup_delta(instance.itinerary_id, expense=amount, category_deltas={instance.category: amount})
+
+@receiver(post_delete, sender=Expense)
+def roll_up_expense_delete(sender, instance, origin=None, **kwargs):
+    from .rollups import apply_rollup_delta, deleted_with_itinerary, rollups_deferred, to_decimal
+    if rollups_deferred() or deleted_with_itinerary(origin):
+        return
+    amount = to_decimal(instance.amount)
+    apply_rollup_delta(instance.itinerary_id, expense=-amount, category_deltas={instance.category: -amount})
 
 # --- MOVED OUTSIDE OF SIGNAL ---
 class ContactMessage(models.Model):
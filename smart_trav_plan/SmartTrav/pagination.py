@@ -0,0 +1,151 @@
+import base64
+import datetime
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+
+DEFAULT_PAGE_SIZE = 24
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder cuts datetimes and times to milliseconds; a cursor must keep them exact."""
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, cls=CursorEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise InvalidCursor('Malformed cursor')
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor('Cursor does not match ordering')
+    return values
+
+
+def _typed(model, ordering, values):
+    """Cursor values parsed back by their model fields (e.g. ISO text to a datetime, microseconds included)."""
+    typed = []
+    for field, value in zip(ordering, values):
+        try:
+            model_field = model._meta.get_field(field.lstrip('-'))
+        except FieldDoesNotExist:
+            # An annotation (e.g. a search rank): JSON already has its type
+            model_field = None
+        # Only a nullable column can have put a null in a cursor
+        if value is None and not (model_field and model_field.null):
+            raise InvalidCursor('Malformed cursor')
+        if model_field is None:
+            typed.append(value)
+            continue
+        try:
+            typed.append(model_field.to_python(value))
+        except (ValidationError, TypeError, ValueError):
+            raise InvalidCursor('Malformed cursor')
+    return typed
+
+
+def _nullable(model, ordering):
+    """The ordering fields that can hold NULL; these sort after every value, as Postgres does by default."""
+    nullable = set()
+    for field in ordering:
+        try:
+            if model._meta.get_field(field.lstrip('-')).null:
+                nullable.add(field.lstrip('-'))
+        except FieldDoesNotExist:
+            pass
+    return nullable
+
+
+def _order_by(ordering, nullable):
+    order = []
+    for field in ordering:
+        name = field.lstrip('-')
+        if name not in nullable:
+            order.append(field)
+        elif field.startswith('-'):
+            order.append(F(name).desc(nulls_last=True))
+        else:
+            order.append(F(name).asc(nulls_last=True))
+    return order
+
+
+def _seek_filter(ordering, values, nullable=()):
+    """
+    Rows strictly after `values` in `ordering`, written as the expanded
+    (a > x) OR (a = x AND b > y) ... form so each branch can use an index.
+    NULLs sort last, so for a nullable field "after x" also takes the NULL
+    rows, and nothing comes after NULL itself.
+    """
+    condition = Q()
+    for position, field in enumerate(ordering):
+        name = field.lstrip('-')
+        value = values[position]
+        if value is None:
+            continue
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        after = Q(**{f'{name}__{lookup}': value})
+        if name in nullable:
+            after |= Q(**{f'{name}__isnull': True})
+        branch = after
+        for previous, previous_value in zip(ordering[:position], values[:position]):
+            previous = previous.lstrip('-')
+            if previous_value is None:
+                branch &= Q(**{f'{previous}__isnull': True})
+            else:
+                branch &= Q(**{previous: previous_value})
+        condition |= branch
+    return condition
+
+
+def keyset_paginate(queryset, ordering, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Return one page of `queryset` ordered by `ordering` (field names, '-' for
+    descending; the last one must be unique, e.g. 'id'). Pages seek past the
+    previous page's last row instead of using OFFSET, so page N costs the
+    same as page 1.
+    """
+    nullable = _nullable(queryset.model, ordering)
+    queryset = queryset.order_by(*_order_by(ordering, nullable))
+    if cursor:
+        values = _typed(queryset.model, ordering, decode_cursor(cursor, len(ordering)))
+        queryset = queryset.filter(_seek_filter(ordering, values, nullable))
+
+    rows = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, field.lstrip('-')) for field in ordering])
+    return KeysetPage(rows, next_cursor)
@@ -0,0 +1,59 @@
+from django.db import transaction
+
+from .models import ItineraryDestination
+from .rollups import refresh_itinerary_rollups, to_decimal
+
+BATCH_SIZE = 500
+
+
+def stop_price(price_per_day, start_date, end_date):
+    """The same figure ItineraryDestination.save stores, computed from raw column values."""
+    days = max((end_date - start_date).days + 1, 1)
+    return to_decimal(price_per_day * days)
+
+
+def recalculate_prices(itinerary_destinations, batch_size=BATCH_SIZE):
+    """
+    Recompute calculated_price for an ItineraryDestination queryset with one
+    joined read and batched bulk_update calls, then refresh the rollups of the
+    itineraries that changed (bulk_update does not send signals).
+    Returns the number of rows whose price changed.
+    """
+    rows = itinerary_destinations.order_by().values_list(
+        'pk', 'itinerary_id', 'calculated_price',
+        'destination__price_per_day', 'itinerary__start_date', 'itinerary__end_date',
+    )
+
+    changed = 0
+    touched = set()
+    batch = []
+
+    def flush():
+        ItineraryDestination.objects.bulk_update(batch, ['calculated_price'])
+        batch.clear()
+
+    with transaction.atomic():
+        for pk, itinerary_id, current, price_per_day, start_date, end_date in rows.iterator(chunk_size=batch_size):
+            price = stop_price(price_per_day, start_date, end_date)
+            if current is not None and to_decimal(current) == price:
+                continue
+            batch.append(ItineraryDestination(pk=pk, calculated_price=price))
+            touched.add(itinerary_id)
+            changed += 1
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+        if touched:
+            refresh_itinerary_rollups(touched)
+    return changed
+
+
+def reprice_itineraries(itinerary_ids):
+    """Reprice every stop on the given itineraries, e.g. after their dates change."""
+    return recalculate_prices(ItineraryDestination.objects.filter(itinerary_id__in=list(itinerary_ids)))
+
+
+def reprice_destinations(destination_ids):
+    """Reprice every itinerary stop at the given destinations, e.g. after price_per_day changes."""
+    return recalculate_prices(ItineraryDestination.objects.filter(destination_id__in=list(destination_ids)))
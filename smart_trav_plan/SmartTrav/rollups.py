@@ -0,0 +1,185 @@
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .models import Itinerary, ItineraryDestination, Expense
+
+ROLLUP_FIELDS = ('destination_cost_total', 'destination_count', 'expense_total', 'expense_category_totals')
+ZERO = Decimal('0.00')
+
+_state = threading.local()
+
+
+def to_decimal(value):
+    """Money values arrive as Decimal, str (from request.POST) or float; normalize to 2dp Decimal."""
+    if value is None or value == '':
+        return ZERO
+    return Decimal(str(value)).quantize(ZERO)
+
+
+def merge_category_totals(totals, deltas):
+    """Apply per-category deltas to a {category: '123.45'} mapping, dropping zeroed categories."""
+    merged = dict(totals or {})
+    for category, delta in deltas.items():
+        value = to_decimal(merged.get(category)) + delta
+        if value:
+            merged[category] = str(value)
+        else:
+            merged.pop(category, None)
+    return merged
+
+
+@contextmanager
+def defer_rollups():
+    """
+    Skip the per-row rollup signal handlers inside the block, for batched
+    writes that call refresh_itinerary_rollups() once afterwards.
+    """
+    previous = rollups_deferred()
+    _state.deferred = True
+    try:
+        yield
+    finally:
+        _state.deferred = previous
+
+
+def rollups_deferred():
+    return getattr(_state, 'deferred', False)
+
+
+def deleted_with_itinerary(origin):
+    """
+    True if a stop or expense is being deleted because its itinerary is (the
+    delete started from an Itinerary or a User, instance or queryset), so
+    there are no totals left to update.
+    """
+    return getattr(origin, 'model', type(origin)) in (Itinerary, User)
+
+
+def apply_rollup_delta(itinerary_id, destination_cost=ZERO, destination_count=0,
+                       expense=ZERO, category_deltas=None):
+    """
+    Add the given deltas to one itinerary's running totals and touch its
+    updated_at. The row is locked for the read-modify-write of the category
+    map so concurrent expense writes cannot lose each other's updates.
+    """
+    with transaction.atomic():
+        current = (
+            Itinerary.objects.select_for_update()
+            .filter(pk=itinerary_id)
+            .values('expense_category_totals')
+            .first()
+        )
+        if current is None:
+            # Deleted by another transaction since this row was read; there are no totals left to update
+            return
+
+        updates = {
+            'destination_cost_total': F('destination_cost_total') + destination_cost,
+            'destination_count': F('destination_count') + destination_count,
+            'expense_total': F('expense_total') + expense,
+            'updated_at': timezone.now(),
+        }
+        if category_deltas:
+            updates['expense_category_totals'] = merge_category_totals(
+                current['expense_category_totals'], category_deltas
+            )
+        Itinerary.objects.filter(pk=itinerary_id).update(**updates)
+
+
+# --- Full recompute (rebuild/verify command, bulk writes) ---
+
+def compute_rollups(itinerary_ids):
+    """Rollup values for the given itineraries, computed from their child rows with SQL aggregates."""
+    rollups = {
+        pk: {
+            'destination_cost_total': ZERO,
+            'destination_count': 0,
+            'expense_total': ZERO,
+            'expense_category_totals': {},
+        }
+        for pk in itinerary_ids
+    }
+
+    destination_totals = (
+        ItineraryDestination.objects.filter(itinerary_id__in=itinerary_ids)
+        .values('itinerary_id')
+        .annotate(total=Sum('calculated_price'), count=Count('id'))
+        .order_by()
+    )
+    for row in destination_totals:
+        rollups[row['itinerary_id']]['destination_cost_total'] = to_decimal(row['total'])
+        rollups[row['itinerary_id']]['destination_count'] = row['count']
+
+    expense_totals = (
+        Expense.objects.filter(itinerary_id__in=itinerary_ids)
+        .values('itinerary_id', 'category')
+        .annotate(total=Sum('amount'))
+        .order_by()
+    )
+    running = defaultdict(lambda: ZERO)
+    for row in expense_totals:
+        amount = to_decimal(row['total'])
+        running[row['itinerary_id']] += amount
+        if amount:
+            rollups[row['itinerary_id']]['expense_category_totals'][row['category']] = str(amount)
+    for pk, total in running.items():
+        rollups[pk]['expense_total'] = total
+
+    return rollups
+
+
+def _stored_matches(itinerary, values):
+    return (
+        to_decimal(itinerary.destination_cost_total) == values['destination_cost_total']
+        and itinerary.destination_count == values['destination_count']
+        and to_decimal(itinerary.expense_total) == values['expense_total']
+        and (itinerary.expense_category_totals or {}) == values['expense_category_totals']
+    )
+
+
+def rebuild_rollups(itineraries, batch_size=500, dry_run=False):
+    """
+    Recompute rollups for an Itinerary queryset in batches and write back the
+    ones that drifted. Returns the ids whose stored values were wrong.
+    """
+    drifted = []
+    itineraries = itineraries.only('id', *ROLLUP_FIELDS).order_by('id')
+    batch = []
+
+    def flush():
+        rollups = compute_rollups([itinerary.pk for itinerary in batch])
+        stale = []
+        for itinerary in batch:
+            values = rollups[itinerary.pk]
+            if not _stored_matches(itinerary, values):
+                for field, value in values.items():
+                    setattr(itinerary, field, value)
+                stale.append(itinerary)
+        drifted.extend(itinerary.pk for itinerary in stale)
+        if stale and not dry_run:
+            Itinerary.objects.bulk_update(stale, ROLLUP_FIELDS)
+        batch.clear()
+
+    with transaction.atomic():
+        for itinerary in itineraries.iterator(chunk_size=batch_size):
+            batch.append(itinerary)
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    return drifted
+
+
+def refresh_itinerary_rollups(itinerary_ids):
+    """Recompute rollups for specific itineraries after writes that bypass signals (bulk_update, update())."""
+    itineraries = Itinerary.objects.filter(pk__in=list(itinerary_ids))
+    # Their stops changed even where the totals did not
+    itineraries.update(updated_at=timezone.now())
+    return rebuild_rollups(itineraries)
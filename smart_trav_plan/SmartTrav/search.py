@@ -0,0 +1,165 @@
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connections
+from django.db.models import Case, IntegerField, Value, When
+from django.db.models.functions import Cast
+
+from .models import Destination
+from .pagination import DEFAULT_PAGE_SIZE
+
+SEARCH_CONFIG = 'english'
+SUGGESTION_LIMIT = 8
+
+# Search results carry an integer `search_rank` (higher is better) so they
+# can be keyset-paginated with this ordering.
+SEARCH_ORDERING = ('-search_rank', 'id')
+RANK_SCALE = 1000000
+# The fallback ranks at most this many matches: each costs three bound
+# parameters (a When pk, its rank and a pk__in entry), and SQLite caps a
+# statement at 999 of them in older builds.
+FALLBACK_RESULT_LIMIT = DEFAULT_PAGE_SIZE * 10
+
+# Field weights shared by the Postgres vector and the in-memory index
+FIELD_WEIGHTS = (('name', 'A', 4), ('location', 'B', 2), ('description', 'C', 1))
+
+DESTINATION_SEARCH_VECTOR = (
+    SearchVector('name', weight='A', config=SEARCH_CONFIG)
+    + SearchVector('location', weight='B', config=SEARCH_CONFIG)
+    + SearchVector('description', weight='C', config=SEARCH_CONFIG)
+)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+
+def uses_postgres(queryset):
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+# --- Postgres backend ---
+
+def refresh_search_vectors(queryset=None):
+    """Recompute the stored search vector for the given destinations in one UPDATE."""
+    queryset = Destination.objects.all() if queryset is None else queryset
+    if uses_postgres(queryset):
+        queryset.update(search_vector=DESTINATION_SEARCH_VECTOR)
+    else:
+        invalidate_search_index()
+
+
+def _prefix_query(terms):
+    # Every term must match; each one may be a prefix for type-ahead
+    return SearchQuery(
+        ' & '.join(f'{term}:*' for term in terms),
+        search_type='raw',
+        config=SEARCH_CONFIG,
+    )
+
+
+def _postgres_search(queryset, terms):
+    query = _prefix_query(terms)
+    rank = SearchRank('search_vector', query) * Value(RANK_SCALE)
+    return (
+        queryset.filter(search_vector=query)
+        .annotate(search_rank=Cast(rank, IntegerField()))
+        .order_by(*SEARCH_ORDERING)
+    )
+
+
+# --- In-memory fallback (SQLite / development) ---
+
+class InvertedIndex:
+    """
+    Token -> {destination id: weighted score} postings with a sorted token
+    list so prefix lookups are a bisect rather than a scan.
+    """
+
+    def __init__(self, rows):
+        postings = defaultdict(lambda: defaultdict(int))
+        self.names = {}
+        for row in rows:
+            self.names[row['id']] = row['name']
+            for field, _, weight in FIELD_WEIGHTS:
+                for token in tokenize(row[field]):
+                    postings[token][row['id']] += weight
+        self.postings = {token: dict(ids) for token, ids in postings.items()}
+        self.tokens = sorted(self.postings)
+
+    def _prefix_scores(self, prefix):
+        scores = defaultdict(int)
+        position = bisect_left(self.tokens, prefix)
+        while position < len(self.tokens) and self.tokens[position].startswith(prefix):
+            for pk, score in self.postings[self.tokens[position]].items():
+                scores[pk] += score
+            position += 1
+        return scores
+
+    def search(self, terms):
+        """Ids matching every term (as a prefix), best score first."""
+        totals = None
+        for term in terms:
+            scores = self._prefix_scores(term)
+            if totals is None:
+                totals = scores
+            else:
+                totals = {pk: totals[pk] + score for pk, score in scores.items() if pk in totals}
+            if not totals:
+                return []
+        return sorted(totals, key=lambda pk: (-totals[pk], self.names[pk]))
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def invalidate_search_index():
+    global _index
+    _index = None
+
+
+def get_search_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            rows = Destination.objects.values('id', *(field for field, _, _ in FIELD_WEIGHTS))
+            _index = InvertedIndex(rows.iterator())
+        return _index
+
+
+def _fallback_search(queryset, terms):
+    ranked_ids = get_search_index().search(terms)[:FALLBACK_RESULT_LIMIT]
+    if not ranked_ids:
+        return queryset.none()
+    total = len(ranked_ids)
+    search_rank = Case(
+        *[When(pk=pk, then=Value(total - position)) for position, pk in enumerate(ranked_ids)],
+        output_field=IntegerField(),
+    )
+    return queryset.filter(pk__in=ranked_ids).annotate(search_rank=search_rank).order_by(*SEARCH_ORDERING)
+
+
+# --- Public API ---
+
+def search_destinations(queryset, query):
+    """Filter a Destination queryset by a text query and order it by relevance."""
+    terms = tokenize(query)
+    if not terms:
+        return queryset
+    if uses_postgres(queryset):
+        return _postgres_search(queryset, terms)
+    return _fallback_search(queryset, terms)
+
+
+def suggest_destinations(query, limit=SUGGESTION_LIMIT):
+    """Type-ahead suggestions: the best-ranked destinations for a partial query."""
+    if not tokenize(query):
+        return []
+    results = search_destinations(Destination.objects.all(), query)
+    return list(results.values('id', 'name', 'location')[:limit])
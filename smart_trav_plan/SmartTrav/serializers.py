@@ -0,0 +1,197 @@
+from collections.abc import Mapping
+
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+from .models import Destination, Expense, Itinerary, ItineraryDestination
+
+
+class SparseFieldsMixin:
+    """
+    A serializer rendering only `fields` (every field when None), for the
+    API's ?fields=a,b sparse fieldsets. `columns` maps output fields that are
+    not model columns to the columns they are computed from.
+    """
+    columns = {}
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def field_names(cls):
+        return list(cls().fields)
+
+    @classmethod
+    def columns_for(cls, fields):
+        """Model columns needed to render `fields`, for QuerySet.only(); None means all of them."""
+        if fields is None:
+            return None
+        concrete = {field.name for field in cls.Meta.model._meta.concrete_fields}
+        needed = {'id'}
+        for name in fields:
+            needed.update(column for column in cls.columns.get(name, (name,)) if column in concrete)
+        return sorted(needed)
+
+
+class DestinationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    tags = serializers.ListField(source='get_tags_list', child=serializers.CharField(), read_only=True)
+    image_srcset = serializers.CharField(source='get_image_srcset', read_only=True)
+
+    columns = {'image_srcset': ('image_url', 'image_variants')}
+
+    class Meta:
+        model = Destination
+        fields = ('id', 'name', 'description', 'location', 'category', 'price_range', 'price_per_day',
+                  'tags', 'image_url', 'image_srcset', 'created_at')
+
+
+class StopDestinationSerializer(serializers.ModelSerializer):
+    """The parts of a destination shown on an itinerary stop."""
+
+    class Meta:
+        model = Destination
+        fields = ('id', 'name', 'location', 'category', 'price_per_day', 'image_url')
+
+
+class ItineraryDestinationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    destination = StopDestinationSerializer(read_only=True)
+
+    class Meta:
+        model = ItineraryDestination
+        fields = ('id', 'itinerary', 'destination', 'visit_date', 'visit_time', 'position', 'notes',
+                  'calculated_price', 'added_at')
+
+
+class ExpenseSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    itinerary_title = serializers.CharField(source='itinerary.title', read_only=True)
+
+    columns = {'itinerary_title': ('itinerary',)}
+
+    class Meta:
+        model = Expense
+        fields = ('id', 'itinerary', 'itinerary_title', 'category', 'description', 'amount', 'date',
+                  'created_at')
+
+
+class ItinerarySerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    duration_days = serializers.IntegerField(source='get_duration_days', read_only=True)
+    # Annotated by SmartTrav.budget.annotate_budget
+    total_spent = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+    budget_remaining = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+    budget_status = serializers.CharField(read_only=True)
+
+    columns = {'duration_days': ('start_date', 'end_date')}
+
+    class Meta:
+        model = Itinerary
+        fields = ('id', 'title', 'start_date', 'end_date', 'duration_days', 'budget', 'notes',
+                  'destination_count', 'destination_cost_total', 'expense_total', 'expense_category_totals',
+                  'total_spent', 'budget_remaining', 'budget_status', 'created_at', 'updated_at')
+
+
+class ItineraryDetailSerializer(ItinerarySerializer):
+    stops = ItineraryDestinationSerializer(source='itinerary_destinations', many=True, read_only=True)
+    expenses = ExpenseSerializer(many=True, read_only=True)
+
+    class Meta(ItinerarySerializer.Meta):
+        fields = ItinerarySerializer.Meta.fields + ('stops', 'expenses')
+
+
+# --- Batch stop changes ---
+
+MAX_BATCH_SIZE = 200
+
+
+class StopScheduleSerializer(serializers.Serializer):
+    visit_date = serializers.DateField(required=False, allow_null=True)
+    visit_time = serializers.TimeField(required=False, allow_null=True)
+    notes = serializers.CharField(required=False, allow_blank=True)
+
+
+class StopAddSerializer(StopScheduleSerializer):
+    destination = serializers.IntegerField()
+
+
+class StopUpdateSerializer(StopScheduleSerializer):
+    id = serializers.IntegerField()
+
+
+class StopBatchSerializer(serializers.Serializer):
+    """
+    Changes to the stops of context['itinerary'], validated together: one
+    query loads the trip's stops and one the added destinations, and any
+    error rejects the whole batch. `order` lists every remaining stop id in
+    its new order (added stops go after them).
+    """
+    add = serializers.ListField(child=StopAddSerializer(), required=False, default=list)
+    update = serializers.ListField(child=StopUpdateSerializer(), required=False, default=list)
+    order = serializers.ListField(child=serializers.IntegerField(), required=False)
+    remove = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+
+    def to_internal_value(self, data):
+        # Counted on the raw lists, so an oversized batch is rejected before any item is parsed
+        if isinstance(data, Mapping):
+            size = sum(len(data[name]) for name in self.fields if isinstance(data.get(name), list))
+            if size > MAX_BATCH_SIZE:
+                raise serializers.ValidationError(
+                    {api_settings.NON_FIELD_ERRORS_KEY: [f'At most {MAX_BATCH_SIZE} changes per batch']}
+                )
+        return super().to_internal_value(data)
+
+    def validate(self, data):
+        itinerary = self.context['itinerary']
+        stops = {stop.pk: stop for stop in ItineraryDestination.objects.filter(itinerary=itinerary)}
+        destinations = Destination.objects.only(*StopDestinationSerializer.Meta.fields).in_bulk(
+            [item['destination'] for item in data['add']]
+        )
+        errors = {}
+
+        def reject(key, index, message):
+            errors.setdefault(key, {}).setdefault(index, []).append(message)
+
+        def check_date(key, index, item):
+            visit_date = item.get('visit_date')
+            if visit_date and not itinerary.start_date <= visit_date <= itinerary.end_date:
+                reject(key, index, f'Visit date must be between {itinerary.start_date} and {itinerary.end_date}')
+
+        removed = set()
+        for index, pk in enumerate(data['remove']):
+            if pk not in stops:
+                reject('remove', index, f'Stop {pk} is not on this trip')
+            elif pk in removed:
+                reject('remove', index, f'Stop {pk} is listed twice')
+            removed.add(pk)
+
+        updated = set()
+        for index, item in enumerate(data['update']):
+            pk = item['id']
+            if pk not in stops or pk in removed:
+                reject('update', index, f'Stop {pk} is not on this trip')
+            elif pk in updated:
+                reject('update', index, f'Stop {pk} is listed twice')
+            updated.add(pk)
+            check_date('update', index, item)
+
+        kept = {stop.destination_id for pk, stop in stops.items() if pk not in removed}
+        added = set()
+        for index, item in enumerate(data['add']):
+            destination = destinations.get(item['destination'])
+            if destination is None:
+                reject('add', index, f'Destination {item["destination"]} does not exist')
+            elif destination.pk in kept or destination.pk in added:
+                reject('add', index, f'{destination.name} is already in {itinerary.title}')
+            added.add(item['destination'])
+            check_date('add', index, item)
+
+        order = data.get('order')
+        if order is not None:
+            remaining = set(stops) - removed
+            if len(order) != len(set(order)) or set(order) != remaining:
+                errors['order'] = ['Must list each remaining stop of this trip exactly once']
+
+        if errors:
+            raise serializers.ValidationError(errors)
+        return {**data, 'stops': stops, 'destinations': destinations}
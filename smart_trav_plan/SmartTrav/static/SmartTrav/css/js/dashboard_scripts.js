@@ -174,12 +174,25 @@ document.addEventListener('DOMContentLoaded', function() {
         showSection(sectionParam);
     }
 
-    // ============================================================
-    // 2. TAG CART LOGIC (Type -> Enter -> Add Tag -> Click Search)
-    // ============================================================
-    const tagInput = document.getElementById('tagInput');
-    const tagsContainer = document.getElementById('tagsContainer');
-    const hiddenInput = document.getElementById('hiddenTagsInput');
+    // Adding to a trip updates it in place instead of reloading the dashboard
+    const addToTripForm = document.getElementById('addToTripForm');
+    if (addToTripForm) addToTripForm.addEventListener('submit', submitAddToTrip);
+
+    // Wire up the section the server rendered with the page
+    initSection(document);
+    document.querySelectorAll('.content-section[data-loaded="true"][data-source-url]').forEach(section => {
+        checkSource(section.dataset.sourceUrl).then(etag => { section.dataset.sourceEtag = etag; }).catch(() => {});
+    });
+});
+
+// ============================================================
+// TAG CART LOGIC (Type -> Enter -> Add Tag -> Click Search)
+// ============================================================
+function initTagCart(root) {
+    const tagInput = root.querySelector('#tagInput');
+    const tagsContainer = root.querySelector('#tagsContainer');
+    const hiddenInput = root.querySelector('#hiddenTagsInput');
+    if (!tagInput || !tagsContainer || !hiddenInput) return;
 
     // Array to store current tags
     let tags = [];
@@ -258,10 +271,160 @@ document.addEventListener('DOMContentLoaded', function() {
     function updateHiddenInput() {
         hiddenInput.value = tags.join(',');
     }
-});
+}
+
+// --- DESTINATION SEARCH TYPE-AHEAD ---
+function initSearchTypeahead(root) {
+    const searchInput = root.querySelector('#destinationSearchInput');
+    const suggestionList = root.querySelector('#destinationSuggestions');
+    if (!searchInput || !suggestionList) return;
+
+    let debounceTimer = null;
+    searchInput.addEventListener('input', function() {
+        clearTimeout(debounceTimer);
+        const query = searchInput.value.trim();
+        if (query.length < 2) {
+            suggestionList.innerHTML = '';
+            return;
+        }
+
+        // Wait for the user to pause typing before asking the server
+        debounceTimer = setTimeout(() => {
+            fetch(`${searchInput.dataset.suggestUrl}?q=${encodeURIComponent(query)}`)
+                .then(response => response.json())
+                .then(data => {
+                    suggestionList.innerHTML = '';
+                    data.results.forEach(result => {
+                        const option = document.createElement('option');
+                        option.value = result.name;
+                        option.label = result.location;
+                        suggestionList.appendChild(option);
+                    });
+                })
+                .catch(() => { suggestionList.innerHTML = ''; });
+        }, 200);
+    });
+}
+
+// --- INFINITE SCROLL FOR DESTINATIONS, SAVED & EXPENSES ---
+function loadNextPage(sentinel) {
+    if (sentinel.dataset.loading === 'true') return;
+    sentinel.dataset.loading = 'true';
+
+    // Keep the current filters (category, search, price, tags) and add the cursor
+    const params = new URLSearchParams(window.location.search);
+    params.set('cursor', sentinel.dataset.cursor);
+
+    fetch(`${sentinel.dataset.url}?${params.toString()}`)
+        .then(response => response.json())
+        .then(data => {
+            const target = document.getElementById(sentinel.dataset.target);
+            if (target && data.html) target.insertAdjacentHTML('beforeend', data.html);
+
+            if (data.has_next) {
+                sentinel.dataset.cursor = data.next_cursor;
+                sentinel.dataset.loading = 'false';
+            } else {
+                sentinel.remove();
+            }
+        })
+        .catch(() => { sentinel.dataset.loading = 'false'; });
+}
+
+function initLoadMore(root) {
+    const sentinels = root.querySelectorAll('.load-more-sentinel');
+
+    sentinels.forEach(sentinel => {
+        const button = sentinel.querySelector('button');
+        if (button) button.addEventListener('click', () => loadNextPage(sentinel));
+    });
+
+    if ('IntersectionObserver' in window) {
+        const observer = new IntersectionObserver(entries => {
+            entries.forEach(entry => {
+                // Hidden sections have no size, so only visible lists auto-load
+                if (entry.isIntersecting && entry.target.isConnected) loadNextPage(entry.target);
+            });
+        }, { rootMargin: '400px' });
+        sentinels.forEach(sentinel => observer.observe(sentinel));
+    }
+}
 
 // --- HELPER FUNCTIONS ---
 
+// --- LAZY SECTION LOADING ---
+
+// Wire up the interactive parts of a freshly rendered section
+function initSection(root) {
+    initTagCart(root);
+    initSearchTypeahead(root);
+    initLoadMore(root);
+    initDateValidation(root);
+    initUploadStatus(root);
+}
+
+// Ask the JSON API whether the data at `url` changed since `etag`; resolves to its current ETag.
+// A 304 costs the server a validator lookup instead of rendering the section again.
+function checkSource(url, etag) {
+    const headers = { 'Accept': 'application/json' };
+    if (etag) headers['If-None-Match'] = etag;
+    // no-store, or the browser would answer the 304 from its own cache as a 200
+    return fetch(url, { headers, cache: 'no-store' }).then(response => {
+        if (!response.ok && response.status !== 304) throw new Error(`Failed to check ${url}`);
+        return response.headers.get('ETag') || '';
+    });
+}
+
+// Fetch an HTML fragment into `container` once; later calls reuse it
+function loadFragment(container) {
+    if (!container || container.dataset.loaded === 'true') {
+        return Promise.resolve(container);
+    }
+    if (!container.fragmentRequest) {
+        // Remember what the fragment was built from, asked before the HTML so a change in between is not missed
+        if (container.dataset.sourceUrl && !container.dataset.sourceEtag) {
+            checkSource(container.dataset.sourceUrl)
+                .then(etag => { container.dataset.sourceEtag = etag; })
+                .catch(() => {});
+        }
+        // Sections keep the page's filters (search, category, tags...) in their request
+        const url = `${container.dataset.fragmentUrl}${window.location.search}`;
+        container.fragmentRequest = fetch(url)
+            .then(response => {
+                if (!response.ok) throw new Error(`Failed to load ${url}`);
+                return response.text();
+            })
+            .then(html => {
+                container.innerHTML = html;
+                container.dataset.loaded = 'true';
+                initSection(container);
+                return container;
+            })
+            .catch(error => {
+                container.fragmentRequest = null;
+                throw error;
+            });
+    }
+    return container.fragmentRequest;
+}
+
+// Load a fragment, or re-fetch one loaded earlier if the data behind it has changed since
+function refreshFragment(container) {
+    if (!container || container.dataset.loaded !== 'true' || !container.dataset.sourceUrl) {
+        return loadFragment(container);
+    }
+    const known = container.dataset.sourceEtag;
+    return checkSource(container.dataset.sourceUrl, known)
+        .then(etag => {
+            if (known && etag === known) return container;
+            container.dataset.sourceEtag = etag;
+            container.dataset.loaded = 'false';
+            container.fragmentRequest = null;
+            return loadFragment(container);
+        })
+        .catch(() => container);
+}
+
 function showSection(sectionId) {
     document.querySelectorAll('.content-section').forEach(section => {
         section.classList.remove('active');
@@ -279,6 +442,8 @@ function showSection(sectionId) {
     if (activeLink) {
         activeLink.classList.add('active');
     }
+
+    return refreshFragment(targetSection);
 }
 
 function toggleForm(formId) {
@@ -296,19 +461,24 @@ function closeNoTripModal() {
 
 function redirectToCreateTrip() {
     closeNoTripModal();
-    // Switch to My Trips tab
-    showSection('itineraries');
-    // Scroll to top
-    window.scrollTo(0, 0);
-    // Open the creation form
-    const form = document.getElementById('itinerary-form');
-    if (form && (form.style.display === 'none' || form.style.display === '')) {
-        toggleForm('itinerary-form');
-    }
+    // Switch to My Trips tab, then open the creation form once it has loaded
+    showSection('itineraries').then(() => {
+        window.scrollTo(0, 0);
+        const form = document.getElementById('itinerary-form');
+        if (form && (form.style.display === 'none' || form.style.display === '')) {
+            toggleForm('itinerary-form');
+        }
+    });
 }
 
 // --- UPDATED OPEN TRIP MODAL FUNCTION ---
 function openTripModal(destinationId, destinationName) {
+    // The trip list is fetched the first time the modal is needed, and again only if trips changed
+    refreshFragment(document.getElementById('tripOptions'))
+        .then(() => showTripModal(destinationId, destinationName));
+}
+
+function showTripModal(destinationId, destinationName) {
     // 1. Check if there are any trip radio buttons in the modal
     const tripOptions = document.querySelectorAll('#tripModal input[name="itinerary_id"]');
 
@@ -338,12 +508,106 @@ function closeTripModal() {
     if(modal) modal.classList.remove('show');
 }
 
+// --- BATCH TRIP CHANGES ---
+// POST {add, update, order, remove} to a trip's batch URL; resolves to the JSON diff, rejects with the errors
+function batchTripStops(url, changes, csrfToken) {
+    return fetch(url, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', 'X-CSRFToken': csrfToken },
+        body: JSON.stringify(changes),
+    }).then(response => response.json().then(data => {
+        if (!response.ok) throw data;
+        return data;
+    }));
+}
+
+// The first message in a DRF error body such as {"add": {"0": ["..."]}}
+function firstError(errors) {
+    if (typeof errors === 'string') return errors;
+    for (const value of Object.values(errors || {})) {
+        const message = firstError(value);
+        if (message) return message;
+    }
+    return '';
+}
+
+function showNotice(text, level) {
+    let container = document.querySelector('.alert-container');
+    if (!container) {
+        container = document.createElement('div');
+        container.className = 'alert-container';
+        container.style.cssText = 'padding: 0 2.5rem; margin-top: 1.5rem;';
+        const content = document.querySelector('.content-container');
+        if (!content) return;
+        content.parentNode.insertBefore(container, content);
+    }
+    const alert = document.createElement('div');
+    alert.className = `alert alert-${level} alert-dismissible fade show`;
+    alert.setAttribute('role', 'alert');
+    alert.textContent = text;
+    const close = document.createElement('button');
+    close.type = 'button';
+    close.className = 'btn-close';
+    close.setAttribute('data-bs-dismiss', 'alert');
+    alert.appendChild(close);
+    container.appendChild(alert);
+}
+
+function submitAddToTrip(event) {
+    const form = event.target;
+    const trip = form.querySelector('input[name="itinerary_id"]:checked');
+    // Without a batch URL the form posts the classic way
+    if (!trip || !trip.dataset.batchUrl) return;
+    event.preventDefault();
+
+    const destinationName = document.getElementById('destinationName').textContent;
+    const changes = { add: [{ destination: Number(document.getElementById('destinationId').value) }] };
+    batchTripStops(trip.dataset.batchUrl, changes, form.querySelector('[name="csrfmiddlewaretoken"]').value)
+        .then(diff => {
+            closeTripModal();
+            const price = Number(diff.added[0].calculated_price || 0).toLocaleString(undefined, { minimumFractionDigits: 2 });
+            showNotice(`${destinationName} added to ${trip.dataset.title}! Cost: ₱${price}`, 'success');
+            // Only the visible section is re-fetched, and only if its data changed
+            refreshFragment(document.querySelector('.content-section.active'));
+        })
+        .catch(errors => {
+            closeTripModal();
+            showNotice(firstError(errors) || 'Could not add the destination. Please try again.', 'warning');
+        });
+}
+
+// --- PENDING UPLOADS ---
+// Poll a queued picture upload until the worker has finished it
+function initUploadStatus(root) {
+    root.querySelectorAll('.upload-pending[data-status-url]').forEach(notice => {
+        const poll = () => {
+            fetch(notice.dataset.statusUrl, { headers: { 'X-Requested-With': 'XMLHttpRequest' } })
+                .then(response => response.json())
+                .then(job => {
+                    if (job.status === 'done') {
+                        const display = document.getElementById('profilePictureDisplay');
+                        if (display && job.url) {
+                            display.innerHTML = `<img src="${job.url}" alt="Profile Picture" id="profileImage">`;
+                        }
+                        notice.textContent = '✅ Profile picture updated';
+                    } else if (job.status === 'dead') {
+                        notice.textContent = '⚠️ The picture could not be uploaded. Please try again.';
+                    } else {
+                        setTimeout(poll, 3000);
+                    }
+                })
+                .catch(() => setTimeout(poll, 10000));
+        };
+        setTimeout(poll, 3000);
+    });
+}
+
 // --- DATE VALIDATION FOR TRIP CREATION ---
-document.addEventListener('DOMContentLoaded', function() {
+function initDateValidation(root) {
     const today = new Date().toISOString().split('T')[0];
 
     // 1. Target only 'start_date' inputs to avoid blocking expense dates
-    const startDateInputs = document.querySelectorAll('input[name="start_date"]');
+    const startDateInputs = root.querySelectorAll('input[name="start_date"]');
 
     startDateInputs.forEach(input => {
         // Set minimum date to today
@@ -366,4 +630,4 @@ document.addEventListener('DOMContentLoaded', function() {
             }
         });
     });
-});
\ No newline at end of file
+}
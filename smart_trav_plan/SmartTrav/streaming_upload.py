@@ -0,0 +1,133 @@
+import base64
+import mimetypes
+
+import httpx
+from django.conf import settings
+from django.core.files import File
+
+from .supabase_client import get_http_client, get_supabase_client, storage_headers, storage_url
+
+# Supabase's resumable endpoint requires 6 MB chunks (except the last one)
+RESUMABLE_CHUNK_SIZE = 6 * 1024 * 1024
+STREAM_CHUNK_SIZE = 64 * 1024
+TUS_VERSION = '1.0.0'
+
+
+class UploadError(Exception):
+    pass
+
+
+def _as_file(file):
+    return file if isinstance(file, File) else File(file)
+
+
+def _content_type(file, path, content_type):
+    return (
+        content_type
+        or getattr(file, 'content_type', None)
+        or mimetypes.guess_type(path)[0]
+        or 'application/octet-stream'
+    )
+
+
+def _check(response, action):
+    if response.status_code >= 400:
+        raise UploadError(f'{action} failed ({response.status_code}): {response.text[:200]}')
+    return response
+
+
+def stream_upload(file, path, bucket, content_type=None, upsert=False, cache_control=None,
+                  chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Upload in a single request whose body is read from file.chunks(), so at
+    most one chunk is held in memory regardless of file size.
+    """
+    file = _as_file(file)
+    headers = {
+        **storage_headers(),
+        'Content-Type': _content_type(file, path, content_type),
+        'Content-Length': str(file.size),
+        'x-upsert': 'true' if upsert else 'false',
+    }
+    if cache_control:
+        headers['cache-control'] = cache_control
+    response = get_http_client().post(
+        storage_url(f'object/{bucket}/{path}'),
+        content=file.chunks(chunk_size),
+        headers=headers,
+    )
+    _check(response, 'Upload')
+
+
+def _read_range(file, length, piece=STREAM_CHUNK_SIZE):
+    # Even a 6 MB TUS chunk is sent in small pieces rather than as one bytes object
+    while length > 0:
+        data = file.read(min(piece, length))
+        if not data:
+            break
+        length -= len(data)
+        yield data
+
+
+def _tus_metadata(**values):
+    return ','.join(f'{key} {base64.b64encode(value.encode()).decode()}' for key, value in values.items())
+
+
+def resumable_upload(file, path, bucket, content_type=None, upsert=False, cache_control=None,
+                     chunk_size=RESUMABLE_CHUNK_SIZE, max_resumes=5):
+    """
+    TUS upload to Supabase's resumable endpoint: one chunk per PATCH, and
+    after a failed chunk the server's offset is fetched and sending resumes
+    from there instead of restarting the file.
+    """
+    file = _as_file(file)
+    client = get_http_client()
+    tus_headers = {**storage_headers(), 'Tus-Resumable': TUS_VERSION}
+
+    created = _check(client.post(storage_url('upload/resumable'), headers={
+        **tus_headers,
+        'Upload-Length': str(file.size),
+        'Upload-Metadata': _tus_metadata(
+            bucketName=bucket, objectName=path, contentType=_content_type(file, path, content_type),
+            **({'cacheControl': cache_control} if cache_control else {}),
+        ),
+        'x-upsert': 'true' if upsert else 'false',
+    }), 'Creating resumable upload')
+    location = str(httpx.URL(storage_url('upload/resumable')).join(created.headers['Location']))
+
+    offset = 0
+    resumes = 0
+    while offset < file.size:
+        length = min(chunk_size, file.size - offset)
+        file.seek(offset)
+        try:
+            response = client.patch(location, content=_read_range(file, length), headers={
+                **tus_headers,
+                'Upload-Offset': str(offset),
+                'Content-Length': str(length),
+                'Content-Type': 'application/offset+octet-stream',
+            })
+            _check(response, 'Uploading chunk')
+            offset = int(response.headers['Upload-Offset'])
+        except (httpx.TransportError, UploadError):
+            resumes += 1
+            if resumes > max_resumes:
+                raise
+            # Ask the server how much it actually stored and continue from there
+            head = _check(client.head(location, headers=tus_headers), 'Fetching upload offset')
+            offset = int(head.headers['Upload-Offset'])
+
+
+def upload_file(file, path, bucket, content_type=None, upsert=False, cache_control=None):
+    """
+    Upload a (Django) file without reading it into memory: large files go
+    through the resumable endpoint, the rest are streamed in one request.
+    Returns the public URL.
+    """
+    threshold = getattr(settings, 'SUPABASE_RESUMABLE_THRESHOLD', RESUMABLE_CHUNK_SIZE)
+    file = _as_file(file)
+    if file.size > threshold:
+        resumable_upload(file, path, bucket, content_type, upsert, cache_control)
+    else:
+        stream_upload(file, path, bucket, content_type, upsert, cache_control)
+    return get_supabase_client().storage.from_(bucket).get_public_url(path)
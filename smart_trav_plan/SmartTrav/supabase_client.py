@@ -0,0 +1,210 @@
+import os
+import threading
+import time
+import weakref
+from collections import deque
+
+import httpx
+from django.conf import settings
+from supabase import create_client
+from supabase.lib.client_options import SyncClientOptions
+
+# Responses worth retrying for idempotent requests
+RETRY_STATUSES = {502, 503, 504}
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS'}
+LATENCY_SAMPLES = 1000
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class TransportMetrics:
+    """Request, connection-reuse and latency counters for the pooled transport."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._streams = weakref.WeakSet()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.connections_opened = 0
+            self.retries = 0
+            self.errors = 0
+            self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def record(self, response, elapsed):
+        stream = response.extensions.get('network_stream')
+        with self._lock:
+            self.requests += 1
+            self.latencies.append(elapsed)
+            if stream is not None and stream not in self._streams:
+                self._streams.add(stream)
+                self.connections_opened += 1
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            requests = self.requests
+            opened = self.connections_opened
+            retries, errors = self.retries, self.errors
+
+        def percentile(fraction):
+            if not latencies:
+                return 0.0
+            return latencies[min(int(len(latencies) * fraction), len(latencies) - 1)] * 1000
+
+        return {
+            'requests': requests,
+            'connections_opened': opened,
+            'reuse_rate': (requests - opened) / requests if requests else 0.0,
+            'retries': retries,
+            'errors': errors,
+            'latency_ms': {
+                'avg': sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+                'p50': percentile(0.50),
+                'p95': percentile(0.95),
+                'max': latencies[-1] * 1000 if latencies else 0.0,
+            },
+        }
+
+
+class PooledTransport(httpx.HTTPTransport):
+    """
+    Keep-alive connection pool that retries with exponential backoff.
+    Connection failures are retried for every method (nothing was sent);
+    gateway errors only for idempotent methods, so uploads are never doubled.
+    """
+
+    def __init__(self, metrics, retries=3, backoff=0.25, max_backoff=4.0, **kwargs):
+        super().__init__(**kwargs)
+        self.metrics = metrics
+        self.max_retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def _sleep(self, attempt):
+        self.metrics.record_retry()
+        time.sleep(min(self.backoff * (2 ** attempt), self.max_backoff))
+
+    def handle_request(self, request):
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                response = super().handle_request(request)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout):
+                if attempt >= self.max_retries:
+                    self.metrics.record_error()
+                    raise
+                self._sleep(attempt)
+                attempt += 1
+                continue
+
+            if (response.status_code in RETRY_STATUSES and request.method in IDEMPOTENT_METHODS
+                    and attempt < self.max_retries):
+                response.close()
+                self._sleep(attempt)
+                attempt += 1
+                continue
+
+            self.metrics.record(response, time.perf_counter() - started)
+            return response
+
+    @property
+    def pool_size(self):
+        return len(self._pool.connections)
+
+
+metrics = TransportMetrics()
+
+_client = None
+_transport = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def _build_client(url, key):
+    global _transport
+    _transport = PooledTransport(
+        metrics,
+        retries=_setting('SUPABASE_HTTP_RETRIES', 3),
+        backoff=_setting('SUPABASE_HTTP_BACKOFF', 0.25),
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=_setting('SUPABASE_HTTP_MAX_CONNECTIONS', 10),
+            max_keepalive_connections=_setting('SUPABASE_HTTP_MAX_KEEPALIVE', 5),
+            keepalive_expiry=_setting('SUPABASE_HTTP_KEEPALIVE_EXPIRY', 30.0),
+        ),
+    )
+    http_client = httpx.Client(
+        transport=_transport,
+        timeout=httpx.Timeout(
+            _setting('SUPABASE_HTTP_TIMEOUT', 20.0),
+            connect=_setting('SUPABASE_HTTP_CONNECT_TIMEOUT', 5.0),
+        ),
+        follow_redirects=True,
+    )
+    return create_client(url, key, options=SyncClientOptions(httpx_client=http_client))
+
+
+def get_supabase_client():
+    """
+    The process-wide Supabase client, created on first use. Each worker
+    process (checked by pid, so forked workers don't share sockets) keeps
+    one client and one keep-alive connection pool for its lifetime.
+    """
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+
+    with _client_lock:
+        if _client is None or _client_pid != pid:
+            url = _setting('SUPABASE_URL', None)
+            key = _setting('SUPABASE_KEY', None)
+            if not url or not key:
+                raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in environment variables")
+            _client = _build_client(url, key)
+            _client_pid = pid
+    return _client
+
+
+def get_http_client():
+    """The pooled httpx client behind the Supabase client, for requests storage3 can't stream."""
+    return get_supabase_client().options.httpx_client
+
+
+def storage_headers():
+    key = _setting('SUPABASE_KEY', None)
+    return {'apikey': key, 'Authorization': f'Bearer {key}'}
+
+
+def storage_url(path):
+    return f"{_setting('SUPABASE_URL', '').rstrip('/')}/storage/v1/{path.lstrip('/')}"
+
+
+def reset_supabase_client():
+    """Close the pooled connections and drop the client (settings changes, tests)."""
+    global _client, _transport, _client_pid
+    with _client_lock:
+        if _transport is not None:
+            _transport.close()
+        _client = _transport = _client_pid = None
+
+
+def get_client_stats():
+    stats = metrics.snapshot()
+    stats['pool_size'] = _transport.pool_size if _transport is not None else 0
+    stats['max_connections'] = _setting('SUPABASE_HTTP_MAX_CONNECTIONS', 10)
+    return stats
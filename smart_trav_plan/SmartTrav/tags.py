@@ -0,0 +1,91 @@
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Tag, DestinationTag
+
+TAG_MAX_LENGTH = Tag._meta.get_field('name').max_length
+SYNC_BATCH_SIZE = 500
+
+TAG_MATCH_ANY = 'any'
+TAG_MATCH_ALL = 'all'
+TAG_MATCH_MODES = (TAG_MATCH_ANY, TAG_MATCH_ALL)
+
+
+def parse_tags(value):
+    """Split a comma-separated tags string into clean, unique, lowercase names."""
+    names = []
+    for tag in (value or '').split(','):
+        tag = tag.strip().lower()[:TAG_MAX_LENGTH]
+        if tag and tag not in names:
+            names.append(tag)
+    return names
+
+
+def prune_unused_tags(tags=None):
+    """
+    Drop vocabulary entries no destination uses any more. Only `tags` (a Tag
+    queryset, e.g. the ones a write just dropped) are checked when given;
+    without it the whole vocabulary is (rebuild_tag_index).
+    """
+    tags = Tag.objects.all() if tags is None else tags
+    tags.filter(destination_tags__isnull=True).delete()
+
+
+def _sync_batch(destinations):
+    """Rebuild the index rows of a batch; returns the ids of the tags it took off some destination."""
+    wanted = {dest.pk: parse_tags(dest.tags) for dest in destinations}
+    names = {name for tags in wanted.values() for name in tags}
+
+    Tag.objects.bulk_create([Tag(name=name) for name in names], ignore_conflicts=True)
+    tag_ids = dict(Tag.objects.filter(name__in=names).values_list('name', 'id'))
+
+    current = DestinationTag.objects.filter(destination_id__in=wanted)
+    dropped = set(current.values_list('tag_id', flat=True)) - set(tag_ids.values())
+    current.delete()
+    DestinationTag.objects.bulk_create([
+        DestinationTag(destination_id=pk, tag_id=tag_ids[name])
+        for pk, tags in wanted.items()
+        for name in tags
+    ])
+    return dropped
+
+
+def sync_destination_tags(destinations):
+    """
+    Rebuild the tag index rows for the given destinations from their tags
+    field. Works in batches so bulk loads can pass their whole result set.
+    Only tags these destinations dropped can have become unused, so only
+    those are pruned.
+    """
+    destinations = [dest for dest in destinations if dest.pk]
+    dropped = set()
+    with transaction.atomic():
+        for start in range(0, len(destinations), SYNC_BATCH_SIZE):
+            dropped |= _sync_batch(destinations[start:start + SYNC_BATCH_SIZE])
+        if dropped:
+            prune_unused_tags(Tag.objects.filter(pk__in=dropped))
+
+
+def get_available_tags():
+    """Sorted tag vocabulary, read from the index instead of scanning destinations."""
+    return list(Tag.objects.order_by('name').values_list('name', flat=True))
+
+
+def filter_destinations_by_tags(queryset, tags, mode=TAG_MATCH_ANY):
+    """
+    Filter destinations on exact tag matches using the tag index.
+    mode='any' keeps destinations with at least one of the tags,
+    mode='all' keeps only those carrying every one of them.
+    """
+    names = parse_tags(','.join(tags))
+    if not names:
+        return queryset
+
+    matching = DestinationTag.objects.filter(tag__name__in=names)
+    if mode == TAG_MATCH_ALL:
+        matching = (
+            matching.values('destination_id')
+            .annotate(matched=Count('tag_id'))
+            .filter(matched=len(names))
+        )
+    return queryset.filter(pk__in=matching.values('destination_id'))
@@ -1,3 +1,1532 @@
-from django.test import TestCase
+import hashlib
+import io
+import json
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from decimal import Decimal
+from pathlib import Path
 
-# Create your tests here.
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.http import QueryDict
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from unittest import mock
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from .budget import annotate_budget, get_itinerary_budget, simulate_budgets
+from .catalog import CatalogCache
+from .catalog_io import FORMATS, export_rows, read_catalog, write_catalog
+from smart_trav_plan.storage_backends import SupabaseStorage, UploadStagingStorage, get_listing_cache
+from .content_store import IMMUTABLE_CACHE_CONTROL, store_file
+from .image_health import HostRateLimiter, check_images
+from .image_migration import Checkpoint, find_candidates, migrate_images
+from .images import derivative_path, render_derivatives, srcset
+from .dashboard import get_dashboard_summary, get_catalog_filters, get_destination_page, DASHBOARD_FRAGMENTS
+from .pagination import InvalidCursor, encode_cursor, keyset_paginate
+from .pricing import reprice_itineraries
+from .rollups import rebuild_rollups
+from .streaming_upload import resumable_upload, upload_file
+from .supabase_client import get_client_stats, get_supabase_client, metrics, reset_supabase_client
+from .search import search_destinations, suggest_destinations, SEARCH_ORDERING
+from .serializers import MAX_BATCH_SIZE, StopAddSerializer
+from .throttle import SlidingWindowLimiter, check_shared_cache, metrics as throttle_metrics
+from .tags import get_available_tags, filter_destinations_by_tags, parse_tags, TAG_MATCH_ALL
+from .uploads import check_staging_storage, enqueue_upload, get_staging_storage, requeue, run_pending_jobs
+from .models import (
+    Destination, Itinerary, ItineraryDestination, SavedDestination, Expense, Profile, StoredObject, UploadJob, ImageProbe,
+    Tag,
+)
+
+
+def make_destination(name, **kwargs):
+    defaults = {
+        'description': f'{name} description',
+        'location': 'Lapu-Lapu',
+        'category': 'beach',
+        'price_per_day': Decimal('2500.00'),
+    }
+    defaults.update(kwargs)
+    return Destination.objects.create(name=name, **defaults)
+
+
+def make_itinerary(user, title, start=None, days=3, budget=Decimal('10000.00')):
+    start = start or date.today() + timedelta(days=7)
+    return Itinerary.objects.create(
+        user=user,
+        title=title,
+        start_date=start,
+        end_date=start + timedelta(days=days - 1),
+        budget=budget,
+    )
+
+
+class DashboardQueryBudgetTests(TestCase):
+    # Session, user and profile lookups, the summary aggregate, one query per
+    # user list and the catalog reads.
+    QUERY_BUDGET = 10
+
+    def setUp(self):
+        self.user = User.objects.create_user('traveler', 'traveler@example.com', 'pass12345')
+        self.client.force_login(self.user)
+
+    def populate(self, count):
+        for i in range(count):
+            destination = make_destination(f'Spot {i}', tags='beach, family')
+            itinerary = make_itinerary(self.user, f'Trip {i}')
+            ItineraryDestination.objects.create(itinerary=itinerary, destination=destination)
+            SavedDestination.objects.create(user=self.user, destination=destination)
+            Expense.objects.create(
+                itinerary=itinerary, category='food', description='Lunch',
+                amount=Decimal('150.00'), date=date.today(),
+            )
+
+    def count_queries(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_is_independent_of_data_size(self):
+        urls = [reverse('dashboard')] + [
+            reverse('dashboard_section', args=[section]) for section in DASHBOARD_FRAGMENTS
+        ]
+        self.populate(1)
+        small = [self.count_queries(url) for url in urls]
+        self.populate(15)
+        large = [self.count_queries(url) for url in urls]
+        self.assertEqual(small, large)
+        self.assertLessEqual(max(large), self.QUERY_BUDGET)
+
+    def test_page_renders_only_the_active_section(self):
+        self.populate(2)
+        response = self.client.get(reverse('dashboard'), {'section': 'saved'})
+        self.assertContains(response, 'Spot 1')
+        self.assertNotContains(response, 'Total Itineraries')
+
+    def test_unknown_section_is_404(self):
+        response = self.client.get(reverse('dashboard_section', args=['nope']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_summary_is_a_single_query(self):
+        self.populate(3)
+        make_itinerary(self.user, 'Past trip', start=date.today() - timedelta(days=30))
+        with self.assertNumQueries(1):
+            summary = get_dashboard_summary(self.user)
+        self.assertEqual(summary['itinerary_count'], 4)
+        self.assertEqual(summary['saved_count'], 3)
+        self.assertEqual(summary['upcoming_trips'], 3)
+        self.assertEqual(summary['total_budget'], Decimal('40000.00'))
+
+    def test_summary_for_new_user_is_zero(self):
+        summary = get_dashboard_summary(self.user)
+        self.assertEqual(summary['itinerary_count'], 0)
+        self.assertEqual(summary['total_budget'], 0)
+
+
+class TagIndexTests(TestCase):
+    def test_parse_tags_normalizes(self):
+        self.assertEqual(parse_tags(' Beach, family ,, beach,'), ['beach', 'family'])
+
+    def test_index_follows_saves_and_deletes(self):
+        dest = make_destination('Nalusuan', tags='Snorkeling, Beach')
+        other = make_destination('Museum', tags='history')
+        self.assertEqual(get_available_tags(), ['beach', 'history', 'snorkeling'])
+
+        dest.tags = 'beach, diving'
+        dest.save()
+        self.assertEqual(get_available_tags(), ['beach', 'diving', 'history'])
+
+        other.delete()
+        self.assertEqual(get_available_tags(), ['beach', 'diving'])
+
+    def test_writes_prune_only_the_tags_they_dropped(self):
+        Tag.objects.create(name='orphan')
+        dest = make_destination('Pescador', tags='diving, sardines')
+        dest.tags = 'diving'
+        dest.save()
+        dest.delete()
+        # Saves and deletes never scan the whole vocabulary; the rebuild command does
+        self.assertEqual(get_available_tags(), ['orphan'])
+        call_command('rebuild_tag_index', stdout=io.StringIO())
+        self.assertEqual(get_available_tags(), [])
+
+    def test_filter_is_exact(self):
+        bar = make_destination('Sunset Bar', tags='bar, nightlife')
+        make_destination('Grill House', tags='barbecue')
+        matches = filter_destinations_by_tags(Destination.objects.all(), ['bar'])
+        self.assertEqual(list(matches), [bar])
+
+    def test_filter_all_mode_requires_every_tag(self):
+        both = make_destination('Family Beach', tags='beach, family')
+        make_destination('Party Beach', tags='beach, nightlife')
+        queryset = Destination.objects.all()
+        self.assertEqual(
+            list(filter_destinations_by_tags(queryset, ['beach', 'family'], TAG_MATCH_ALL)), [both]
+        )
+        self.assertEqual(filter_destinations_by_tags(queryset, ['beach', 'family']).count(), 2)
+
+
+class DestinationSearchTests(TestCase):
+    def setUp(self):
+        self.by_name = make_destination('Hilutungan Island', description='Marine sanctuary')
+        self.by_description = make_destination('Olango', description='Boat trip to Hilutungan reefs')
+        make_destination('Magellan Shrine', location='Punta Engaño', description='Historical marker')
+
+    def test_ranks_name_matches_first(self):
+        results = list(search_destinations(Destination.objects.all(), 'hilutungan'))
+        self.assertEqual(results, [self.by_name, self.by_description])
+
+    def test_prefix_and_all_terms(self):
+        self.assertEqual(list(search_destinations(Destination.objects.all(), 'hilu marine')), [self.by_name])
+        self.assertEqual(search_destinations(Destination.objects.all(), 'hilu castle').count(), 0)
+
+    def test_index_picks_up_saves(self):
+        self.by_description.name = 'Olango Hilutungan Tour'
+        self.by_description.save()
+        suggestions = suggest_destinations('hilut')
+        self.assertEqual(suggestions[0]['name'], 'Olango Hilutungan Tour')
+
+    def test_ranked_results_paginate(self):
+        results = search_destinations(Destination.objects.all(), 'hilutungan')
+        first = keyset_paginate(results, SEARCH_ORDERING, page_size=1)
+        second = keyset_paginate(results, SEARCH_ORDERING, first.next_cursor, page_size=1)
+        self.assertEqual(list(first) + list(second), [self.by_name, self.by_description])
+        self.assertFalse(second.has_next)
+
+    def test_fallback_ranks_a_bounded_number_of_matches(self):
+        with mock.patch('SmartTrav.search.FALLBACK_RESULT_LIMIT', 1):
+            results = list(search_destinations(Destination.objects.all(), 'hilutungan'))
+        self.assertEqual(results, [self.by_name])
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        # Duplicate names make the id tie-breaker matter
+        for i in range(7):
+            make_destination(f'Spot {i % 3}')
+
+    def test_walks_every_row_once(self):
+        seen, cursor = [], None
+        while True:
+            page = keyset_paginate(Destination.objects.all(), ('name', 'id'), cursor, page_size=3)
+            seen.extend(dest.pk for dest in page)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        expected = list(Destination.objects.order_by('name', 'id').values_list('pk', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_datetime_cursor_keeps_microseconds(self):
+        # Both rows fall in the same millisecond; a truncated cursor would skip the second one
+        moment = timezone.now().replace(microsecond=123456)
+        Destination.objects.filter(name='Spot 0').update(created_at=moment)
+        Destination.objects.filter(name='Spot 1').update(created_at=moment + timedelta(microseconds=400))
+
+        seen, cursor = [], None
+        while True:
+            page = keyset_paginate(Destination.objects.all(), ('-created_at', 'id'), cursor, page_size=1)
+            seen.extend(dest.pk for dest in page)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        expected = list(Destination.objects.order_by('-created_at', 'id').values_list('pk', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_wrongly_typed_or_null_cursor_values_are_rejected(self):
+        for ordering, values in ((('-created_at', 'id'), [[2024], 1]), (('name', 'id'), [None, 1])):
+            with self.assertRaisesMessage(InvalidCursor, 'Malformed cursor'):
+                keyset_paginate(Destination.objects.all(), ordering, encode_cursor(values))
+
+    def test_later_pages_cost_one_query(self):
+        first = keyset_paginate(Destination.objects.all(), ('name', 'id'), page_size=3)
+        with self.assertNumQueries(1):
+            keyset_paginate(Destination.objects.all(), ('name', 'id'), first.next_cursor, page_size=3)
+
+    def test_section_endpoint(self):
+        user = User.objects.create_user('pager', 'pager@example.com', 'pass12345')
+        self.client.force_login(user)
+        url = reverse('dashboard_section_page', args=['destinations'])
+
+        response = self.client.get(url, {'category': 'beach'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Spot 0', response.json()['html'])
+
+        self.assertEqual(self.client.get(url, {'cursor': 'not-a-cursor'}).status_code, 400)
+
+
+class CatalogCacheTests(TestCase):
+    def test_version_bump_invalidates_and_stats_count(self):
+        cache = CatalogCache(shared_alias=None, max_entries=2)
+        builds = []
+        build = lambda: builds.append(1) or len(builds)
+
+        self.assertEqual(cache.get('a', build), 1)
+        self.assertEqual(cache.get('a', build), 1)
+        cache.bump_version()
+        self.assertEqual(cache.get('a', build), 2)
+        cache.get('b', build)
+        cache.get('c', build)
+
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evictions']), (1, 4, 1))
+
+    def test_snapshot_is_pinned_outside_the_lru(self):
+        cache = CatalogCache(shared_alias=None, max_entries=2)
+        cache.get('snapshot', lambda: 'snapshot', pin=True)
+        for i in range(5):
+            cache.get(f'filter:{i}', lambda: i)
+
+        self.assertEqual(cache.get('snapshot', lambda: 'rebuilt', pin=True), 'snapshot')
+        self.assertEqual(cache.stats()['evictions'], 3)
+        cache.bump_version()
+        self.assertEqual(cache.get('snapshot', lambda: 'rebuilt', pin=True), 'rebuilt')
+
+    def test_shared_tier_is_reused_by_other_workers(self):
+        first = CatalogCache(shared_alias='default')
+        second = CatalogCache(shared_alias='default')
+        first.get('shared-test', lambda: 'value')
+        self.assertEqual(second.get('shared-test', lambda: 'rebuilt'), 'value')
+        self.assertEqual(second.shared_hits, 1)
+
+    def test_bump_in_one_worker_invalidates_the_others(self):
+        # Separate processes share nothing but the database
+        first = CatalogCache(shared_alias=None)
+        second = CatalogCache(shared_alias=None)
+        self.assertEqual(second.get('entry', lambda: 'old'), 'old')
+        first.bump_version()
+        self.assertEqual(second.get('entry', lambda: 'new'), 'new')
+
+        version = second.get_version()
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            first.bump_version()
+            raise RuntimeError
+        # A rolled-back bump leaves the version as it was, and the next one is new
+        self.assertEqual(second.get_version(), version)
+        first.bump_version()
+        self.assertNotEqual(second.get_version(), version)
+
+    def test_browsing_is_served_from_snapshot(self):
+        make_destination('Cheap Beach', price_per_day=Decimal('1500.00'), tags='beach')
+        make_destination('Fancy Resort', category='resort', price_per_day=Decimal('4500.00'), tags='spa')
+        filters = get_catalog_filters(QueryDict('price=luxury'))
+
+        self.assertEqual([d.name for d in get_destination_page(filters)], ['Fancy Resort'])
+        # Only the catalog version is read from the database
+        with self.assertNumQueries(1):
+            get_destination_page(filters)
+
+        make_destination('Luxury Villa', price_per_day=Decimal('5000.00'))
+        self.assertEqual(len(get_destination_page(filters)), 2)
+
+
+class CatalogVersionMemoTests(SimpleTestCase):
+    def test_version_is_reread_only_after_the_ttl(self):
+        cache = CatalogCache(shared_alias=None, version_ttl=60)
+        stamp = (1, timezone.now())
+        with mock.patch.object(cache, 'get_stamp', return_value=stamp) as get_stamp:
+            for _ in range(3):
+                cache.get('entry', lambda: 'value')
+            self.assertEqual(get_stamp.call_count, 1)
+
+            cache.version_ttl = 0
+            cache._version_expires = 0
+            cache.get('entry', lambda: 'value')
+            cache.get('entry', lambda: 'value')
+            self.assertEqual(get_stamp.call_count, 3)
+        self.assertEqual((cache.hits, cache.misses), (4, 1))
+
+
+class ItineraryRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('roller', 'roller@example.com', 'pass12345')
+        self.trip = make_itinerary(self.user, 'Cebu', days=2)
+        self.beach = make_destination('Beach', price_per_day=Decimal('1000.00'))
+
+    def refreshed(self):
+        self.trip.refresh_from_db()
+        return self.trip
+
+    def test_totals_follow_child_writes(self):
+        stop = ItineraryDestination.objects.create(itinerary=self.trip, destination=self.beach)
+        lunch = Expense.objects.create(itinerary=self.trip, category='food', description='Lunch',
+                                       amount='150.50', date=date.today())
+        Expense.objects.create(itinerary=self.trip, category='transport', description='Taxi',
+                               amount=Decimal('300.00'), date=date.today())
+
+        trip = self.refreshed()
+        self.assertEqual(trip.destination_count, 1)
+        self.assertEqual(trip.destination_cost_total, Decimal('2000.00'))
+        self.assertEqual(trip.expense_total, Decimal('450.50'))
+        self.assertEqual(trip.expense_category_totals, {'food': '150.50', 'transport': '300.00'})
+
+        lunch.amount = Decimal('100.00')
+        lunch.category = 'other'
+        lunch.save()
+        stop.delete()
+
+        trip = self.refreshed()
+        self.assertEqual(trip.destination_count, 0)
+        self.assertEqual(trip.destination_cost_total, Decimal('0.00'))
+        self.assertEqual(trip.expense_total, Decimal('400.00'))
+        self.assertEqual(trip.expense_category_totals, {'other': '100.00', 'transport': '300.00'})
+
+    def test_deleting_a_trip_skips_the_rollups_of_its_children(self):
+        for i in range(3):
+            ItineraryDestination.objects.create(itinerary=self.trip, destination=make_destination(f'Stop {i}'))
+            Expense.objects.create(itinerary=self.trip, category='food', description='Meal',
+                                   amount=Decimal('10.00'), date=date.today())
+        other = make_itinerary(self.user, 'Bohol')
+        ItineraryDestination.objects.create(itinerary=other, destination=self.beach)
+
+        for delete in (self.trip.delete, self.user.delete):
+            with CaptureQueriesContext(connection) as queries:
+                delete()
+            # No per-child read and update of the totals of a trip that is going away
+            rollup_queries = [q['sql'] for q in queries if 'expense_category_totals' in q['sql']
+                              or q['sql'].startswith('UPDATE "SmartTrav_itinerary"')]
+            self.assertEqual(rollup_queries, [])
+        self.assertFalse(Itinerary.objects.exists())
+
+    def test_rebuild_fixes_drift(self):
+        Expense.objects.create(itinerary=self.trip, category='food', description='Dinner',
+                               amount=Decimal('500.00'), date=date.today())
+        Itinerary.objects.filter(pk=self.trip.pk).update(expense_total=0, expense_category_totals={})
+
+        self.assertEqual(rebuild_rollups(Itinerary.objects.all(), dry_run=True), [self.trip.pk])
+        self.assertEqual(self.refreshed().expense_total, Decimal('0.00'))
+        rebuild_rollups(Itinerary.objects.all())
+        self.assertEqual(self.refreshed().expense_total, Decimal('500.00'))
+        self.assertEqual(rebuild_rollups(Itinerary.objects.all(), dry_run=True), [])
+
+
+class BulkRepricingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('pricer', 'pricer@example.com', 'pass12345')
+        self.client.force_login(self.user)
+        self.trip = make_itinerary(self.user, 'Bohol', days=2)
+        self.stops = [
+            ItineraryDestination.objects.create(
+                itinerary=self.trip, destination=make_destination(f'Stop {i}', price_per_day=Decimal('1000.00'))
+            )
+            for i in range(5)
+        ]
+
+    def edit(self, days):
+        return self.client.post(reverse('edit_itinerary', args=[self.trip.pk]), {
+            'title': 'Bohol',
+            'start_date': self.trip.start_date.isoformat(),
+            'end_date': (self.trip.start_date + timedelta(days=days - 1)).isoformat(),
+            'budget': '10000.00',
+        })
+
+    def test_edit_reprices_in_constant_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.edit(days=3)
+        self.assertLess(len(queries), 20)
+
+        self.trip.refresh_from_db()
+        prices = set(ItineraryDestination.objects.filter(itinerary=self.trip).values_list('calculated_price', flat=True))
+        self.assertEqual(prices, {Decimal('3000.00')})
+        self.assertEqual(self.trip.destination_cost_total, Decimal('15000.00'))
+
+    def test_unchanged_prices_are_not_written(self):
+        self.assertEqual(reprice_itineraries([self.trip.pk]), 0)
+
+    def test_destination_price_change_reprices_its_stops(self):
+        destination = self.stops[0].destination
+        destination.price_per_day = Decimal('1500.00')
+        destination.save()
+
+        self.stops[0].refresh_from_db()
+        self.trip.refresh_from_db()
+        self.assertEqual(self.stops[0].calculated_price, Decimal('3000.00'))
+        self.assertEqual(self.trip.destination_cost_total, Decimal('11000.00'))
+
+
+class BudgetEngineTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('budgeter', 'budgeter@example.com', 'pass12345')
+
+    def trip(self, title, budget, stop_price=None, spent=None, days=2):
+        itinerary = make_itinerary(self.user, title, days=days, budget=budget)
+        if stop_price is not None:
+            ItineraryDestination.objects.create(
+                itinerary=itinerary, destination=make_destination(f'{title} stop', price_per_day=stop_price)
+            )
+        if spent is not None:
+            Expense.objects.create(itinerary=itinerary, category='food', description='Meals',
+                                   amount=spent, date=date.today())
+        itinerary.refresh_from_db()
+        return itinerary
+
+    def test_single_itinerary_is_exact(self):
+        itinerary = self.trip('Siargao', Decimal('1000.00'), stop_price=Decimal('0.10'), spent=Decimal('0.20'), days=1)
+        figures = get_itinerary_budget(itinerary)
+        self.assertEqual(figures['total_spent'], Decimal('0.30'))
+        self.assertEqual(figures['budget_remaining'], Decimal('999.70'))
+        self.assertEqual(figures['budget_percentage'], Decimal('0.03'))
+        self.assertEqual(figures['daily_budget'], Decimal('1000.00'))
+        self.assertEqual(figures['budget_status'], 'good')
+
+    def test_sql_status_matches_python(self):
+        self.trip('Good', Decimal('10000.00'), spent=Decimal('100.00'))
+        self.trip('Edge', Decimal('999.00'), spent=Decimal('849.15'))
+        self.trip('Over', Decimal('1000.00'), stop_price=Decimal('600.00'))
+        self.trip('Empty', Decimal('0.00'))
+
+        for itinerary in annotate_budget(Itinerary.objects.filter(user=self.user)):
+            figures = get_itinerary_budget(itinerary)
+            self.assertEqual(itinerary.budget_status, figures['budget_status'], itinerary.title)
+            self.assertEqual(itinerary.budget_remaining, figures['budget_remaining'], itinerary.title)
+        statuses = dict(annotate_budget(Itinerary.objects.all()).values_list('title', 'budget_status'))
+        self.assertEqual(statuses, {'Good': 'good', 'Edge': 'at_risk', 'Over': 'over', 'Empty': 'good'})
+
+    def test_what_if_scenario(self):
+        itinerary = self.trip('Palawan', Decimal('10000.00'), stop_price=Decimal('1000.00'), spent=Decimal('1000.00'))
+        projected = simulate_budgets([itinerary], price_change='0.10', expense_change='-0.5', extra_days=2)[itinerary.pk]
+        self.assertEqual(projected['total_destination_cost'], Decimal('4400.00'))
+        self.assertEqual(projected['total_expenses'], Decimal('500.00'))
+        self.assertEqual(projected['trip_days'], 4)
+        self.assertEqual(projected['daily_budget'], Decimal('2500.00'))
+
+    def test_simulate_command_reports_trips_that_would_go_over(self):
+        self.trip('Palawan', Decimal('10000.00'), stop_price=Decimal('1000.00'), spent=Decimal('1000.00'))
+        tight = self.trip('Tight', Decimal('2500.00'), stop_price=Decimal('1000.00'))
+        out = io.StringIO()
+        call_command('simulate_budgets', '--price-change', '3', stdout=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertIn(f'✗ Would go over: itinerary {tight.pk} (Tight) by ₱5,500.00', lines)
+        self.assertEqual([line.split() for line in lines if line.startswith(('good', 'at_risk', 'over'))],
+                         [['good', '2', '0'], ['at_risk', '0', '1'], ['over', '0', '1']])
+        self.assertEqual(Itinerary.objects.get(pk=tight.pk).destination_cost_total, Decimal('2000.00'))
+
+
+class StandInStorageHandler(BaseHTTPRequestHandler):
+    """Minimal Supabase Storage stand-in: accepts uploads, serves downloads, can fail on demand."""
+    protocol_version = 'HTTP/1.1'
+    failures_left = 0
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    objects = {}
+    cache_control = {}
+    # Directory -> names served by the list endpoint
+    listing = {}
+    list_calls = 0
+    resumable = {}
+    # Store the next PATCH but answer with an error, as if the response was lost
+    drop_next_patch_response = False
+
+    def reply_empty(self, status, **headers):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name.replace('_', '-'), value)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.path.startswith('/storage/v1/object/list/'):
+            options = json.loads(body)
+            names = sorted(self.listing.get(options['prefix'], []))
+            page = names[options['offset']:options['offset'] + options['limit']]
+            StandInStorageHandler.list_calls += 1
+            self.reply(200, json.dumps([{'name': name, 'id': name} for name in page]).encode())
+            return
+        if self.path == '/storage/v1/upload/resumable':
+            upload_id = str(len(self.resumable) + 1)
+            self.resumable[upload_id] = bytearray()
+            self.reply_empty(201, Location=f'/storage/v1/upload/resumable/{upload_id}')
+            return
+        key = self.path.split('/storage/v1/object/', 1)[1]
+        self.objects[key] = body
+        self.cache_control[key] = self.headers.get('cache-control')
+        self.reply(200, json.dumps({'Key': key, 'Id': key}).encode())
+
+    def do_PATCH(self):
+        stored = self.resumable[self.path.rsplit('/', 1)[1]]
+        chunk = self.rfile.read(int(self.headers['Content-Length']))
+        if int(self.headers['Upload-Offset']) != len(stored):
+            self.reply_empty(409)
+            return
+        stored.extend(chunk)
+        if StandInStorageHandler.drop_next_patch_response:
+            StandInStorageHandler.drop_next_patch_response = False
+            self.reply(500, b'{}')
+            return
+        self.reply_empty(204, Upload_Offset=str(len(stored)))
+
+    def do_HEAD(self):
+        self.reply_empty(200, Upload_Offset=str(len(self.resumable[self.path.rsplit('/', 1)[1]])))
+
+    def do_GET(self):
+        if StandInStorageHandler.failures_left:
+            StandInStorageHandler.failures_left -= 1
+            self.reply(503, b'{"message": "unavailable", "error": "unavailable", "statusCode": 503}')
+            return
+        key = self.path.split('/storage/v1/object/', 1)[-1]
+        self.reply(200, self.objects.get(key, b'image-bytes'))
+
+    def do_DELETE(self):
+        bucket = self.path.rsplit('/', 1)[1]
+        prefixes = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))['prefixes']
+        for name in prefixes:
+            self.objects.pop(f'{bucket}/{name}', None)
+        self.reply(200, json.dumps([{'name': name} for name in prefixes]).encode())
+
+
+class StandInStorageTestCase(SimpleTestCase):
+    """Points the shared Supabase client at a StandInStorageHandler server."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StandInStorageHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.settings_override = override_settings(
+            SUPABASE_URL=f'http://127.0.0.1:{cls.server.server_port}',
+            SUPABASE_KEY='test-key',
+            SUPABASE_HTTP_BACKOFF=0,
+        )
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        reset_supabase_client()
+        metrics.reset()
+        self.addCleanup(reset_supabase_client)
+
+
+class PooledSupabaseClientTests(StandInStorageTestCase, TestCase):
+    def test_uploads_share_one_client_and_connection(self):
+        for i in range(5):
+            store_file(SimpleUploadedFile(f'photo{i}.jpg', f'jpeg {i}'.encode(), 'image/jpeg'), 'images')
+
+        self.assertIs(get_supabase_client(), get_supabase_client())
+        stats = get_client_stats()
+        self.assertEqual(stats['requests'], 5)
+        self.assertEqual(stats['connections_opened'], 1)
+        self.assertEqual(stats['pool_size'], 1)
+        self.assertAlmostEqual(stats['reuse_rate'], 0.8)
+        self.assertGreater(stats['latency_ms']['max'], 0)
+
+    def test_gateway_errors_are_retried_for_reads(self):
+        StandInStorageHandler.failures_left = 2
+        data = get_supabase_client().storage.from_('images').download('photo.jpg')
+
+        self.assertEqual(data, b'image-bytes')
+        self.assertEqual(get_client_stats()['retries'], 2)
+
+
+class UploadQueueTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('uploader', 'uploader@example.com', 'pass12345')
+        self.client.force_login(self.user)
+        self.uploaded = []
+        self.staging = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.enterContext(override_settings(UPLOAD_STAGING_ROOT=self.staging))
+
+    def fake_upload(self, content, bucket, filename, content_type):
+        self.uploaded.append((filename, bucket))
+        return f'https://cdn.example.com/{bucket}/{len(self.uploaded)}-{filename}'
+
+    def failing_upload(self, *args, **kwargs):
+        raise ConnectionError('storage unavailable')
+
+    def post_picture(self, content=b'png-bytes'):
+        return self.client.post(reverse('update_profile'), {
+            'email': 'uploader@example.com',
+            'profile_picture': SimpleUploadedFile('me.png', content, 'image/png'),
+        })
+
+    def test_profile_update_returns_before_upload(self):
+        response = self.post_picture()
+        self.assertEqual(response.status_code, 302)
+        self.assertIsNone(Profile.objects.get(user=self.user).profile_picture_url)
+
+        job = UploadJob.objects.get()
+        self.assertEqual(job.status, UploadJob.STATUS_PENDING)
+        # The bytes wait in staging storage, not in the job row
+        self.assertEqual((self.staging / job.staged_name).read_bytes(), b'png-bytes')
+        self.assertContains(self.client.get(reverse('upload_job_status', args=[job.pk])), 'pending')
+
+        self.assertEqual(run_pending_jobs(upload=self.fake_upload), {UploadJob.STATUS_DONE: 1})
+        job.refresh_from_db()
+        self.assertEqual(job.staged_name, '')
+        self.assertEqual(list(self.staging.iterdir()), [])
+        self.assertEqual(Profile.objects.get(user=self.user).profile_picture_url, job.result_url)
+
+    def test_resubmitting_the_same_image_is_idempotent(self):
+        self.post_picture()
+        self.post_picture()
+        self.assertEqual(UploadJob.objects.count(), 1)
+
+    def test_resubmitting_an_earlier_image_puts_it_back(self):
+        self.post_picture(b'photo-a')
+        run_pending_jobs(upload=self.fake_upload)
+        first_url = Profile.objects.get(user=self.user).profile_picture_url
+        self.post_picture(b'photo-b')
+        run_pending_jobs(upload=self.fake_upload)
+        self.assertNotEqual(Profile.objects.get(user=self.user).profile_picture_url, first_url)
+
+        self.post_picture(b'photo-a')
+        self.assertEqual(Profile.objects.get(user=self.user).profile_picture_url, first_url)
+        self.assertEqual((UploadJob.objects.count(), len(self.uploaded)), (2, 2))
+
+    def test_a_late_result_does_not_replace_a_newer_one(self):
+        destination = make_destination('Siquijor')
+        older = enqueue_upload(UploadJob.TARGET_DESTINATION_IMAGE, destination.pk,
+                               SimpleUploadedFile('old.jpg', b'old', 'image/jpeg'), 'images')
+        enqueue_upload(UploadJob.TARGET_DESTINATION_IMAGE, destination.pk,
+                       SimpleUploadedFile('new.jpg', b'new', 'image/jpeg'), 'images')
+
+        # The older job is retried and finishes last
+        UploadJob.objects.filter(pk=older.pk).update(next_attempt_at=timezone.now() + timedelta(hours=1))
+        run_pending_jobs(upload=self.fake_upload)
+        UploadJob.objects.filter(pk=older.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(run_pending_jobs(upload=self.fake_upload), {UploadJob.STATUS_DONE: 1})
+
+        destination.refresh_from_db()
+        self.assertTrue(destination.image_url.endswith('new.jpg'))
+
+    def test_failures_back_off_then_dead_letter(self):
+        destination = make_destination('Moalboal')
+        job = enqueue_upload(UploadJob.TARGET_DESTINATION_IMAGE, destination.pk,
+                             SimpleUploadedFile('reef.jpg', b'jpeg', 'image/jpeg'), 'images')
+
+        self.assertEqual(run_pending_jobs(upload=self.failing_upload), {UploadJob.STATUS_PENDING: 1})
+        # Not due again until the backoff has passed
+        self.assertEqual(run_pending_jobs(upload=self.failing_upload), {})
+
+        UploadJob.objects.filter(pk=job.pk).update(attempts=job.max_attempts - 1, next_attempt_at=job.created_at)
+        self.assertEqual(run_pending_jobs(upload=self.failing_upload), {UploadJob.STATUS_DEAD: 1})
+
+        self.assertEqual(requeue(UploadJob.objects.all()), 1)
+        run_pending_jobs(upload=self.fake_upload)
+        destination.refresh_from_db()
+        self.assertTrue(destination.image_url.startswith('https://cdn.example.com/images/'))
+
+
+class StreamingUploadTests(StandInStorageTestCase):
+    def test_stream_upload_sends_file_chunks(self):
+        content = bytes(range(256)) * 1024
+        upload_file(SimpleUploadedFile('big.bin', content, 'application/octet-stream'), 'big.bin', 'images')
+        self.assertEqual(StandInStorageHandler.objects['images/big.bin'], content)
+
+    def test_resumable_upload_resumes_from_server_offset(self):
+        content = b'0123456789' * 10
+        StandInStorageHandler.drop_next_patch_response = True
+        resumable_upload(SimpleUploadedFile('clip.mp4', content, 'video/mp4'), 'clip.mp4', 'images', chunk_size=30)
+
+        self.assertEqual(bytes(StandInStorageHandler.resumable[str(len(StandInStorageHandler.resumable))]), content)
+        # Four 30-byte PATCHes: the dropped response is not re-sent
+        self.assertEqual(get_client_stats()['requests'], 1 + 4 + 1)
+
+
+class ImageDerivativeTests(SimpleTestCase):
+    def jpeg(self, width, height):
+        buffer = io.BytesIO()
+        Image.new('RGB', (width, height), (30, 120, 200)).save(buffer, 'JPEG', quality=95)
+        return buffer.getvalue()
+
+    def test_webp_derivatives_at_each_smaller_width(self):
+        derivatives = render_derivatives(self.jpeg(800, 600))
+        self.assertEqual(sorted(derivatives), [320, 640])
+        small = Image.open(io.BytesIO(derivatives[320]))
+        self.assertEqual((small.format, small.size), ('WEBP', (320, 240)))
+
+    def test_small_images_are_not_upscaled(self):
+        derivatives = render_derivatives(self.jpeg(200, 100))
+        self.assertEqual(Image.open(io.BytesIO(derivatives[200])).size, (200, 100))
+
+    def test_unreadable_source_has_no_derivatives(self):
+        self.assertEqual(render_derivatives(b'not an image'), {})
+
+    def test_srcset_ignores_variants_of_a_replaced_image(self):
+        url = 'https://x.supabase.co/storage/v1/object/public/images/beach.jpg'
+        variants = {'source': url, '640': 'b-640.webp', '320': 'b-320.webp'}
+        self.assertEqual(derivative_path('trips/beach.jpg', 320), 'trips/beach-320w.webp')
+        self.assertEqual(srcset(variants, url), 'b-320.webp 320w, b-640.webp 640w')
+        self.assertEqual(srcset(variants, url.replace('beach', 'reef')), '')
+
+
+class ContentAddressedStorageTests(StandInStorageTestCase, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.enterContext(override_settings(UPLOAD_STAGING_ROOT=self.enterContext(tempfile.TemporaryDirectory())))
+
+    def test_identical_uploads_are_stored_once(self):
+        content = b'same photo bytes'
+        first = store_file(SimpleUploadedFile('a.JPG', content, 'image/jpeg'), 'images', 'image/jpeg').public_url
+        requests_after_first = get_client_stats()['requests']
+        second = store_file(SimpleUploadedFile('copy.jpg', content, 'image/jpeg'), 'images', 'image/jpeg').public_url
+
+        self.assertEqual(first, second)
+        self.assertEqual(get_client_stats()['requests'], requests_after_first)
+        stored = StoredObject.objects.get()
+        self.assertEqual(stored.path, f'{hashlib.sha256(content).hexdigest()}.jpg')
+        self.assertEqual(StandInStorageHandler.cache_control[f'images/{stored.path}'], IMMUTABLE_CACHE_CONTROL)
+
+    def test_known_image_completes_without_queueing(self):
+        user = User.objects.create_user('again', 'again@example.com', 'pass12345')
+        url = store_file(SimpleUploadedFile('me.png', b'avatar', 'image/png'), 'profile-pictures').public_url
+        Profile.objects.filter(user=user).update(
+            profile_picture_url=url, profile_picture_variants={'source': url, '320': 'x-320w.webp'}
+        )
+
+        job = enqueue_upload(UploadJob.TARGET_PROFILE_PICTURE, user.profile.pk,
+                             SimpleUploadedFile('me-again.png', b'avatar', 'image/png'), 'profile-pictures')
+        self.assertEqual(job.status, UploadJob.STATUS_DONE)
+        self.assertEqual(job.result_url, url)
+
+
+@override_settings(UPLOAD_STAGING_ROOT=None, UPLOAD_STAGING_BUCKET='upload-staging')
+class UploadStagingStorageTests(StandInStorageTestCase):
+    def test_staged_file_round_trips_through_the_bucket(self):
+        storage = get_staging_storage()
+        self.assertIsInstance(storage, UploadStagingStorage)
+
+        name = storage.save('job-key', SimpleUploadedFile('trip.jpg', b'staged bytes', 'image/jpeg'))
+        self.assertEqual(name, 'job-key')
+        self.assertEqual(StandInStorageHandler.objects['upload-staging/job-key'], b'staged bytes')
+        # The worker reads it back through its own storage instance
+        with UploadStagingStorage().open(name) as staged:
+            self.assertEqual(staged.read(), b'staged bytes')
+
+        storage.delete(name)
+        self.assertNotIn('upload-staging/job-key', StandInStorageHandler.objects)
+
+    def test_local_staging_is_flagged_outside_debug(self):
+        self.assertEqual(check_staging_storage(None), [])
+        with override_settings(UPLOAD_STAGING_ROOT='/tmp/staging', DEBUG=False):
+            self.assertEqual([warning.id for warning in check_staging_storage(None)], ['SmartTrav.W001'])
+        with override_settings(UPLOAD_STAGING_ROOT='/tmp/staging', DEBUG=True):
+            self.assertEqual(check_staging_storage(None), [])
+
+
+class StorageListingCacheTests(StandInStorageTestCase):
+    def setUp(self):
+        super().setUp()
+        StandInStorageHandler.listing = {
+            'photos': [f'{i:05d}.jpg' for i in range(2500)],
+            '': ['logo.png'],
+        }
+        StandInStorageHandler.list_calls = 0
+        get_listing_cache('destination-images').invalidate()
+        self.storage = SupabaseStorage()
+
+    def test_exists_many_lists_each_directory_once(self):
+        names = [f'photos/{i:05d}.jpg' for i in range(0, 3000, 7)] + ['logo.png', 'missing.png']
+        found = self.storage.exists_many(names)
+
+        self.assertEqual(sum(found.values()), len(range(0, 2500, 7)) + 1)
+        self.assertFalse(found['photos/02996.jpg'])
+        # photos: first page, then one parallel window; root: one page
+        first_calls = StandInStorageHandler.list_calls
+        self.assertLessEqual(first_calls, 1 + 8 + 1)
+
+        self.assertTrue(self.storage.exists('photos/00042.jpg'))
+        self.assertEqual(StandInStorageHandler.list_calls, first_calls)
+
+    def test_writes_and_invalidation_update_the_listing(self):
+        self.assertTrue(self.storage.exists('logo.png'))
+        self.assertFalse(self.storage.exists('photos/new.jpg'))
+        self.storage._save('photos/new.jpg', SimpleUploadedFile('new.jpg', b'jpeg', 'image/jpeg'))
+        self.assertTrue(self.storage.exists('photos/new.jpg'))
+
+        calls = StandInStorageHandler.list_calls
+        self.storage.invalidate_listing('photos')
+        # Only listings under the prefix are dropped
+        self.storage.exists('logo.png')
+        self.assertEqual(StandInStorageHandler.list_calls, calls)
+        self.storage.exists('photos/00001.jpg')
+        self.assertGreater(StandInStorageHandler.list_calls, calls)
+
+
+class ImageMigrationTests(StandInStorageTestCase, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.media = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        (self.media / 'images').mkdir()
+        self.checkpoint = Checkpoint(self.media / 'migrate.checkpoint')
+
+    def local_destination(self, name, content):
+        if content is not None:
+            (self.media / 'images' / f'{name}.jpg').write_bytes(content)
+        return make_destination(name, image_url=f'images/{name}.jpg')
+
+    def test_uploads_in_parallel_and_writes_in_batches(self):
+        for i in range(6):
+            self.local_destination(f'spot{i}', f'jpeg {i}'.encode())
+        self.local_destination('twin', b'jpeg 0')
+        self.local_destination('gone', None)
+        external = make_destination('Kawasan', image_url='https://images.example.com/kawasan.jpg')
+
+        candidates = find_candidates(self.media)
+        self.assertEqual(len(candidates), 8)
+        progress = migrate_images(candidates, 'images', self.checkpoint, concurrency=4, batch_size=2)
+
+        self.assertEqual((progress.done, progress.failed), (7, 1))
+        migrated = Destination.objects.get(name='spot0').image_url
+        self.assertEqual(migrated, Destination.objects.get(name='twin').image_url)
+        self.assertIn(f'/images/{hashlib.sha256(b"jpeg 0").hexdigest()}.jpg', migrated)
+        self.assertEqual(StoredObject.objects.count(), 6)
+        self.assertEqual(Destination.objects.get(name='gone').image_url, 'images/gone.jpg')
+        self.assertEqual(Destination.objects.get(pk=external.pk).image_url, external.image_url)
+        self.assertFalse(self.checkpoint.path.exists())
+
+    def test_resumes_uploads_logged_by_an_interrupted_run(self):
+        done = self.local_destination('done', b'already uploaded')
+        self.local_destination('todo', b'not yet')
+        self.checkpoint.record({
+            'id': done.pk, 'source': 'images/done.jpg', 'sha256': 'a' * 64, 'size': 16,
+            'content_type': 'image/jpeg', 'path': f'{"a" * 64}.jpg', 'uploaded': True,
+            'url': 'https://x.supabase.co/storage/v1/object/public/images/done.jpg',
+        })
+        self.checkpoint.close()
+
+        progress = migrate_images(find_candidates(self.media), 'images', self.checkpoint)
+
+        self.assertEqual(progress.total, 1)
+        self.assertEqual(get_client_stats()['requests'], 1)
+        done.refresh_from_db()
+        self.assertTrue(done.image_url.endswith('/images/done.jpg'))
+        self.assertTrue(Destination.objects.get(name='todo').image_url.startswith('http'))
+
+
+class ImageHostHandler(BaseHTTPRequestHandler):
+    """
+    Image host stand-in: /ok.jpg answers HEAD, /nohead.png only ranged GETs,
+    /odd.jpg with a malformed Content-Range, the rest 404.
+    """
+    protocol_version = 'HTTP/1.1'
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def answer(self, status, **headers):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name.replace('_', '-'), value)
+        if 'Content_Length' not in headers:
+            self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_HEAD(self):
+        ImageHostHandler.requests.append(('HEAD', self.path))
+        if self.path == '/ok.jpg':
+            self.answer(200, Content_Type='image/jpeg', Content_Length='48213')
+        elif self.path == '/nohead.png':
+            self.answer(405)
+        elif self.path == '/odd.jpg':
+            self.answer(200, Content_Type='image/jpeg', Content_Range='bytes 0-0/lots')
+        else:
+            self.answer(404, Content_Type='text/html')
+
+    def do_GET(self):
+        ImageHostHandler.requests.append(('GET', self.path))
+        self.send_response(206)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Range', 'bytes 0-0/9000')
+        self.send_header('Content-Length', '1')
+        self.end_headers()
+        self.wfile.write(b'x')
+
+
+class ImageHealthCheckTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), ImageHostHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.host = f'http://127.0.0.1:{cls.server.server_port}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        ImageHostHandler.requests = []
+        make_destination('Bantayan', image_url=f'{self.host}/ok.jpg')
+        make_destination('Malapascua', image_url=f'{self.host}/ok.jpg')
+        make_destination('Camotes', image_url=f'{self.host}/gone.jpg')
+        make_destination('Olango', image_url='images/olango.jpg')
+        user = User.objects.create_user('pic', 'pic@example.com', 'pass12345')
+        Profile.objects.filter(user=user).update(profile_picture_url=f'{self.host}/nohead.png')
+
+    def test_probes_record_status_type_size_and_latency(self):
+        owners, probes, probed = check_images(concurrency=4, per_host_rate=0)
+
+        self.assertEqual(probed, 3)
+        self.assertEqual(len(owners[f'{self.host}/ok.jpg']), 2)
+        results = {probe.url.rsplit('/', 1)[1]: probe for probe in probes}
+        self.assertEqual((results['ok.jpg'].status, results['ok.jpg'].content_type, results['ok.jpg'].size),
+                         (200, 'image/jpeg', 48213))
+        self.assertTrue(results['ok.jpg'].ok)
+        self.assertEqual((results['nohead.png'].status, results['nohead.png'].size), (206, 9000))
+        self.assertTrue(results['nohead.png'].ok)
+        self.assertFalse(results['gone.jpg'].ok)
+        self.assertGreater(results['gone.jpg'].latency_ms, 0)
+
+    def test_malformed_size_is_recorded_as_that_urls_error(self):
+        make_destination('Sumilon', image_url=f'{self.host}/odd.jpg')
+        probes = {probe.url.rsplit('/', 1)[1]: probe for probe in check_images(per_host_rate=0)[1]}
+
+        odd = probes['odd.jpg']
+        self.assertEqual((odd.status, odd.size, odd.error), (200, None, "Malformed Content-Range header: 'lots'"))
+        self.assertFalse(odd.ok)
+        self.assertTrue(probes['ok.jpg'].ok)
+
+    def test_unparseable_url_is_recorded_as_that_urls_error(self):
+        make_destination('Pescador', image_url='http://[::1/broken.jpg')
+        probes = {probe.url: probe for probe in check_images(per_host_rate=0)[1]}
+
+        broken = probes['http://[::1/broken.jpg']
+        self.assertEqual((broken.status, broken.error), (None, "InvalidURL: Invalid port: ':1'"))
+        self.assertTrue(probes[f'{self.host}/ok.jpg'].ok)
+
+    def test_later_runs_only_reprobe_stale_entries(self):
+        check_images(per_host_rate=0)
+        ImageHostHandler.requests = []
+        self.assertEqual(check_images(per_host_rate=0)[2], 0)
+        self.assertEqual(ImageHostHandler.requests, [])
+
+        ImageProbe.objects.filter(url__endswith='gone.jpg').update(checked_at=timezone.now() - timedelta(days=2))
+        self.assertEqual(check_images(per_host_rate=0)[2], 1)
+        self.assertEqual(ImageHostHandler.requests, [('HEAD', '/gone.jpg')])
+        self.assertEqual(ImageProbe.objects.count(), 3)
+
+    def test_command_writes_json_report(self):
+        with tempfile.NamedTemporaryFile(suffix='.json') as report:
+            call_command('check_images', '--probe', '--json', report.name, stdout=io.StringIO())
+            entries = {entry['url'].rsplit('/', 1)[1]: entry for entry in json.load(open(report.name))}
+        self.assertEqual(entries['gone.jpg']['status'], 404)
+        self.assertEqual(entries['ok.jpg']['used_by'], [f'destination #{pk}' for pk in
+                         Destination.objects.filter(name__in=['Bantayan', 'Malapascua']).order_by('pk')
+                         .values_list('pk', flat=True)])
+
+    def test_rate_limit_spaces_requests_to_one_host(self):
+        limiter = HostRateLimiter(rate=50)
+        started = time.monotonic()
+        for _ in range(5):
+            limiter.wait('images.example.com')
+        limiter.wait('other.example.com')
+        self.assertGreaterEqual(time.monotonic() - started, 4 / 50)
+
+
+class LoadDestinationsTests(TestCase):
+    HEADER = 'name,description,location,category,price_range,image_url,price_per_day,tags\n'
+
+    def load(self, body, *args):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as handle:
+            handle.write(self.HEADER + body)
+        self.addCleanup(Path(handle.name).unlink)
+        out = io.StringIO()
+        call_command('load_destinations', handle.name, *args, stdout=out)
+        return out.getvalue()
+
+    def rows(self, count, price=1500):
+        return ''.join(
+            f'Spot {i},Desc {i},Cebu,beach,500-1000,https://img.example.com/{i}.jpg,{price},"beach, spot{i % 3}"\n'
+            for i in range(count)
+        )
+
+    def test_bulk_load_does_not_query_per_row(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.load(self.rows(300))
+
+        # Batched inserts (SQLite caps rows per INSERT) plus the tag index, not 2+ per row
+        self.assertLess(len(queries), 30)
+        spot = Destination.objects.get(name='Spot 7')
+        self.assertEqual((spot.image_url, spot.price_per_day), ('https://img.example.com/7.jpg', Decimal('1500.00')))
+        self.assertEqual(get_available_tags(), ['beach', 'spot0', 'spot1', 'spot2'])
+        self.assertEqual(filter_destinations_by_tags(Destination.objects.all(), ['spot1']).count(), 100)
+
+    def test_reload_reports_created_updated_unchanged(self):
+        self.load(self.rows(3))
+        stop = ItineraryDestination.objects.create(
+            itinerary=make_itinerary(User.objects.create_user('loader'), 'Cebu', days=2),
+            destination=Destination.objects.get(name='Spot 1'),
+        )
+
+        out = self.load(self.rows(2, price=2000) + 'Spot 9,New,Cebu,resort,,,900,\nBad,x,Cebu,volcano,,,1,\n')
+        self.assertIn('Created: 1, Updated: 2, Unchanged: 0, Invalid: 1', out)
+        stop.refresh_from_db()
+        self.assertEqual(stop.calculated_price, Decimal('4000.00'))
+        self.assertEqual(Destination.objects.get(name='Spot 2').price_per_day, Decimal('1500.00'))
+
+        self.assertIn('Created: 0, Updated: 0, Unchanged: 3', self.load(self.rows(2, price=2000) + 'Spot 9,New,Cebu,resort,,,900,\n'))
+
+    def test_dry_run_shows_diff_without_writing(self):
+        self.load(self.rows(2))
+        out = self.load('Spot 0,Changed,Cebu,beach,500-1000,https://img.example.com/0.jpg,1500,"beach, spot0"\n'
+                        'Fresh,New,Cebu,beach,,,800,\nFresh,Newer,Cebu,beach,,,800,\n', '--dry-run', '--chunk-size', '1')
+
+        self.assertIn("description: 'Desc 0' → 'Changed'", out)
+        self.assertIn('Created: 1, Updated: 2, Unchanged: 0', out)
+        self.assertEqual(Destination.objects.get(name='Spot 0').description, 'Desc 0')
+        self.assertFalse(Destination.objects.filter(name='Fresh').exists())
+
+
+class CatalogImportExportTests(TestCase):
+    def setUp(self):
+        make_destination('Kawasan Falls', category='attraction', price_per_day=Decimal('1234.50'),
+                         tags='waterfall, canyoneering', image_url='https://img.example.com/kawasan.jpg')
+        make_destination('Magellan\'s Cross', category='historical', description='Línea 1, "quoted"\nsecond line',
+                         image_url=None)
+
+    def test_every_format_round_trips(self):
+        expected = list(export_rows())
+        for format in FORMATS:
+            with self.subTest(format=format):
+                buffer = io.BytesIO()
+                self.assertEqual(write_catalog(export_rows(), buffer, format), 2)
+                buffer.seek(0)
+                fields, rows = read_catalog(buffer, format)
+                rows = list(rows)
+                if format == 'csv':
+                    # CSV has no types: prices come back as text and None as ''
+                    self.assertEqual(rows[1]['image_url'], '')
+                    self.assertEqual(rows[0]['price_per_day'], '1234.50')
+                else:
+                    self.assertEqual(rows, expected)
+                self.assertEqual(fields, list(expected[0]))
+
+    def test_columnar_streams_in_row_groups(self):
+        buffer = io.BytesIO()
+        rows = ({'name': f'Spot {i}', 'price_per_day': Decimal('10.25'), 'image_url': None} for i in range(10))
+        FORMATS['columnar'][0](rows, buffer, row_group_size=4)
+        buffer.seek(0)
+        names = [row['name'] for row in read_catalog(buffer, 'columnar')[1]]
+        self.assertEqual(names, [f'Spot {i}' for i in range(10)])
+
+    def test_export_then_import_syncs_another_catalog(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = str(Path(directory) / 'catalog.stcol')
+            call_command('export_catalog', path, stdout=io.StringIO())
+
+            Destination.objects.filter(name='Kawasan Falls').update(price_per_day=Decimal('1.00'), tags='')
+            Destination.objects.filter(name__startswith='Magellan').delete()
+            out = io.StringIO()
+            call_command('import_catalog', path, stdout=out)
+
+        self.assertIn('Created: 1, Updated: 1, Unchanged: 0', out.getvalue())
+        kawasan = Destination.objects.get(name='Kawasan Falls')
+        self.assertEqual((kawasan.price_per_day, kawasan.tags), (Decimal('1234.50'), 'waterfall, canyoneering'))
+        self.assertEqual(filter_destinations_by_tags(Destination.objects.all(), ['canyoneering']).get(), kawasan)
+        self.assertIsNone(Destination.objects.get(name__startswith='Magellan').image_url)
+
+    def test_jsonl_rows_change_only_the_keys_they_carry(self):
+        lines = [
+            {'name': 'Kawasan Falls', 'price_per_day': '99.00', 'category': 'attraction'},
+            {'name': "Magellan's Cross", 'tags': ['church']},
+            {'name': 'Oslob', 'category': 'resort'},
+            {'name': 'Oslob', 'tags': 'whale sharks'},
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'catalog.jsonl'
+            path.write_text(''.join(json.dumps(line) + '\n' for line in lines))
+            # One row per chunk: the second Oslob row updates the one planned by the first
+            for args, counts in ((('--dry-run', '--chunk-size', '1'), 'Created: 1, Updated: 3'),
+                                 ((), 'Created: 1, Updated: 2')):
+                out = io.StringIO()
+                call_command('import_catalog', str(path), *args, stdout=out)
+                self.assertIn(counts, out.getvalue())
+
+        kawasan = Destination.objects.get(name='Kawasan Falls')
+        self.assertEqual((kawasan.price_per_day, kawasan.tags), (Decimal('99.00'), 'waterfall, canyoneering'))
+        magellan = Destination.objects.get(name__startswith='Magellan')
+        self.assertEqual((magellan.category, magellan.tags), ('historical', 'church'))
+        oslob = Destination.objects.get(name='Oslob')
+        self.assertEqual((oslob.category, oslob.tags), ('resort', 'whale sharks'))
+
+
+class EmailOrUsernameLoginTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('Island_Hopper', 'hopper@example.com', 'pass12345')
+
+    def attempt(self, identifier, password):
+        """authenticate() with the query count and number of password hashes it cost."""
+        with mock.patch.object(PBKDF2PasswordHasher, 'encode', autospec=True,
+                               side_effect=PBKDF2PasswordHasher.encode) as hashes:
+            with CaptureQueriesContext(connection) as queries:
+                user = authenticate(username=identifier, password=password)
+        return user, len(queries), hashes.call_count
+
+    def test_email_or_username_in_one_query_and_one_hash(self):
+        for identifier in ('HOPPER@example.com', 'island_hopper', ' Island_Hopper '):
+            self.assertEqual(self.attempt(identifier, 'pass12345'), (self.user, 1, 1))
+
+    def test_failures_cost_the_same_as_success(self):
+        self.assertEqual(self.attempt('hopper@example.com', 'wrong'), (None, 1, 1))
+        self.assertEqual(self.attempt('nobody@example.com', 'pass12345'), (None, 1, 1))
+
+    def test_blank_identifier_matches_no_account(self):
+        User.objects.create_superuser('admin', '', 'admin-pass-123')
+        self.assertEqual(self.attempt('', 'admin-pass-123'), (None, 0, 1))
+        self.assertEqual(self.attempt('   ', 'admin-pass-123'), (None, 0, 1))
+        # An account without an email is still reachable by its username
+        self.assertEqual(authenticate(username='ADMIN', password='admin-pass-123').username, 'admin')
+
+    def test_email_match_wins_over_username_match(self):
+        other = User.objects.create_user('hopper@example.com', 'other@example.com', 'pass12345')
+        self.assertEqual(authenticate(username='hopper@example.com', password='pass12345'), self.user)
+        self.assertEqual(authenticate(username='HOPPER@EXAMPLE.COM', password='pass12345'), self.user)
+        self.assertEqual(authenticate(username='other@example.com', password='pass12345'), other)
+
+    def test_login_view_and_inactive_users(self):
+        response = self.client.post(reverse('login'), {'email': 'Hopper@Example.com', 'password': 'pass12345'})
+        self.assertRedirects(response, reverse('dashboard'), fetch_redirect_response=False)
+
+        self.client.logout()
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        response = self.client.post(reverse('login'), {'email': 'island_hopper', 'password': 'pass12345'})
+        self.assertRedirects(response, reverse('login'), fetch_redirect_response=False)
+
+
+class SlidingWindowLimiterTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.limiter = SlidingWindowLimiter('test', limit=3, window=60)
+
+    def test_limit_within_window(self):
+        for second in range(3):
+            self.assertTrue(self.limiter.allows('ip', now=600 + second))
+            self.limiter.hit('ip', now=600 + second)
+        self.assertFalse(self.limiter.allows('ip', now=603))
+        self.assertEqual(self.limiter.retry_after('ip', now=603), 57)
+        self.assertTrue(self.limiter.allows('other', now=603))
+
+    def test_previous_window_slides_out(self):
+        for _ in range(3):
+            self.limiter.hit('ip', now=630)
+        # 5s into the next window: 3 * 55/60 of the old attempts still count
+        self.assertTrue(self.limiter.allows('ip', now=665))
+        self.limiter.hit('ip', now=665)
+        self.assertFalse(self.limiter.allows('ip', now=666))
+        wait = self.limiter.retry_after('ip', now=666)
+        self.assertIn(wait, (14, 15))
+        self.assertTrue(self.limiter.allows('ip', now=666 + wait))
+
+    def test_attempt_decides_on_its_own_count(self):
+        # Each attempt is counted before it is judged, so none can slip in between a check and a hit
+        self.assertEqual([self.limiter.attempt('ip', now=600) for _ in range(5)], [True, True, True, False, False])
+        self.assertEqual(self.limiter.hit('ip', now=600), 6)
+
+    def test_per_process_cache_is_refused_when_a_shared_one_is_required(self):
+        with override_settings(THROTTLE_REQUIRE_SHARED_CACHE=True):
+            self.assertEqual([error.id for error in check_shared_cache(None)], ['SmartTrav.E001'])
+            with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache:6379',
+            }}):
+                self.assertEqual(check_shared_cache(None), [])
+        self.assertEqual(check_shared_cache(None), [])
+
+
+@override_settings(THROTTLE_RATES={'login_ip': (4, 60), 'login_account': (2, 60), 'signup_ip': (1, 60)})
+class LoginThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        throttle_metrics.reset()
+        self.user = User.objects.create_user('backpacker', 'backpacker@example.com', 'pass12345')
+
+    def login(self, identifier, password, ip='203.0.113.7'):
+        return self.client.post(reverse('login'), {'email': identifier, 'password': password}, REMOTE_ADDR=ip)
+
+    def test_account_locked_after_failures_without_hashing(self):
+        self.login('backpacker', 'nope')
+        self.login('BACKPACKER', 'nope', ip='198.51.100.1')
+
+        with mock.patch.object(PBKDF2PasswordHasher, 'encode') as hashes, self.assertNumQueries(0):
+            response = self.login('backpacker', 'pass12345', ip='198.51.100.2')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        hashes.assert_not_called()
+        self.assertEqual(throttle_metrics.snapshot()['login_account']['rejected'], 1)
+
+    def test_success_clears_account_failures(self):
+        self.login('backpacker', 'nope')
+        self.assertEqual(self.login('backpacker', 'pass12345').status_code, 302)
+        self.client.logout()
+        self.login('backpacker', 'nope')
+        self.assertEqual(self.login('backpacker', 'pass12345').status_code, 302)
+
+    def test_ip_limit_spans_accounts(self):
+        for i in range(4):
+            self.assertEqual(self.login(f'user{i}@example.com', 'x').status_code, 302)
+        self.assertEqual(self.login('user9@example.com', 'x').status_code, 429)
+        self.assertEqual(self.login('user9@example.com', 'x', ip='192.0.2.1').status_code, 302)
+
+    @override_settings(THROTTLE_PROXY_COUNT=1)
+    def test_signup_limit_uses_proxy_reported_ip(self):
+        def signup(forwarded):
+            return self.client.post(reverse('signup'), {'username': 'x'}, HTTP_X_FORWARDED_FOR=forwarded)
+
+        self.assertEqual(signup('10.0.0.1, 203.0.113.9').status_code, 200)
+        # A forged first entry does not escape the limit on the address the proxy saw
+        self.assertEqual(signup('10.9.9.9, 203.0.113.9').status_code, 429)
+        self.assertEqual(signup('203.0.113.10').status_code, 200)
+
+        staff = User.objects.create_user('ops', 'ops@example.com', 'pass12345', is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get(reverse('throttle_stats')).json()['signup_ip'],
+                         {'allowed': 2, 'rejected': 1})
+
+
+class ProfileWriteTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('nomad', 'nomad@example.com', 'pass12345')
+
+    def profile_queries(self, queries):
+        return [q['sql'] for q in queries if 'smarttrav_profile' in q['sql'].lower()]
+
+    def test_profile_created_once_with_the_user(self):
+        self.assertTrue(Profile.objects.filter(user=self.user).exists())
+        with CaptureQueriesContext(connection) as queries:
+            self.user.first_name = 'Nomad'
+            self.user.save()
+        self.assertEqual(self.profile_queries(queries), [])
+
+    def test_login_and_dashboard_do_not_write_profiles(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('login'), {'email': 'nomad', 'password': 'pass12345'})
+            response = self.client.get(reverse('dashboard') + '?section=profile')
+        self.assertEqual(response.status_code, 200)
+
+        profile_sql = self.profile_queries(queries)
+        self.assertTrue(profile_sql)
+        self.assertFalse([sql for sql in profile_sql if not sql.lstrip().upper().startswith('SELECT')])
+        # The profile arrives joined to the session user, not in a query of its own
+        self.assertFalse([sql for sql in profile_sql if 'auth_user' not in sql.lower()])
+
+    def test_unchanged_profile_form_writes_nothing(self):
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('update_profile'), {'email': 'nomad@example.com', 'first_name': '', 'last_name': ''})
+        self.assertFalse([q for q in queries if q['sql'].upper().startswith('UPDATE "AUTH_USER"')])
+
+        self.client.post(reverse('update_profile'), {'email': 'new@example.com'})
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.email, 'new@example.com')
+
+
+class JsonApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('nomad', 'nomad@example.com', 'pass12345')
+        self.trip = make_itinerary(self.user, 'Cebu Week')
+        self.beach = make_destination('Alpha Beach', tags='beach, family')
+        self.falls = make_destination('Bravo Falls', category='attraction')
+        self.fort = make_destination('Charlie Fort', category='historical')
+
+    def test_destinations_paginate_with_sparse_fields(self):
+        url = reverse('api_destination_list')
+        first = self.client.get(url, {'page_size': 2, 'fields': 'id,name'}).json()
+        self.assertEqual(first['results'], [
+            {'id': self.beach.pk, 'name': 'Alpha Beach'}, {'id': self.falls.pk, 'name': 'Bravo Falls'},
+        ])
+        second = self.client.get(first['next']).json()
+        self.assertEqual([row['name'] for row in second['results']], ['Charlie Fort'])
+        self.assertIsNone(second['next_cursor'])
+
+        detail = self.client.get(reverse('api_destination_detail', args=[self.beach.pk])).json()
+        self.assertEqual(detail['tags'], ['beach', 'family'])
+        self.assertEqual(self.client.get(url, {'fields': 'id,secret'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'cursor': 'nonsense'}).status_code, 400)
+
+    def test_catalog_revalidation_is_cheap_until_the_catalog_changes(self):
+        url = reverse('api_destination_list')
+        response = self.client.get(url)
+        self.assertIn('public', response['Cache-Control'])
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        # Revalidation costs one primary-key read of the catalog version
+        with self.assertNumQueries(1):
+            not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], etag)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        detail_etag = self.client.get(reverse('api_destination_detail', args=[self.fort.pk]))['ETag']
+        missing = reverse('api_destination_detail', args=[self.fort.pk + 100])
+        self.assertEqual(self.client.get(missing, HTTP_IF_NONE_MATCH=detail_etag).status_code, 404)
+
+        self.falls.price_per_day = Decimal('3100.00')
+        self.falls.save()
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+
+    def test_trip_data_is_private_to_its_owner(self):
+        other = User.objects.create_user('other', 'other@example.com', 'pass12345')
+        other_trip = make_itinerary(other, 'Not yours')
+        self.assertEqual(self.client.get(reverse('api_itinerary_list')).status_code, 403)
+
+        self.client.force_login(self.user)
+        trips = self.client.get(reverse('api_itinerary_list')).json()['results']
+        self.assertEqual([trip['id'] for trip in trips], [self.trip.pk])
+        self.assertEqual(trips[0]['budget_status'], 'good')
+        for name, args in (('api_itinerary_detail', [other_trip.pk]), ('api_itinerary_stops', [other_trip.pk])):
+            self.assertEqual(self.client.get(reverse(name, args=args)).status_code, 404)
+        self.assertEqual(self.client.get(reverse('api_expense_list'), {'itinerary': other_trip.pk}).status_code, 404)
+
+    def test_stops_page_in_itinerary_order(self):
+        self.client.force_login(self.user)
+        day = self.trip.start_date
+        undated = ItineraryDestination.objects.create(itinerary=self.trip, destination=self.beach)
+        second = ItineraryDestination.objects.create(itinerary=self.trip, destination=self.falls,
+                                                     visit_date=day, position=1)
+        first = ItineraryDestination.objects.create(itinerary=self.trip, destination=self.fort,
+                                                    visit_date=day, position=0)
+
+        seen, url = [], reverse('api_itinerary_stops', args=[self.trip.pk]) + '?page_size=1&fields=id,position'
+        while url:
+            page = self.client.get(url).json()
+            seen.extend(page['results'])
+            url = page['next']
+        # Undated stops come after the planned days
+        self.assertEqual(seen, [{'id': first.pk, 'position': 0}, {'id': second.pk, 'position': 1},
+                                {'id': undated.pk, 'position': 0}])
+
+    def test_itinerary_detail_query_count_does_not_grow_with_stops(self):
+        self.client.force_login(self.user)
+        url = reverse('api_itinerary_detail', args=[self.trip.pk])
+        ItineraryDestination.objects.create(itinerary=self.trip, destination=self.beach)
+        Expense.objects.create(itinerary=self.trip, category='food', description='Lunch', amount=Decimal('350.00'),
+                               date=self.trip.start_date)
+        with CaptureQueriesContext(connection) as one_stop:
+            self.client.get(url)
+
+        for destination in (self.falls, self.fort):
+            ItineraryDestination.objects.create(itinerary=self.trip, destination=destination)
+        with CaptureQueriesContext(connection) as three_stops:
+            detail = self.client.get(url).json()
+        self.assertEqual(len(three_stops), len(one_stop))
+        self.assertEqual([stop['destination']['name'] for stop in detail['stops']],
+                         ['Alpha Beach', 'Bravo Falls', 'Charlie Fort'])
+        self.assertEqual(detail['destination_count'], 3)
+        self.assertEqual(detail['expenses'][0]['itinerary_title'], 'Cebu Week')
+
+    def test_stop_and_expense_changes_invalidate_trip_etags(self):
+        self.client.force_login(self.user)
+        urls = [reverse('api_itinerary_list'), reverse('api_expense_list'),
+                reverse('api_itinerary_stops', args=[self.trip.pk])]
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+        for url, etag in etags.items():
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        ItineraryDestination.objects.create(itinerary=self.trip, destination=self.beach)
+        for url, etag in etags.items():
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.client.get(urls[1])['ETag']
+        Expense.objects.create(itinerary=self.trip, category='food', description='Dinner', amount=Decimal('500.00'),
+                               date=self.trip.start_date)
+        response = self.client.get(urls[1], {'fields': 'amount'})
+        self.assertEqual(response.json()['results'], [{'amount': '500.00'}])
+        self.assertEqual(self.client.get(urls[1], HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class StopBatchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('nomad', 'nomad@example.com', 'pass12345')
+        self.trip = make_itinerary(self.user, 'Cebu Week', days=3)
+        self.places = [make_destination(f'Stop {i}', price_per_day=Decimal('1000.00')) for i in range(6)]
+        self.client.force_login(self.user)
+        self.url = reverse('api_itinerary_stop_batch', args=[self.trip.pk])
+
+    def post(self, changes):
+        return self.client.post(self.url, changes, content_type='application/json')
+
+    def test_batch_applies_everything_and_returns_a_diff(self):
+        kept, moved, dropped = [
+            ItineraryDestination.objects.create(itinerary=self.trip, destination=place) for place in self.places[:3]
+        ]
+        day_two = self.trip.start_date + timedelta(days=1)
+        with CaptureQueriesContext(connection) as adding_two:
+            response = self.post({
+                'add': [{'destination': place.pk, 'visit_date': str(day_two)} for place in self.places[3:5]],
+                'update': [{'id': moved.pk, 'visit_date': str(day_two), 'notes': 'Sunrise'}],
+                'order': [moved.pk, kept.pk],
+                'remove': [dropped.pk],
+            })
+        self.assertEqual(response.status_code, 200)
+        diff = response.json()
+        self.assertEqual([stop['destination']['name'] for stop in diff['added']], ['Stop 3', 'Stop 4'])
+        self.assertEqual(diff['added'][0]['calculated_price'], '3000.00')
+        self.assertEqual(diff['changed'], [
+            {'id': kept.pk, 'position': 1},
+            {'id': moved.pk, 'notes': 'Sunrise', 'visit_date': str(day_two)},
+        ])
+        self.assertEqual(diff['removed'], [dropped.pk])
+        self.assertEqual(diff['itinerary']['destination_count'], 4)
+        self.assertEqual(diff['itinerary']['destination_cost_total'], '12000.00')
+
+        self.trip.refresh_from_db()
+        self.assertEqual((self.trip.destination_count, self.trip.destination_cost_total), (4, Decimal('12000.00')))
+        self.assertEqual(rebuild_rollups(Itinerary.objects.filter(pk=self.trip.pk), dry_run=True), [])
+        self.assertEqual(
+            list(ItineraryDestination.objects.filter(visit_date=day_two).values_list('destination__name', flat=True)),
+            ['Stop 1', 'Stop 3', 'Stop 4'],
+        )
+
+        # Writes are batched: five more additions cost no more queries than two
+        ItineraryDestination.objects.filter(itinerary=self.trip).delete()
+        with CaptureQueriesContext(connection) as adding_five:
+            self.post({'add': [{'destination': place.pk} for place in self.places[:5]]})
+        self.assertLessEqual(len(adding_five), len(adding_two))
+
+    def test_any_invalid_item_rejects_the_whole_batch(self):
+        stop = ItineraryDestination.objects.create(itinerary=self.trip, destination=self.places[0])
+        response = self.post({
+            'add': [{'destination': self.places[1].pk}, {'destination': self.places[0].pk}],
+            'update': [{'id': stop.pk, 'visit_date': str(self.trip.end_date + timedelta(days=1))}],
+            'remove': [999999],
+        })
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()
+        self.assertEqual(set(errors), {'add', 'update', 'remove'})
+        self.assertIn('already in Cebu Week', errors['add']['1'][0])
+        self.assertEqual(ItineraryDestination.objects.filter(itinerary=self.trip).count(), 1)
+
+        self.assertEqual(self.post({'order': [stop.pk, stop.pk]}).status_code, 400)
+        other = make_itinerary(User.objects.create_user('other', 'o@example.com', 'pass12345'), 'Not yours')
+        response = self.client.post(reverse('api_itinerary_stop_batch', args=[other.pk]),
+                                    {'remove': []}, content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+
+    def test_oversized_batch_is_rejected_before_its_items_are_parsed(self):
+        with mock.patch.object(StopAddSerializer, 'to_internal_value') as parse:
+            response = self.post({'add': [{'destination': 1}] * 150, 'remove': list(range(51))})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'non_field_errors': [f'At most {MAX_BATCH_SIZE} changes per batch']})
+        parse.assert_not_called()
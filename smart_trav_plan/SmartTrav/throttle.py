@@ -0,0 +1,188 @@
+import hashlib
+import math
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+KEY_PREFIX = 'smarttrav:throttle'
+
+# scope -> (max attempts, window in seconds); settings.THROTTLE_RATES overrides individual scopes
+DEFAULT_RATES = {
+    # Every login attempt from one address
+    'login_ip': (20, 5 * 60),
+    # Logins to one account, from anywhere; cleared on success, so in effect failures
+    'login_account': (5, 15 * 60),
+    'signup_ip': (10, 60 * 60),
+}
+
+
+class ThrottleMetrics:
+    """Allowed/rejected counts per scope for this worker."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.allowed = defaultdict(int)
+            self.rejected = defaultdict(int)
+
+    def record(self, scope, allowed):
+        with self._lock:
+            (self.allowed if allowed else self.rejected)[scope] += 1
+
+    def snapshot(self):
+        with self._lock:
+            scopes = sorted(set(self.allowed) | set(self.rejected))
+            return {scope: {'allowed': self.allowed[scope], 'rejected': self.rejected[scope]} for scope in scopes}
+
+
+metrics = ThrottleMetrics()
+
+
+class SlidingWindowLimiter:
+    """
+    Sliding-window counter kept in a Django cache: attempts are counted in
+    fixed buckets of `window` seconds and the previous bucket is weighted
+    by how much of it still overlaps the window. attempt() counts first with
+    one atomic incr and decides on the count it returns, so concurrent
+    requests cannot all pass before any of them is counted. The counters
+    must live in a cache shared by every worker (Redis in production).
+    """
+
+    def __init__(self, scope, limit, window, cache_alias='default'):
+        self.scope = scope
+        self.limit = limit
+        self.window = window
+        self.cache_alias = cache_alias
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def _key(self, key, bucket):
+        return f'{KEY_PREFIX}:{self.scope}:{key}:{bucket}'
+
+    def _counts(self, key, now):
+        """(attempts in the current bucket, in the previous one, seconds into the current one)"""
+        bucket, offset = divmod(now, self.window)
+        current_key, previous_key = self._key(key, int(bucket)), self._key(key, int(bucket) - 1)
+        counts = self.cache.get_many([current_key, previous_key])
+        return counts.get(current_key, 0), counts.get(previous_key, 0), offset
+
+    def _estimate(self, key, now):
+        current, previous, offset = self._counts(key, now)
+        return current + previous * (1 - offset / self.window)
+
+    def allows(self, key, now=None):
+        """True if one more attempt fits in the window; counts nothing."""
+        return self._estimate(key, time.time() if now is None else now) < self.limit
+
+    def hit(self, key, now=None):
+        """Count an attempt; returns the count in the current bucket, this one included."""
+        now = time.time() if now is None else now
+        current_key = self._key(key, int(now // self.window))
+        # Kept for two windows so the next bucket can still weigh it
+        if self.cache.add(current_key, 1, timeout=self.window * 2):
+            return 1
+        try:
+            return self.cache.incr(current_key)
+        except ValueError:
+            # Expired between add() and incr()
+            self.cache.set(current_key, 1, timeout=self.window * 2)
+            return 1
+
+    def attempt(self, key, now=None):
+        """Count an attempt and return True if it is within the limit."""
+        now = time.time() if now is None else now
+        current = self.hit(key, now)
+        bucket, offset = divmod(now, self.window)
+        previous = self.cache.get(self._key(key, int(bucket) - 1), 0)
+        return current + previous * (1 - offset / self.window) <= self.limit
+
+    def retry_after(self, key, now=None):
+        """Seconds until the estimate drops below the limit, for Retry-After (an estimate)."""
+        current, previous, offset = self._counts(key, time.time() if now is None else now)
+        if current >= self.limit:
+            return math.ceil(self.window - offset)
+        if not previous:
+            return 0
+        # previous * (1 - t / window) + current < limit
+        needed = self.window * (1 - (self.limit - current) / previous)
+        return max(math.ceil(needed - offset), 0)
+
+    def reset(self, key, now=None):
+        now = time.time() if now is None else now
+        bucket = int(now // self.window)
+        self.cache.delete_many([self._key(key, bucket), self._key(key, bucket - 1)])
+
+
+# Caches whose counters are private to one process, so every worker would allow the full rate
+PER_PROCESS_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """With THROTTLE_REQUIRE_SHARED_CACHE (on in production), refuse a per-process throttle cache."""
+    alias = getattr(settings, 'THROTTLE_CACHE_ALIAS', 'default')
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if getattr(settings, 'THROTTLE_REQUIRE_SHARED_CACHE', False) and backend in PER_PROCESS_CACHES:
+        return [checks.Error(
+            f"The throttle cache '{alias}' ({backend}) is not shared between workers.",
+            hint='Set REDIS_URL (or point THROTTLE_CACHE_ALIAS at a shared cache).',
+            id='SmartTrav.E001',
+        )]
+    return []
+
+
+def get_limiter(scope):
+    limit, window = {**DEFAULT_RATES, **getattr(settings, 'THROTTLE_RATES', {})}[scope]
+    limiter_class = import_string(getattr(settings, 'THROTTLE_LIMITER', 'SmartTrav.throttle.SlidingWindowLimiter'))
+    return limiter_class(scope, limit, window, cache_alias=getattr(settings, 'THROTTLE_CACHE_ALIAS', 'default'))
+
+
+def client_ip(request):
+    """
+    The client address. Behind THROTTLE_PROXY_COUNT reverse proxies it is
+    the entry those proxies appended to X-Forwarded-For (earlier entries
+    are client-supplied and can be forged).
+    """
+    proxies = getattr(settings, 'THROTTLE_PROXY_COUNT', 0)
+    forwarded = [part.strip() for part in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if part.strip()]
+    if proxies and len(forwarded) >= proxies:
+        return forwarded[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def account_key(identifier):
+    # Hashed so arbitrary input makes a safe, fixed-length cache key
+    return hashlib.sha256((identifier or '').strip().lower().encode()).hexdigest()
+
+
+def attempt(*limits):
+    """
+    Fail-fast gate for a view: limits are (scope, key) pairs. Counts the
+    attempt against each of them and returns the seconds to wait if one is
+    over its limit, else None. Done before any database or password-hashing
+    work.
+    """
+    for scope, key in limits:
+        limiter = get_limiter(scope)
+        if not limiter.attempt(key):
+            metrics.record(scope, allowed=False)
+            return max(limiter.retry_after(key), 1)
+        metrics.record(scope, allowed=True)
+    return None
+
+
+def reset(scope, key):
+    get_limiter(scope).reset(key)
@@ -0,0 +1,255 @@
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import checks
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import Q, Subquery
+from django.utils import timezone
+
+from .models import Destination, Profile, UploadJob
+from .images import build_variants
+from .content_store import content_hash, lookup, store_upload
+from smart_trav_plan.storage_backends import UploadStagingStorage
+
+PROFILE_PICTURE_BUCKET = 'profile-pictures'
+DESTINATION_IMAGE_BUCKET = 'images'
+
+RETRY_BASE = timedelta(seconds=30)
+RETRY_MAX = timedelta(hours=1)
+# A running job whose worker has not finished in this long is assumed lost
+STALE_AFTER = timedelta(minutes=10)
+
+
+def get_staging_storage():
+    """
+    Where queued files wait for the worker: the private UPLOAD_STAGING_BUCKET,
+    which the web and worker services both reach. UPLOAD_STAGING_ROOT selects
+    a local directory instead, only for setups where they share one disk.
+    """
+    root = getattr(settings, 'UPLOAD_STAGING_ROOT', None)
+    if root:
+        return FileSystemStorage(location=root)
+    return UploadStagingStorage()
+
+
+@checks.register()
+def check_staging_storage(app_configs, **kwargs):
+    """Outside DEBUG, a local staging directory is only right if the worker shares this disk."""
+    if settings.DEBUG or not getattr(settings, 'UPLOAD_STAGING_ROOT', None):
+        return []
+    return [checks.Warning(
+        f'Queued uploads are staged in the local directory {settings.UPLOAD_STAGING_ROOT}.',
+        hint='The process_upload_jobs worker must run on the same filesystem; unset UPLOAD_STAGING_ROOT '
+             'to stage in UPLOAD_STAGING_BUCKET when it runs as a separate service.',
+        id='SmartTrav.W001',
+    )]
+
+
+def make_idempotency_key(target, object_id, digest):
+    """Same image (by content hash) for the same object -> same key, so resubmitting does not queue twice."""
+    return hashlib.sha256(f'{target}:{object_id}:{digest}'.encode()).hexdigest()
+
+
+def enqueue_upload(target, object_id, image_file, bucket, requested_by=None, idempotency_key=None):
+    """
+    Queue an uploaded file for the worker and return its job. The file is
+    copied chunk by chunk into staging storage and the job only keeps its
+    name, so it is never held in memory whole. A job with the
+    same idempotency key is not queued twice: it becomes the object's latest
+    request again, so a finished one is re-applied (uploading A, then B, then
+    A leaves A in place) and a dead one is requeued.
+    """
+    digest = content_hash(image_file)
+    key = idempotency_key or make_idempotency_key(target, object_id, digest)
+    job = UploadJob.objects.filter(idempotency_key=key).first()
+    if job is None:
+        storage = get_staging_storage()
+        staged_name = storage.save(key, image_file)
+        job, created = UploadJob.objects.get_or_create(
+            idempotency_key=key,
+            defaults={
+                'target': target,
+                'object_id': object_id,
+                'bucket': bucket,
+                'filename': image_file.name,
+                'content_type': getattr(image_file, 'content_type', '') or '',
+                'staged_name': staged_name,
+                'requested_by': requested_by,
+            },
+        )
+        if created:
+            _complete_if_known(job, digest)
+            return job
+        # An identical submission got there first
+        storage.delete(staged_name)
+
+    job.requested_at = timezone.now()
+    job.save(update_fields=['requested_at', 'updated_at'])
+    if job.status == UploadJob.STATUS_DONE:
+        with transaction.atomic():
+            _apply_result(job, job.result_url, job.result_variants)
+    elif job.status == UploadJob.STATUS_DEAD:
+        requeue(UploadJob.objects.filter(pk=job.pk))
+        job.refresh_from_db()
+    return job
+
+
+def _complete_if_known(job, digest):
+    """Finish a new job on the spot when its bytes (and derivatives) are already in storage."""
+    stored = lookup(job.bucket, digest)
+    variants = existing_variants(stored.public_url) if stored else None
+    if variants is None:
+        return
+    staged_name = job.staged_name
+    with transaction.atomic():
+        _apply_result(job, stored.public_url, variants)
+        job.status = UploadJob.STATUS_DONE
+        job.result_url = stored.public_url
+        job.result_variants = variants
+        job.staged_name = ''
+        job.save(update_fields=['status', 'result_url', 'result_variants', 'staged_name', 'updated_at'])
+    get_staging_storage().delete(staged_name)
+
+
+def requeue(jobs):
+    """Send dead-lettered jobs back to the queue with a fresh attempt budget."""
+    return jobs.filter(status=UploadJob.STATUS_DEAD).update(
+        status=UploadJob.STATUS_PENDING, attempts=0, next_attempt_at=timezone.now(), last_error='',
+    )
+
+
+def claim_jobs(limit=10):
+    """
+    Mark up to `limit` due jobs as running and return them. Rows are locked
+    with SKIP LOCKED (where supported) so several workers never claim the
+    same job.
+    """
+    now = timezone.now()
+    due = (
+        Q(status=UploadJob.STATUS_PENDING, next_attempt_at__lte=now)
+        | Q(status=UploadJob.STATUS_RUNNING, locked_at__lt=now - STALE_AFTER)
+    )
+    with transaction.atomic():
+        jobs = list(
+            UploadJob.objects.select_for_update(skip_locked=True)
+            .filter(due)
+            .order_by('next_attempt_at', 'id')[:limit]
+        )
+        UploadJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+            status=UploadJob.STATUS_RUNNING, locked_at=now
+        )
+    return jobs
+
+
+def _superseded(job):
+    """True if a job for the same object, requested after this one, has already been applied."""
+    # Read from the row: the image may have been resubmitted while this job was running
+    requested_at = UploadJob.objects.filter(pk=job.pk).values('requested_at')
+    return (
+        UploadJob.objects.filter(target=job.target, object_id=job.object_id, status=UploadJob.STATUS_DONE,
+                                 requested_at__gt=Subquery(requested_at))
+        .exclude(pk=job.pk)
+        .exists()
+    )
+
+
+def _apply_result(job, url, variants):
+    """
+    Point the target object at the uploaded file, unless a later request for
+    it has already finished (jobs complete in any order, so a slow retry must
+    not bring back an older image). The target row is locked first so two
+    jobs finishing together are applied one after the other. Call inside a
+    transaction; a deleted target is not an error.
+    """
+    if job.target == UploadJob.TARGET_PROFILE_PICTURE:
+        profile = Profile.objects.select_for_update().filter(pk=job.object_id).first()
+        if profile and not _superseded(job):
+            profile.profile_picture_url = url
+            profile.profile_picture_variants = variants
+            profile.profile_picture = None
+            profile.save(update_fields=['profile_picture_url', 'profile_picture_variants', 'profile_picture'])
+    elif job.target == UploadJob.TARGET_DESTINATION_IMAGE:
+        destination = Destination.objects.select_for_update().filter(pk=job.object_id).first()
+        if destination and not _superseded(job):
+            destination.image_url = url
+            destination.image_variants = variants
+            # Goes through save() so the catalog cache is invalidated
+            destination.save(update_fields=['image_url', 'image_variants'])
+
+
+def retry_delay(attempts):
+    return min(RETRY_BASE * (2 ** (attempts - 1)), RETRY_MAX)
+
+
+def existing_variants(url):
+    """Derivatives already built for this (content-addressed) URL by another object, if any."""
+    for model, url_field, variants_field in (
+        (Destination, 'image_url', 'image_variants'),
+        (Profile, 'profile_picture_url', 'profile_picture_variants'),
+    ):
+        variants = (
+            model.objects.filter(**{url_field: url, f'{variants_field}__source': url})
+            .values_list(variants_field, flat=True)
+            .first()
+        )
+        if variants:
+            return variants
+    return None
+
+
+def process_job(job, upload=store_upload, derive=build_variants):
+    """Upload one claimed job and its resized derivatives, and record the outcome. Returns the job's new status."""
+    storage = get_staging_storage()
+    try:
+        with storage.open(job.staged_name) as staged:
+            # Content-addressed, so a retry after a lost response finds or rewrites the same object
+            url = upload(staged, job.bucket, job.filename, job.content_type)
+            staged.seek(0)
+            variants = existing_variants(url) or derive(staged, url)
+    except Exception as e:
+        job.attempts += 1
+        job.last_error = str(e)[:2000]
+        job.locked_at = None
+        if job.attempts >= job.max_attempts:
+            job.status = UploadJob.STATUS_DEAD
+        else:
+            job.status = UploadJob.STATUS_PENDING
+            job.next_attempt_at = timezone.now() + retry_delay(job.attempts)
+        job.save(update_fields=['attempts', 'last_error', 'locked_at', 'status', 'next_attempt_at', 'updated_at'])
+        return job.status
+
+    staged_name = job.staged_name
+    with transaction.atomic():
+        _apply_result(job, url, variants)
+        job.attempts += 1
+        job.status = UploadJob.STATUS_DONE
+        job.result_url = url
+        job.result_variants = variants
+        job.staged_name = ''
+        job.locked_at = None
+        job.last_error = ''
+        job.save(update_fields=['attempts', 'status', 'result_url', 'result_variants', 'staged_name', 'locked_at',
+                                'last_error', 'updated_at'])
+    storage.delete(staged_name)
+    return job.status
+
+
+def run_pending_jobs(batch_size=10, upload=store_upload, derive=build_variants):
+    """Claim and process one batch. Returns {status: count} for the batch."""
+    outcome = {}
+    for job in claim_jobs(batch_size):
+        status = process_job(job, upload=upload, derive=derive)
+        outcome[status] = outcome.get(status, 0) + 1
+    return outcome
+
+
+def get_pending_upload(**filters):
+    """The newest unfinished job matching `filters`, if any (drives the 'uploading' state in the UI)."""
+    return (
+        UploadJob.objects.filter(status__in=[UploadJob.STATUS_PENDING, UploadJob.STATUS_RUNNING], **filters)
+        .only('id', 'status', 'created_at')
+        .order_by('-created_at')
+        .first()
+    )
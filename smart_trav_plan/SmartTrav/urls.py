@@ -1,6 +1,6 @@
 from django.urls import path
 from django.contrib.auth import views as auth_views
-from . import views
+from . import api, views
 from django.conf.urls.static import static
 from django.conf import settings
 
@@ -23,6 +23,8 @@ urlpatterns = [
 
     # Dashboard
     path('dashboard/', views.dashboard_view, name='dashboard'),
+    path('dashboard/section/<str:section>/', views.dashboard_section, name='dashboard_section'),
+    path('dashboard/more/<str:section>/', views.dashboard_section_page, name='dashboard_section_page'),
 
     # Itinerary (Trips)
     path('itinerary/create/', views.create_itinerary, name='create_itinerary'),
@@ -33,6 +35,7 @@ urlpatterns = [
 
     # Destinations
     path('destination/add-to-trip/', views.add_destination_to_trip, name='add_destination_to_trip'),
+    path('destination/suggest/', views.destination_suggestions, name='destination_suggestions'),
     path('destination/save/<int:destination_id>/', views.save_destination, name='save_destination'),
     path('destination/remove-saved/<int:destination_id>/', views.remove_saved_destination,
          name='remove_saved_destination'),
@@ -43,6 +46,22 @@ urlpatterns = [
     path('destination/update-schedule/<int:itinerary_destination_id>/', views.update_destination_schedule,
          name='update_destination_schedule'),
 
+    # Catalog cache
+    path('catalog/cache-stats/', views.catalog_cache_stats, name='catalog_cache_stats'),
+    path('storage/client-stats/', views.storage_client_stats, name='storage_client_stats'),
+    path('throttle/stats/', views.throttle_stats, name='throttle_stats'),
+    path('uploads/<int:job_id>/status/', views.upload_job_status, name='upload_job_status'),
+
+    # JSON API
+    path('api/v1/destinations/', api.DestinationList.as_view(), name='api_destination_list'),
+    path('api/v1/destinations/<int:destination_id>/', api.DestinationDetail.as_view(), name='api_destination_detail'),
+    path('api/v1/itineraries/', api.ItineraryList.as_view(), name='api_itinerary_list'),
+    path('api/v1/itineraries/<int:itinerary_id>/', api.ItineraryDetail.as_view(), name='api_itinerary_detail'),
+    path('api/v1/itineraries/<int:itinerary_id>/stops/', api.ItineraryStopList.as_view(), name='api_itinerary_stops'),
+    path('api/v1/itineraries/<int:itinerary_id>/stops/batch/', api.ItineraryStopBatch.as_view(),
+         name='api_itinerary_stop_batch'),
+    path('api/v1/expenses/', api.ExpenseList.as_view(), name='api_expense_list'),
+
     # Expenses
     path('expense/add/', views.add_expense, name='add_expense'),
 
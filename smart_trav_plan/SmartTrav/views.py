@@ -1,17 +1,31 @@
 from django import forms
 from django.contrib.auth.models import User
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.views import LogoutView
 from django.contrib import messages
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import authenticate, login, logout
-from django.db.models import Sum, Count, Q
-from datetime import date
+from django.db import transaction
+from django.db.models import Max
+from django.db.models.functions import Lower
 from django.views.decorators.cache import never_cache
-from .models import Itinerary, Destination, SavedDestination, Expense, ItineraryDestination, Profile
-from django.http import HttpResponse
-from .utils import upload_image_to_supabase
+from .models import Itinerary, Destination, SavedDestination, Expense, ItineraryDestination, Profile, UploadJob
+from django.http import Http404, HttpResponse, JsonResponse
+from .uploads import enqueue_upload, PROFILE_PICTURE_BUCKET
+from .dashboard import (
+    DASHBOARD_SECTIONS, get_section_fragment,
+    get_catalog_filters, get_destination_page, get_saved_page, get_expense_page,
+)
+from .catalog import catalog_cache
+from .pagination import InvalidCursor
+from .budget import get_itinerary_budget
+from .pricing import reprice_itineraries
+from .search import suggest_destinations
+from .supabase_client import get_client_stats
+from . import throttle
 from django.core.mail import send_mail
 from django.conf import settings
 
@@ -29,7 +43,8 @@ class CustomUserCreationForm(UserCreationForm):
 
     def clean_email(self):
         email = self.cleaned_data.get('email')
-        if User.objects.filter(email=email).exists():
+        # Case-insensitive, like login; served by the LOWER(email) index
+        if User.objects.alias(email_lower=Lower('email')).filter(email_lower=email.lower()).exists():
             raise forms.ValidationError("This email is already registered.")
         return email
 
@@ -41,26 +56,30 @@ class CustomUserCreationForm(UserCreationForm):
         return user
 
 
+def _throttled(request, template, wait, context=None):
+    minutes = max(round(wait / 60), 1)
+    messages.error(request, f"Too many attempts. Please try again in {minutes} minute{'s' if minutes != 1 else ''}.")
+    response = render(request, template, context or {}, status=429)
+    response['Retry-After'] = str(wait)
+    return response
+
+
 def login_view(request):
     if request.method == "POST":
-        input_value = request.POST.get("email", "").strip().lower()
+        input_value = request.POST.get("email", "").strip()
         password = request.POST.get("password")
 
-        user = None
+        # Rejected before any query or password hash
+        ip, account = throttle.client_ip(request), throttle.account_key(input_value)
+        wait = throttle.attempt(('login_ip', ip), ('login_account', account))
+        if wait:
+            return _throttled(request, 'SmartTrav/accounts/login.html', wait)
 
-        if '@' in input_value:
-            email_users = User.objects.filter(email__iexact=input_value)
-            if email_users.exists():
-                user = email_users.first()
+        # Email or username, resolved and checked by EmailOrUsernameBackend
+        user = authenticate(request, username=input_value, password=password)
 
-        if not user:
-            username_users = User.objects.filter(username__iexact=input_value)
-            if username_users.exists():
-                user = username_users.first()
-            else:
-                user = authenticate(request, username=input_value, password=password)
-
-        if user and user.check_password(password):
+        if user:
+            throttle.reset('login_account', account)
             login(request, user)
             messages.success(request, "Login successful! Welcome back.")
 
@@ -77,6 +96,11 @@ def login_view(request):
 
 def signup_view(request):
     if request.method == 'POST':
+        ip = throttle.client_ip(request)
+        wait = throttle.attempt(('signup_ip', ip))
+        if wait:
+            return _throttled(request, 'SmartTrav/accounts/signup.html', wait, {'form': CustomUserCreationForm()})
+
         form = CustomUserCreationForm(request.POST)
         if form.is_valid():
             user = form.save()
@@ -91,89 +115,91 @@ def signup_view(request):
 @never_cache
 @login_required
 def dashboard_view(request):
-    Profile.objects.get_or_create(user=request.user)
+    # Only the active section is built here; the rest load on demand
+    active_section = request.GET.get('section', 'overview')
+    if active_section not in DASHBOARD_SECTIONS:
+        active_section = 'overview'
 
-    user_itineraries = Itinerary.objects.filter(user=request.user).annotate(
-        destination_count=Count('itinerary_destinations')
-    ).order_by('-id')
+    template, context = get_section_fragment(active_section, request.user, request.GET)
+    context.update({
+        'active_section': active_section,
+        'active_section_template': template,
+        'dashboard_sections': DASHBOARD_SECTIONS,
+    })
 
-    recent_itineraries = user_itineraries[:3]
+    return render(request, 'SmartTrav/accounts/dashboard.html', context)
 
-    saved_destinations = SavedDestination.objects.filter(user=request.user)
-    active_section = request.GET.get('section', 'overview')
-    active_category = request.GET.get('category', '')
-    search_query = request.GET.get('search', '').strip()
 
-    price_filter = request.GET.get('price', '')
-    tags_filter = request.GET.get('tags', '').strip()
+@never_cache
+@login_required
+def dashboard_section(request, section):
+    """A single dashboard section rendered as an HTML fragment"""
+    try:
+        template, context = get_section_fragment(section, request.user, request.GET)
+    except KeyError:
+        raise Http404('Unknown dashboard section')
+    return render(request, template, context)
 
-    all_destinations = Destination.objects.all()
 
-    # --- NEW LOGIC: Extract unique tags for suggestions ---
-    unique_tags = set()
-    for dest in all_destinations:
-        if dest.tags:
-            # Split by comma and clean up whitespace
-            d_tags = [t.strip().lower() for t in dest.tags.split(',') if t.strip()]
-            unique_tags.update(d_tags)
+@login_required
+def dashboard_section_page(request, section):
+    """Next page of a dashboard list for infinite scroll, as rendered cards in JSON"""
+    cursor = request.GET.get('cursor')
+    try:
+        if section == 'destinations':
+            page = get_destination_page(get_catalog_filters(request.GET), cursor)
+            template = 'SmartTrav/accounts/partials/destination_cards.html'
+            context = {'destinations': page}
+        elif section == 'saved':
+            page = get_saved_page(request.user, cursor)
+            template = 'SmartTrav/accounts/partials/saved_cards.html'
+            context = {'saved_destinations': page}
+        elif section == 'expenses':
+            page = get_expense_page(request.user, cursor)
+            template = 'SmartTrav/accounts/partials/expense_rows.html'
+            context = {'expenses': page}
+        else:
+            return JsonResponse({'error': 'Unknown section'}, status=404)
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
 
-    available_tags = sorted(list(unique_tags))
-    # ------------------------------------------------------
+    return JsonResponse({
+        'html': render_to_string(template, context, request=request),
+        'next_cursor': page.next_cursor,
+        'has_next': page.has_next,
+    })
 
-    if active_category:
-        all_destinations = all_destinations.filter(category=active_category)
 
-    if search_query:
-        all_destinations = all_destinations.filter(
-            Q(name__icontains=search_query) |
-            Q(location__icontains=search_query) |
-            Q(description__icontains=search_query)
-        )
+@staff_member_required
+def catalog_cache_stats(request):
+    """Hit/miss/eviction counters of this worker's catalog cache"""
+    return JsonResponse(catalog_cache.stats())
 
-    if price_filter:
-        if price_filter == 'budget':
-            all_destinations = all_destinations.filter(price_per_day__lt=2000)
-        elif price_filter == 'moderate':
-            all_destinations = all_destinations.filter(price_per_day__gte=2000, price_per_day__lt=3000)
-        elif price_filter == 'premium':
-            all_destinations = all_destinations.filter(price_per_day__gte=3000, price_per_day__lt=4000)
-        elif price_filter == 'luxury':
-            all_destinations = all_destinations.filter(price_per_day__gte=4000)
-
-    if tags_filter:
-        tag_list = [tag.strip().lower() for tag in tags_filter.split(',') if tag.strip()]
-        if tag_list:
-            tag_query = Q()
-            for tag in tag_list:
-                tag_query |= Q(tags__icontains=tag)
-            all_destinations = all_destinations.filter(tag_query)
-
-    expenses = Expense.objects.filter(itinerary__user=request.user)
-
-    itinerary_count = user_itineraries.count()
-    saved_count = saved_destinations.count()
-    total_budget = user_itineraries.aggregate(Sum('budget'))['budget__sum'] or 0
-    upcoming_trips = user_itineraries.filter(start_date__gte=date.today()).count()
 
-    context = {
-        'itinerary_count': itinerary_count,
-        'saved_count': saved_count,
-        'total_budget': total_budget,
-        'upcoming_trips': upcoming_trips,
-        'recent_itineraries': recent_itineraries,
-        'all_itineraries': user_itineraries,
-        'destinations': all_destinations,
-        'active_category': active_category,
-        'active_section': active_section,
-        'saved_destinations': saved_destinations,
-        'expenses': expenses,
-        'search_query': search_query,
-        'price_filter': price_filter,
-        'tags_filter': tags_filter,
-        'available_tags': available_tags,  # Passing tags to frontend
-    }
+@login_required
+def upload_job_status(request, job_id):
+    """Polled by the profile page while a picture upload is pending"""
+    job = get_object_or_404(UploadJob, id=job_id, requested_by=request.user)
+    return JsonResponse({'status': job.status, 'url': job.result_url or None})
 
-    return render(request, 'SmartTrav/accounts/dashboard.html', context)
+
+@staff_member_required
+def storage_client_stats(request):
+    """Pool size, connection reuse and latency of this worker's Supabase client"""
+    return JsonResponse(get_client_stats())
+
+
+@staff_member_required
+def throttle_stats(request):
+    """Allowed and rejected login/signup attempts per limiter scope for this worker"""
+    return JsonResponse(throttle.metrics.snapshot())
+
+
+@login_required
+def destination_suggestions(request):
+    """Type-ahead suggestions for the destination search box"""
+    query = request.GET.get('q', '').strip()
+    return JsonResponse({'results': suggest_destinations(query)})
 
 
 @never_cache
@@ -210,9 +236,7 @@ def edit_itinerary(request, itinerary_id):
         itinerary.budget = request.POST.get('budget')
         itinerary.notes = request.POST.get('notes', '')
         itinerary.save()
-
-        for itinerary_dest in itinerary.itinerary_destinations.all():
-            itinerary_dest.save()
+        reprice_itineraries([itinerary.pk])
 
         messages.success(request, f'Itinerary "{itinerary.title}" updated successfully!')
         return redirect('dashboard')
@@ -260,36 +284,42 @@ def add_destination_to_trip(request):
         visit_time = request.POST.get('visit_time')
 
         destination = get_object_or_404(Destination, id=destination_id)
-        itinerary = get_object_or_404(Itinerary, id=itinerary_id, user=request.user)
 
-        # Validate visit date is within trip range
-        if visit_date:
-            from datetime import datetime
-            visit_date_obj = datetime.strptime(visit_date, '%Y-%m-%d').date()
-            if visit_date_obj < itinerary.start_date or visit_date_obj > itinerary.end_date:
-                messages.error(
-                    request,
-                    f'Visit date must be between {itinerary.start_date} and {itinerary.end_date}'
-                )
+        with transaction.atomic():
+            # Locked like the batch API does, so a concurrent add cannot slip in between the check and the insert
+            itinerary = get_object_or_404(Itinerary.objects.select_for_update(), id=itinerary_id, user=request.user)
+
+            # Validate visit date is within trip range
+            if visit_date:
+                from datetime import datetime
+                visit_date_obj = datetime.strptime(visit_date, '%Y-%m-%d').date()
+                if visit_date_obj < itinerary.start_date or visit_date_obj > itinerary.end_date:
+                    messages.error(
+                        request,
+                        f'Visit date must be between {itinerary.start_date} and {itinerary.end_date}'
+                    )
+                    return redirect('dashboard')
+
+            if ItineraryDestination.objects.filter(itinerary=itinerary, destination=destination).exists():
+                messages.warning(request, f'{destination.name} is already in {itinerary.title}')
                 return redirect('dashboard')
 
-        if ItineraryDestination.objects.filter(itinerary=itinerary, destination=destination).exists():
-            messages.warning(request, f'{destination.name} is already in {itinerary.title}')
-        else:
+            last_position = itinerary.itinerary_destinations.aggregate(last=Max('position'))['last']
             itinerary_dest = ItineraryDestination.objects.create(
                 itinerary=itinerary,
                 destination=destination,
                 visit_date=visit_date if visit_date else None,
-                visit_time=visit_time if visit_time else None
+                visit_time=visit_time if visit_time else None,
+                position=0 if last_position is None else last_position + 1,
             )
 
-            days = itinerary.get_duration_days()
-            total_price = itinerary_dest.calculated_price or 0
+        days = itinerary.get_duration_days()
+        total_price = itinerary_dest.calculated_price or 0
 
-            messages.success(
-                request,
-                f'{destination.name} added to {itinerary.title}! Cost: ₱{total_price:,.2f} for {days} day(s)'
-            )
+        messages.success(
+            request,
+            f'{destination.name} added to {itinerary.title}! Cost: ₱{total_price:,.2f} for {days} day(s)'
+        )
 
     return redirect('dashboard')
 
@@ -335,26 +365,25 @@ def update_profile(request):
     if request.method == 'POST':
         user = request.user
 
-        user.email = request.POST.get('email', user.email)
-        user.first_name = request.POST.get('first_name', user.first_name)
-        user.last_name = request.POST.get('last_name', user.last_name)
-        user.save()
+        # Only write the fields that actually changed
+        changed = []
+        for field in ('email', 'first_name', 'last_name'):
+            value = request.POST.get(field, getattr(user, field))
+            if value != getattr(user, field):
+                setattr(user, field, value)
+                changed.append(field)
+        if changed:
+            user.save(update_fields=changed)
 
-        profile, created = Profile.objects.get_or_create(user=user)
+        profile = user.profile
 
         if 'profile_picture' in request.FILES:
-            profile_pic = request.FILES['profile_picture']
-
-            try:
-                image_url = upload_image_to_supabase(profile_pic, 'profile-pictures')
-                profile.profile_picture_url = image_url
-                profile.profile_picture = None
-                profile.save()
-
-                messages.success(request, 'Profile updated successfully with new picture!')
-            except Exception as e:
-                messages.error(request, f'Error uploading profile picture: {str(e)}')
-                print(f"Full error: {e}")
+            # Uploaded to Supabase by the process_upload_jobs worker, not in this request
+            enqueue_upload(
+                UploadJob.TARGET_PROFILE_PICTURE, profile.pk, request.FILES['profile_picture'],
+                PROFILE_PICTURE_BUCKET, requested_by=user,
+            )
+            messages.success(request, 'Profile updated! Your new picture is uploading and will appear shortly.')
         else:
             messages.success(request, 'Profile updated successfully!')
 
@@ -375,7 +404,7 @@ def remove_profile_picture(request):
                     profile.profile_picture = None
 
                 profile.profile_picture_url = None
-                profile.save()
+                profile.save(update_fields=['profile_picture', 'profile_picture_url'])
 
                 messages.success(request, 'Profile picture removed successfully!')
             else:
@@ -398,46 +427,16 @@ def itinerary_detail(request, itinerary_id):
     itinerary = get_object_or_404(Itinerary, id=itinerary_id, user=request.user)
     itinerary_destinations = ItineraryDestination.objects.filter(
         itinerary=itinerary
-    ).select_related('destination').order_by('visit_date', 'visit_time', 'added_at')
+    ).select_related('destination').order_by('visit_date', 'visit_time', 'position', 'added_at')
 
     expenses = Expense.objects.filter(itinerary=itinerary).order_by('-date')
 
-    # Calculate comprehensive budget tracking
-    total_expenses = sum(float(e.amount) for e in expenses)
-    total_destination_cost = itinerary.get_total_destination_cost()
-    total_spent = total_expenses + total_destination_cost
-    budget = float(itinerary.budget)
-    budget_remaining = budget - total_spent
-    budget_percentage = (total_spent / budget * 100) if budget > 0 else 0
-
-    trip_days = itinerary.get_duration_days()
-
-    daily_budget = budget / trip_days if trip_days > 0 else 0
-
-    # Determine budget status
-    if budget_remaining < 0:
-        budget_status = 'over'
-        budget_message = f'Over Budget: ₱{abs(budget_remaining):,.2f}'
-    elif budget_percentage >= 85:
-        budget_status = 'at_risk'
-        budget_message = f'Budget At Risk: ₱{budget_remaining:,.2f} remaining'
-    else:
-        budget_status = 'good'
-        budget_message = f'On Track: ₱{budget_remaining:,.2f} remaining'
-
     context = {
         'itinerary': itinerary,
         'itinerary_destinations': itinerary_destinations,
         'expenses': expenses,
-        'total_expenses': total_expenses,
-        'total_destination_cost': total_destination_cost,
-        'total_spent': total_spent,
-        'budget_remaining': budget_remaining,
-        'budget_percentage': budget_percentage,
-        'budget_status': budget_status,
-        'budget_message': budget_message,
-        'trip_days': trip_days,
-        'daily_budget': daily_budget,
+        # Exact Decimal totals, remaining, percentage, status and daily budget
+        **get_itinerary_budget(itinerary),
     }
     return render(request, 'SmartTrav/accounts/itinerary_detail.html', context)
 
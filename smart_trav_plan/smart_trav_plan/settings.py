@@ -29,6 +29,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'storages',  # django-storages
+    'rest_framework',
 
     # custom apps
     'SmartTrav',
@@ -47,6 +48,9 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'smart_trav_plan.urls'
 
+# Email-or-username login in one query (keeps ModelBackend permissions)
+AUTHENTICATION_BACKENDS = ['SmartTrav.backends.EmailOrUsernameBackend']
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -80,6 +84,56 @@ SUPABASE_KEY = os.environ.get('SUPABASE_KEY')
 # If you use a custom backend that needs a default bucket:
 SUPABASE_BUCKET = os.environ.get('SUPABASE_DESTINATION_BUCKET', 'destination-images')
 
+# Pooled HTTP transport behind the shared Supabase client (see SmartTrav/supabase_client.py)
+SUPABASE_HTTP_TIMEOUT = float(os.environ.get('SUPABASE_HTTP_TIMEOUT', 20))
+SUPABASE_HTTP_CONNECT_TIMEOUT = float(os.environ.get('SUPABASE_HTTP_CONNECT_TIMEOUT', 5))
+SUPABASE_HTTP_MAX_CONNECTIONS = int(os.environ.get('SUPABASE_HTTP_MAX_CONNECTIONS', 10))
+SUPABASE_HTTP_MAX_KEEPALIVE = int(os.environ.get('SUPABASE_HTTP_MAX_KEEPALIVE', 5))
+SUPABASE_HTTP_KEEPALIVE_EXPIRY = 30.0
+SUPABASE_HTTP_RETRIES = int(os.environ.get('SUPABASE_HTTP_RETRIES', 3))
+SUPABASE_HTTP_BACKOFF = 0.25
+# Directory listings behind SupabaseStorage.exists/exists_many are cached this many seconds
+SUPABASE_LISTING_TTL = int(os.environ.get('SUPABASE_LISTING_TTL', 60))
+SUPABASE_LIST_CONCURRENCY = 8
+# Uploads larger than this use the resumable (TUS) endpoint in 6 MB chunks
+SUPABASE_RESUMABLE_THRESHOLD = int(os.environ.get('SUPABASE_RESUMABLE_THRESHOLD', 6 * 1024 * 1024))
+
+# --- CACHE CONFIGURATION ---
+# Local memory by default; set REDIS_URL to share cached data between workers
+# (the catalog version itself is kept in the database, see SmartTrav/catalog.py)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+if os.environ.get('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL'),
+    }
+
+# Destination catalog cache (see SmartTrav/catalog.py)
+CATALOG_CACHE_ALIAS = 'default'
+CATALOG_CACHE_MAX_ENTRIES = int(os.environ.get('CATALOG_CACHE_MAX_ENTRIES', 32))
+CATALOG_CACHE_TIMEOUT = 60 * 60
+# Seconds a worker reuses the catalog version before re-reading it, i.e. how late it sees another worker's bump
+CATALOG_VERSION_TTL = float(os.environ.get('CATALOG_VERSION_TTL', 1))
+
+# Login/signup rate limits (see SmartTrav/throttle.py for the rates; THROTTLE_RATES overrides them).
+# Counters live in this cache alias, which must be shared by every worker outside DEBUG.
+THROTTLE_CACHE_ALIAS = 'default'
+THROTTLE_REQUIRE_SHARED_CACHE = not DEBUG
+# Reverse proxies in front of the app (Render's load balancer), for the client IP
+THROTTLE_PROXY_COUNT = int(os.environ.get('THROTTLE_PROXY_COUNT', 1))
+
+# JSON API under /api/v1/ (see SmartTrav/api.py); same session login as the site
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': ['rest_framework.authentication.SessionAuthentication'],
+    'DEFAULT_PERMISSION_CLASSES': ['rest_framework.permissions.IsAuthenticated'],
+    'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer'],
+}
+API_MAX_PAGE_SIZE = 100
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -108,6 +162,12 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Queued image uploads wait in this private Supabase bucket for the process_upload_jobs worker,
+# a separate service. UPLOAD_STAGING_ROOT stages them in a local directory instead, which only
+# works when the web process and the worker share a filesystem (local development).
+UPLOAD_STAGING_BUCKET = os.environ.get('UPLOAD_STAGING_BUCKET', 'upload-staging')
+UPLOAD_STAGING_ROOT = os.environ.get('UPLOAD_STAGING_ROOT')
+
 # Use custom Supabase storage class for media files if implemented
 DEFAULT_FILE_STORAGE = 'smart_trav_plan.storage_backends.SupabaseStorage'
 
@@ -1,14 +1,74 @@
+from django.core.files import File
 from django.core.files.storage import Storage
 from django.conf import settings
-from supabase import create_client
+from SmartTrav.streaming_upload import STREAM_CHUNK_SIZE, upload_file
+from SmartTrav.supabase_client import get_http_client, get_supabase_client, storage_headers, storage_url
 import os
 import re  # Added: Import the regular expression module
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+LIST_PAGE_SIZE = 1000
+
+
+class BucketListingCache:
+    """
+    Names in each directory of one bucket, as returned by list(), kept for
+    `ttl` seconds. Writes through this process update it directly; anything
+    else is picked up after the TTL or an explicit invalidate(prefix).
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._directories = {}
+        self._lock = threading.Lock()
+
+    def get(self, directory):
+        with self._lock:
+            entry = self._directories.get(directory)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            return None
+        return entry[1]
+
+    def put(self, directory, names):
+        with self._lock:
+            self._directories[directory] = (time.monotonic(), set(names))
+
+    def add(self, name):
+        names = self.get(os.path.dirname(name))
+        if names is not None:
+            names.add(os.path.basename(name))
+
+    def discard(self, name):
+        names = self.get(os.path.dirname(name))
+        if names is not None:
+            names.discard(os.path.basename(name))
+
+    def invalidate(self, prefix=''):
+        prefix = prefix.strip('/')
+        with self._lock:
+            for directory in [d for d in self._directories if not prefix or d == prefix or d.startswith(prefix + '/')]:
+                del self._directories[directory]
+
+
+_listing_caches = {}
+
+
+def get_listing_cache(bucket):
+    """The process-wide listing cache for a bucket, shared by every SupabaseStorage instance."""
+    if bucket not in _listing_caches:
+        _listing_caches[bucket] = BucketListingCache(getattr(settings, 'SUPABASE_LISTING_TTL', 60))
+    return _listing_caches[bucket]
 
 
 class SupabaseStorage(Storage):
-    def __init__(self):
-        self.client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
-        self.bucket = settings.SUPABASE_BUCKET
+    def __init__(self, bucket=None):
+        # Shared per-process client; storage instances no longer build their own
+        self.client = get_supabase_client()
+        self.bucket = bucket or settings.SUPABASE_BUCKET
 
         # Added: Extract project reference from the SUPABASE_URL
         match = re.search(r'https?://(.*?)\.supabase\.co', settings.SUPABASE_URL)
@@ -20,9 +80,24 @@ class SupabaseStorage(Storage):
 
     def _save(self, name, content):
         """Uploads the file content to Supabase."""
-        self.client.storage.from_(self.bucket).upload(name, content.read())
+        # Streamed from content.chunks() (resumable for large files), never read whole
+        upload_file(content, name, self.bucket)
+        self.listing.add(name)
         return name
 
+    def _open(self, name, mode='rb'):
+        """Download into a temporary file chunk by chunk, so the object is never held in memory whole."""
+        handle = tempfile.TemporaryFile()
+        with get_http_client().stream('GET', storage_url(f'object/{self.bucket}/{name}'),
+                                      headers=storage_headers()) as response:
+            if response.status_code >= 400:
+                handle.close()
+                raise OSError(f'Download of {self.bucket}/{name} failed ({response.status_code})')
+            for chunk in response.iter_bytes(STREAM_CHUNK_SIZE):
+                handle.write(chunk)
+        handle.seek(0)
+        return File(handle, name=name)
+
     def url(self, name):
         """
         Returns the permanent public URL for the file.
@@ -37,16 +112,89 @@ class SupabaseStorage(Storage):
             f"{self.bucket}/{name}"
         )
 
+    # --- Existence checks, answered from cached directory listings ---
+
+    @property
+    def listing(self):
+        return get_listing_cache(self.bucket)
+
+    def _list_page(self, directory, offset):
+        items = self.client.storage.from_(self.bucket).list(directory, {
+            'limit': LIST_PAGE_SIZE,
+            'offset': offset,
+            'sortBy': {'column': 'name', 'order': 'asc'},
+        })
+        return [item['name'] for item in items]
+
+    def _list_directory(self, directory):
+        """Every name in one directory: the first page, then further pages a window at a time in parallel."""
+        first = self._list_page(directory, 0)
+        names = set(first)
+        offset = len(first)
+        window = getattr(settings, 'SUPABASE_LIST_CONCURRENCY', 8)
+        while offset and offset % LIST_PAGE_SIZE == 0:
+            offsets = [offset + i * LIST_PAGE_SIZE for i in range(window)]
+            with ThreadPoolExecutor(max_workers=window) as pool:
+                pages = list(pool.map(lambda start: self._list_page(directory, start), offsets))
+            for page in pages:
+                names.update(page)
+            if any(len(page) < LIST_PAGE_SIZE for page in pages):
+                break
+            offset += window * LIST_PAGE_SIZE
+        return names
+
+    def exists_many(self, names):
+        """
+        {name: exists} for many names at once. Each directory involved is
+        listed once (concurrently across directories) unless its listing is
+        already cached.
+        """
+        names = list(names)
+        directories = {os.path.dirname(name) for name in names}
+        listings = {directory: self.listing.get(directory) for directory in directories}
+        missing = [directory for directory, found in listings.items() if found is None]
+
+        if missing:
+            workers = min(getattr(settings, 'SUPABASE_LIST_CONCURRENCY', 8), len(missing))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for directory, found in zip(missing, pool.map(self._list_directory, missing)):
+                    self.listing.put(directory, found)
+                    listings[directory] = found
+
+        return {name: os.path.basename(name) in listings[os.path.dirname(name)] for name in names}
+
     def exists(self, name):
         """Checks if a file exists in the Supabase bucket."""
         try:
-            # Using the list method to check existence is more reliable than download()
-            response = self.client.storage.from_(self.bucket).list(
-                path=os.path.dirname(name),
-                search=os.path.basename(name)
-            )
-            # Check if the list contains the file we searched for
-            # Note: Supabase list is sometimes inconsistent, but checking the response content helps.
-            return len(response) > 0 and response[0]['name'] == os.path.basename(name)
+            return self.exists_many([name])[name]
         except Exception:
-            return False
\ No newline at end of file
+            return False
+
+    def delete(self, name):
+        self.client.storage.from_(self.bucket).remove([name])
+        self.listing.discard(name)
+
+    def invalidate_listing(self, prefix=''):
+        """Forget cached listings under `prefix` (e.g. after files changed outside this storage)."""
+        self.listing.invalidate(prefix)
+
+
+class UploadStagingStorage(SupabaseStorage):
+    """
+    The private bucket (settings.UPLOAD_STAGING_BUCKET) where queued uploads
+    wait for the process_upload_jobs worker, which runs as its own service
+    and so cannot read the web process's disk. Names are the jobs'
+    idempotency keys, unique already, so no existence check is made, and a
+    retried save overwrites the same object.
+    """
+
+    def __init__(self):
+        super().__init__(bucket=settings.UPLOAD_STAGING_BUCKET)
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        upload_file(content, name, self.bucket, upsert=True)
+        self.listing.add(name)
+        return name